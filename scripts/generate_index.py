@@ -1,5 +1,6 @@
 import json
 import re
+import sys
 from collections import defaultdict
 from pathlib import Path
 
@@ -857,8 +858,11 @@ def generate_html(md_content):
     return html_template.format(content=html_body, stats_script=stats_info)
 
 
-def main():
+def main(sample=None):
     books = load_books()
+    if sample:
+        # 剖析时只处理前 N 本书，便于比较不同运行的结果
+        books = books[:sample]
     stats = load_stats()
     
     # 如果有统计信息，使用统计信息中的数据
@@ -910,4 +914,10 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    sys.path.insert(0, str(ROOT / "scripts" / "sync"))
+    from profiling import add_profile_arguments, run_profiled
+    parser = argparse.ArgumentParser(description='生成 docs/index.html 和 docs/books.json')
+    add_profile_arguments(parser, sample_help='只处理 all-books.json 中的前 N 本书（不同运行的剖析结果可以直接比较）')
+    args = parser.parse_args()
+    run_profiled('generate_index', lambda: main(sample=args.profile_sample), args)
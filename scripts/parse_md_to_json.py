@@ -2,15 +2,19 @@
 # -*- coding: utf-8 -*-
 """
 解析 md 目录下的所有 Markdown 文件，生成统一的 JSON 数据文件
+
+使用 --from-store 时直接从书籍数据库（md/books.sqlite）生成，不再解析 md 文件，输出格式相同
 """
 
 import json
 import re
+import sys
 from pathlib import Path
 from collections import defaultdict
 
 ROOT = Path(__file__).parent.parent
 MD_DIR = ROOT / "md"
+BOOK_STORE_FILE = MD_DIR / "books.sqlite"
 OUTPUT_JSON = ROOT / "docs" / "all-books.json"
 STATS_FILE = ROOT / "docs" / "parse-stats.json"
 
@@ -114,18 +118,65 @@ def parse_single_file(file_path):
     return category, books
 
 
-def main():
-    """主函数"""
-    print("🚀 开始解析 md 文件...")
+def make_book_entry(title, author, link, category):
+    """生成 JSON 中的一条书籍记录"""
+    return {
+        'title': title,
+        'author': author if author else '未知',
+        'link': link,
+        'category': category,
+        'language': 'ZH',  # 默认中文，后续可优化
+        'level': 'Unknown',
+        'formats': ['epub', 'mobi', 'azw3'],  # 从表格列名推断
+    }
+
+
+def load_books_from_store():
+    """从书籍数据库读取所有标签下的书籍（顺序与 md 文件中一致）"""
+    sys.path.insert(0, str(ROOT / "scripts" / "sync"))
+    from book_store import BookStore
     
+    all_books = []
+    category_stats = defaultdict(int)
+    with BookStore(BOOK_STORE_FILE) as store:
+        for category, title, author, link in store.iter_tag_rows():
+            title = title.replace('**', '').strip()
+            author = author.replace('**', '').strip()
+            all_books.append(make_book_entry(title, author, link, category))
+            category_stats[category] += 1
+    return all_books, category_stats
+
+
+def main(from_store=False, sample=None):
+    """
+    主函数
+    
+    Args:
+        from_store: 是否从书籍数据库生成
+        sample: 只解析按文件名排序的前 N 个 md 文件（剖析时使用，便于比较不同运行的结果）
+    """
     all_books = []
     category_stats = defaultdict(int)
     total_files = 0
     success_files = 0
     error_files = []
     
+    if from_store:
+        print(f"🚀 开始从书籍数据库生成: {BOOK_STORE_FILE}")
+        if not BOOK_STORE_FILE.exists():
+            print(f"❌ 书籍数据库不存在: {BOOK_STORE_FILE}")
+            sys.exit(1)
+        all_books, category_stats = load_books_from_store()
+        total_files = success_files = len(category_stats)
+        save_outputs(all_books, category_stats, total_files, success_files, error_files)
+        return
+    
+    print("🚀 开始解析 md 文件...")
+    
     # 获取所有 md 文件
     md_files = list(MD_DIR.glob("*.md"))
+    if sample:
+        md_files = sorted(md_files)[:sample]
     total_files = len(md_files)
     
     print(f"📁 找到 {total_files} 个 md 文件")
@@ -149,6 +200,11 @@ def main():
             error_files.append(str(md_file))
             print(f"⚠️  未找到数据: {md_file.name}")
     
+    save_outputs(all_books, category_stats, total_files, success_files, error_files)
+
+
+def save_outputs(all_books, category_stats, total_files, success_files, error_files):
+    """保存 JSON 文件和统计信息"""
     # 保存结果
     OUTPUT_JSON.parent.mkdir(exist_ok=True)
     
@@ -189,4 +245,12 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description='生成 docs/all-books.json')
+    parser.add_argument('--from-store', action='store_true',
+                        help='从书籍数据库 md/books.sqlite 生成，不解析 md 文件')
+    sys.path.insert(0, str(ROOT / "scripts" / "sync"))
+    from profiling import add_profile_arguments, run_profiled
+    add_profile_arguments(parser, sample_help='只解析按文件名排序的前 N 个 md 文件（不同运行的剖析结果可以直接比较）')
+    args = parser.parse_args()
+    run_profiled('parse_md_to_json', lambda: main(from_store=args.from_store, sample=args.profile_sample), args)
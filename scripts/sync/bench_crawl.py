@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线抓取基准测试：在本地替身站点上运行完整的抓取流程，衡量抓取器改动的效果
+
+在独立进程中启动替身站点（standin_site.py），然后对每个ID规模分别在全新的临时输出目录中
+运行 test_batch_sync（抓取 → 解析 → 写入 → 生成md文件），不访问网络和正式站点。
+
+每个规模报告：
+    - 每秒处理的ID数和书籍数（按抓取阶段的耗时计算，不含进程启动和生成md文件）
+    - 详情页 / 下载页请求耗时的 p50 / p99（由指标直方图按桶线性插值估算）
+    - 峰值RSS（抓取进程及其解析子进程中最大的一个）
+    - 各阶段CPU时间（抓取、解析、写入、生成md文件，见 crawl_metrics 的 crawl_cpu_seconds_total）
+
+用法：
+    python3 bench_crawl.py                                   # 1k / 10k / 100k 个ID
+    python3 bench_crawl.py --sizes 1000 --latency 20 --latency-jitter 10
+    python3 bench_crawl.py --sizes 1000,10000 --error-rate 0.02 --page-size 30000 --output bench.json
+
+注意：替身站点和抓取进程在同一台机器上运行，单核机器上两者争抢CPU，结果只适合互相比较。
+"""
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from parse_book_detail_enhanced import HTML_PARSER_BACKENDS
+
+SCRIPT_DIR = Path(__file__).parent
+DEFAULT_SIZES = '1000,10000,100000'
+STAGES = ('fetch', 'parse', 'write', 'render')
+STAGE_LABELS = {'fetch': '抓取', 'parse': '解析', 'write': '写入', 'render': '生成md'}
+
+
+def free_port() -> int:
+    """找一个空闲的本地端口"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_site(args, port: int, max_id: int, log_file: Path) -> subprocess.Popen:
+    """
+    在独立进程中启动替身站点，等待端口可以连接
+
+    Args:
+        args: 命令行参数
+        port: 监听端口
+        max_id: 最大书籍ID
+        log_file: 站点输出的日志文件
+
+    Returns:
+        站点进程
+    """
+    command = [sys.executable, str(SCRIPT_DIR / "standin_site.py"), '--port', str(port),
+               '--max-id', str(max_id), '--missing-rate', str(args.missing_rate),
+               '--latency', str(args.latency), '--latency-jitter', str(args.latency_jitter),
+               '--error-rate', str(args.error_rate), '--page-size', str(args.page_size)]
+    with open(log_file, 'w', encoding='utf-8') as log:
+        site = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if site.poll() is not None:
+            raise RuntimeError(f"替身站点启动失败，见 {log_file}")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return site
+        except OSError:
+            time.sleep(0.2)
+    site.kill()
+    raise RuntimeError("替身站点 30 秒内没有开始监听")
+
+
+def histogram_quantile(entry: Dict, bounds: List[float], quantile: float) -> Optional[float]:
+    """
+    按桶线性插值估算直方图的分位数（与 Prometheus histogram_quantile 相同的方法）
+
+    Args:
+        entry: metrics.json 中的一个直方图序列（buckets 为各桶的计数，不累加）
+        bounds: 桶上界
+        quantile: 分位数（0-1）
+
+    Returns:
+        估算值（秒）；没有记录时返回None
+    """
+    count = entry['count']
+    if count == 0:
+        return None
+    rank = quantile * count
+    cumulative = 0
+    for index, bucket_count in enumerate(entry['buckets']):
+        if cumulative + bucket_count >= rank and bucket_count > 0:
+            if index >= len(bounds):
+                return bounds[-1]  # 落在 +Inf 桶中，只能给出下界
+            lower = bounds[index - 1] if index > 0 else 0.0
+            return lower + (bounds[index] - lower) * (rank - cumulative) / bucket_count
+        cumulative += bucket_count
+    return bounds[-1]
+
+
+def summarize_metrics(snapshot: Dict) -> Dict:
+    """从 metrics.json 快照中取出基准测试关心的数值"""
+    bounds = snapshot['latency_buckets']
+    latency = {}
+    for entry in snapshot['histograms'].get('crawl_request_seconds', []):
+        kind = entry['labels'].get('kind')
+        latency[kind] = {'p50': histogram_quantile(entry, bounds, 0.5),
+                         'p99': histogram_quantile(entry, bounds, 0.99),
+                         'count': entry['count']}
+    counters = snapshot['counters']
+    cpu = {entry['labels']['stage']: entry['value'] for entry in counters.get('crawl_cpu_seconds_total', [])}
+    books = {entry['labels']['status']: entry['value'] for entry in counters.get('crawl_books_total', [])}
+    retries = sum(entry['value'] for entry in counters.get('crawl_retries_total', []))
+    return {'latency': latency, 'cpu_seconds': cpu, 'books': books, 'retries': retries}
+
+
+def run_crawl(size: int, site_url: str, output_dir: Path, args) -> Dict:
+    """
+    在全新的输出目录中抓取ID 1-size，返回本次运行的测量结果
+
+    Args:
+        size: ID数量
+        site_url: 替身站点地址
+        output_dir: 输出目录（必须是空目录）
+        args: 命令行参数
+
+    Returns:
+        测量结果
+    """
+    env = dict(os.environ)
+    env.update({
+        'OUTPUT_DIR': str(output_dir.resolve()),
+        'BOOK_SITE_DOMAIN': site_url,
+        'HTTP_CACHE': '0',
+        'RATE_LIMIT_DEFAULT': str(args.rate),
+        'RATE_LIMIT_MIN': str(args.rate),
+        'RATE_LIMIT_MAX': str(args.rate),
+        'RETRY_BASE_DELAY': '0.1',
+        'METRICS': '1',
+        'METRICS_INTERVAL': '3600',
+    })
+    if args.parser:
+        env['HTML_PARSER'] = args.parser
+    if args.parse_workers is not None:
+        env['PARSE_WORKERS'] = str(args.parse_workers)
+
+    log_file = output_dir.parent / f"crawl-{size}.log"
+    command = [sys.executable, str(SCRIPT_DIR / "test_batch_sync.py"), '--start-id', '1', '--end-id', str(size)]
+    started = time.monotonic()
+    with open(log_file, 'w', encoding='utf-8') as log:
+        process = subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT)
+        # wait4 取得这个子进程（及其已回收的解析进程）的资源占用
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+    wall_seconds = time.monotonic() - started
+    if process.returncode != 0:
+        raise RuntimeError(f"抓取进程退出码 {process.returncode}，见 {log_file}")
+
+    stats = json.loads((output_dir / "stats.json").read_text(encoding='utf-8'))
+    snapshot = json.loads((output_dir / "metrics.json").read_text(encoding='utf-8'))
+    summary = summarize_metrics(snapshot)
+    crawl_seconds = stats.get('elapsed_time') or wall_seconds
+    ok_books = summary['books'].get('ok', 0)
+    return {
+        'ids': size,
+        'books': ok_books,
+        'crawl_seconds': round(crawl_seconds, 3),
+        'wall_seconds': round(wall_seconds, 3),
+        'ids_per_second': round(size / crawl_seconds, 1),
+        'books_per_second': round(ok_books / crawl_seconds, 1),
+        'latency_ms': {kind: {key: (round(value * 1000, 1) if key != 'count' and value is not None else value)
+                              for key, value in values.items()}
+                       for kind, values in summary['latency'].items()},
+        'peak_rss_mb': round(usage.ru_maxrss / 1024, 1),  # Linux 上 ru_maxrss 的单位是KB
+        'cpu_seconds': {stage: round(summary['cpu_seconds'].get(stage, 0.0), 3) for stage in STAGES},
+        'process_cpu_seconds': round(usage.ru_utime + usage.ru_stime, 3),
+        'status_counts': summary['books'],
+        'retries': summary['retries'],
+    }
+
+
+def format_result(result: Dict) -> str:
+    """一个规模的结果（多行文本）"""
+    lines = [f"📦 {result['ids']} 个ID：抓取 {result['crawl_seconds']:.1f} 秒（进程总计 {result['wall_seconds']:.1f} 秒）",
+             f"  - 吞吐量: {result['ids_per_second']:.1f} ID/秒，{result['books_per_second']:.1f} 本书/秒"
+             f"（找到 {result['books']} 本，重试 {result['retries']:g} 次）"]
+    for kind, kind_label in (('detail', '详情页'), ('download', '下载页')):
+        latency = result['latency_ms'].get(kind)
+        if latency:
+            lines.append(f"  - {kind_label}请求耗时: p50 {latency['p50']} ms，p99 {latency['p99']} ms"
+                         f"（{latency['count']} 次）")
+    lines.append(f"  - 峰值RSS: {result['peak_rss_mb']:.1f} MB")
+    cpu = '，'.join(f"{STAGE_LABELS[stage]} {result['cpu_seconds'][stage]:.2f}s" for stage in STAGES)
+    lines.append(f"  - CPU: {cpu}（进程合计 {result['process_cpu_seconds']:.2f}s）")
+    return '\n'.join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='在本地替身站点上运行抓取基准测试')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'逗号分隔的ID数量（默认：{DEFAULT_SIZES}）')
+    parser.add_argument('--latency', type=float, default=0.0, help='站点响应延迟（毫秒，默认：0）')
+    parser.add_argument('--latency-jitter', type=float, default=0.0, help='响应延迟的随机波动（毫秒，默认：0）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='站点随机返回 503 的比例（默认：0）')
+    parser.add_argument('--missing-rate', type=float, default=1 / 7, help='不存在的ID的比例（默认：1/7）')
+    parser.add_argument('--page-size', type=int, default=20000, help='详情页大小（字节，默认：20000）')
+    parser.add_argument('--rate', type=float, default=1000, help='抓取速率上限（请求/秒，默认：1000）')
+    parser.add_argument('--parser', choices=sorted(HTML_PARSER_BACKENDS), help='HTML解析器')
+    parser.add_argument('--parse-workers', type=int, help='解析进程数（默认：CPU核数，0 表示在事件循环线程内解析）')
+    parser.add_argument('--work-dir', type=Path, help='输出目录和日志的存放位置（默认：临时目录，结束后删除）')
+    parser.add_argument('--output', type=Path, help='把结果写入JSON文件')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    work_dir = args.work_dir or Path(tempfile.mkdtemp(prefix='bench_crawl-'))
+    work_dir.mkdir(parents=True, exist_ok=True)
+    port = free_port()
+    site = start_site(args, port, max(sizes), work_dir / "site.log")
+    print(f"🧪 替身站点: http://localhost:{port}（延迟 {args.latency:g}±{args.latency_jitter:g} ms，"
+          f"错误率 {args.error_rate:g}，不存在的ID {args.missing_rate:.0%}，详情页 {args.page_size} 字节）")
+
+    results = []
+    try:
+        for size in sizes:
+            output_dir = work_dir / f"out-{size}"
+            if output_dir.exists():
+                shutil.rmtree(output_dir)
+            print(f"\n⏳ 抓取 {size} 个ID...")
+            result = run_crawl(size, f"http://localhost:{port}", output_dir, args)
+            results.append(result)
+            print(format_result(result))
+    finally:
+        site.terminate()
+        site.wait()
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        report = {
+            'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'site': {'latency_ms': args.latency, 'latency_jitter_ms': args.latency_jitter,
+                     'error_rate': args.error_rate, 'missing_rate': args.missing_rate,
+                     'page_size': args.page_size},
+            'rate': args.rate,
+            'parser': args.parser or os.getenv('HTML_PARSER', 'html.parser'),
+            'cpu_count': os.cpu_count(),
+            'results': results,
+        }
+        args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f"\n💾 结果已保存: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,642 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+详情页解析基准测试：对比改写前（html.parser 完整文档 + 多次遍历）与当前的提取逻辑
+
+- 逐页检查两种实现的输出完全一致
+- 分别统计每秒可解析的页面数
+
+页面来源（任选其一或同时使用）：
+    --pages DIR     目录下的 *.html 文件（文件名中的数字视为书籍ID）
+    --archive DIR   test_batch_sync 生成的原始页面归档（默认 md/.archive）
+
+用法：
+    python3 bench_parser.py --archive ../../md/.archive --limit 2000 --repeat 3
+    python3 bench_parser.py --archive ../../md/.archive --parser lxml
+    python3 bench_parser.py --archive ../../md/.archive --scoped-parse   # 打开 PARSE_SCOPE=regions 前确认输出一致
+
+解析性能回归检查（--corpus）：
+    在固定的页面样本（bench_corpus/，见其中的 manifest.json）上逐页计时详情页解析、
+    下载页解析（三种查找方法）以及模拟网络请求的 parse_book_detail_enhanced，
+    输出与 manifest 中记录的结果不一致，或每秒页面数比基准（bench_corpus/baseline.json）
+    下降超过 --threshold 时返回非0。同时输出各步骤（建文档树、扫描、简介提取、其余字段）的平均耗时，
+    步骤计时通过临时替换解析模块中的函数实现，不改动正式的解析函数。
+
+    python3 bench_parser.py --corpus                      # 检查（基准中没有当前解析器时只输出结果）
+    python3 bench_parser.py --corpus --update-baseline    # 在当前机器上重新记录基准
+    python3 bench_parser.py --corpus --update-expected    # 有意修改解析结果后重新记录期望输出
+
+    基准同时记录一段固定纯 Python 工作量的速度，比较时按它折算，不同机器上的结果大致可比；
+    结果仍有波动，阈值不宜设得太小。
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from unittest import mock
+
+from bs4 import BeautifulSoup
+from urllib.parse import urljoin
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+import parse_book_detail_enhanced
+from parse_book_detail_enhanced import (
+    HTML_PARSER_BACKENDS,
+    get_parser_backend,
+    new_book_result,
+    parse_book_detail_enhanced as parse_book_detail_with_requests,
+    parse_book_detail_html,
+    parse_download_page_html,
+    parse_scope_enabled,
+)
+from html_archive import KIND_DETAIL, HtmlArchive, read_entry
+
+
+def legacy_parse_book_detail_html(html, url: str, encoding: Optional[str] = None) -> Dict:
+    """
+    改写前的详情页解析逻辑（多次遍历文档树），作为对比基准和输出一致性的参照
+    
+    Args:
+        html: 详情页 HTML 内容（str 或 bytes）
+        url: 详情页 URL，用于提取书籍ID和补全相对链接
+        encoding: html 为 bytes 时的字符集（例如响应头中的 charset），None 则自动检测
+    
+    Returns:
+        Dict: 字段同 parse_book_detail_enhanced，其中 download_url 为空，
+              由调用方抓取 download_page 后用 parse_download_page_html 填充
+    """
+    result = new_book_result(url)
+    
+    try:
+        # 解析 HTML
+        soup = BeautifulSoup(html, 'html.parser', from_encoding=encoding)
+        
+        # 1. 提取书名
+        title_elem = soup.select_one('h4.post-title')
+        if title_elem:
+            result["title"] = title_elem.get_text(strip=True)
+        
+        if not result["title"]:
+            post_info = soup.select_one('.post-info')
+            if post_info:
+                for li in post_info.find_all('li'):
+                    strong = li.find('strong')
+                    if strong and '书名' in strong.get_text():
+                        title_text = li.get_text().replace('书名：', '').strip()
+                        if title_text:
+                            result["title"] = title_text
+                            break
+        
+        # 2. 提取作者信息
+        post_info = soup.select_one('.post-info')
+        if post_info:
+            for li in post_info.find_all('li'):
+                strong = li.find('strong')
+                if strong and '作者' in strong.get_text():
+                    author_links = li.find_all('a', href=lambda x: x and 'book-author' in str(x) if x else False)
+                    if author_links:
+                        authors = [link.get_text(strip=True) for link in author_links if link.get_text(strip=True)]
+                        if authors:
+                            result["author"] = " / ".join(authors)
+                    else:
+                        author_text = li.get_text().replace('作者：', '').strip()
+                        if author_text:
+                            result["author"] = author_text
+                    break
+        
+        # 3. 提取封面图片
+        img_elem = soup.select_one('.post-content img')
+        if img_elem:
+            img_src = img_elem.get('src', '')
+            if img_src:
+                result["cover_image"] = urljoin(url, img_src)
+        
+        # 4. 提取下载页面URL（实际下载链接需要进一步解析下载页）
+        download_elem = soup.select_one('.post-download a')
+        if download_elem:
+            download_href = download_elem.get('href', '')
+            if download_href:
+                result["download_page"] = urljoin(url, download_href)
+        
+        # 5. 提取标签列表（关键功能）
+        # 方法1：直接查找包含 book-tag 的链接（最可靠）
+        tag_links = soup.find_all('a', href=lambda x: x and 'book-tag' in str(x) if x else False)
+        if tag_links:
+            tags = []
+            for link in tag_links:
+                tag_text = link.get_text(strip=True)
+                # 格式可能是 "中国(5333)" 或 "中国"
+                if '(' in tag_text:
+                    tag_name = tag_text.split('(')[0].strip()
+                else:
+                    tag_name = tag_text
+                
+                # 过滤掉空标签和数字标签（如年份）
+                if tag_name and tag_name not in tags:
+                    # 跳过纯数字标签（如年份）
+                    if not tag_name.isdigit():
+                        tags.append(tag_name)
+            
+            result["tags"] = tags
+        
+        # 方法2：如果方法1没找到，尝试查找"标签："后面的内容
+        if not result["tags"]:
+            for elem in soup.find_all(['div', 'p', 'span', 'strong']):
+                text = elem.get_text()
+                if '标签' in text and ('：' in text or ':' in text):
+                    # 查找父元素或兄弟元素中的标签链接
+                    parent = elem.find_parent()
+                    if parent:
+                        tag_links = parent.find_all('a', href=lambda x: x and 'book-tag' in str(x) if x else False)
+                        if tag_links:
+                            tags = []
+                            for link in tag_links:
+                                tag_text = link.get_text(strip=True)
+                                if '(' in tag_text:
+                                    tag_name = tag_text.split('(')[0].strip()
+                                else:
+                                    tag_name = tag_text
+                                if tag_name and tag_name not in tags and not tag_name.isdigit():
+                                    tags.append(tag_name)
+                            if tags:
+                                result["tags"] = tags
+                                break
+        
+        # 6. 提取分类
+        category_link = soup.find('a', href=lambda x: x and 'book-category' in str(x) if x else False)
+        if category_link:
+            result["category"] = category_link.get_text(strip=True)
+        
+        # 7. 提取其他信息（ISBN、评分、发布日期等）
+        if post_info:
+            for li in post_info.find_all('li'):
+                strong = li.find('strong')
+                if not strong:
+                    continue
+                
+                strong_text = strong.get_text()
+                li_text = li.get_text()
+                
+                if 'ISBN' in strong_text:
+                    result["isbn"] = li_text.replace('ISBN：', '').replace('ISBN:', '').strip()
+                elif '评分' in strong_text:
+                    rating_text = li_text.replace('评分：', '').replace('评分:', '').strip()
+                    result["rating"] = rating_text
+                elif '时间' in strong_text or '日期' in strong_text:
+                    date_text = li_text.replace('时间：', '').replace('日期：', '').strip()
+                    result["publish_date"] = date_text
+                elif '格式' in strong_text:
+                    formats_text = li_text.replace('格式：', '').replace('格式:', '').strip()
+                    result["formats"] = [f.strip() for f in formats_text.split(',') if f.strip()]
+        
+        # 8. 提取内容简介
+        desc_elem = soup.find(string=re.compile(r'内容简介'))
+        if desc_elem:
+            # 查找简介内容（通常在"内容简介"后面的元素中）
+            parent = desc_elem.find_parent()
+            if parent:
+                # 查找下一个兄弟元素或父元素中的文本
+                desc_text = ""
+                for sibling in parent.next_siblings:
+                    if hasattr(sibling, 'get_text'):
+                        desc_text = sibling.get_text(strip=True)
+                        if desc_text:
+                            break
+                
+                if not desc_text:
+                    # 尝试从父元素中提取
+                    desc_text = parent.get_text(strip=True)
+                    # 去掉"内容简介："前缀
+                    desc_text = re.sub(r'内容简介[：:]?\s*', '', desc_text)
+                
+                result["description"] = desc_text[:500]  # 限制长度
+        
+        # 9. 提取作者简介
+        author_bio_elem = soup.find(string=re.compile(r'作者简介'))
+        if author_bio_elem:
+            parent = author_bio_elem.find_parent()
+            if parent:
+                bio_text = ""
+                for sibling in parent.next_siblings:
+                    if hasattr(sibling, 'get_text'):
+                        bio_text = sibling.get_text(strip=True)
+                        if bio_text:
+                            break
+                
+                if not bio_text:
+                    bio_text = parent.get_text(strip=True)
+                    bio_text = re.sub(r'作者简介[：:]?\s*', '', bio_text)
+                
+                result["author_bio"] = bio_text[:300]  # 限制长度
+        
+        return result
+        
+    except Exception as e:
+        print(f"❌ 解析过程出错: {e}")
+        import traceback
+        traceback.print_exc()
+        return result
+
+
+
+def load_pages(pages_dir: Optional[Path], archive_dir: Optional[Path], limit: int) -> List[Tuple[bytes, str, Optional[str]]]:
+    """
+    加载待测页面
+    
+    Returns:
+        [(页面字节, 详情页URL, 字符集)]
+    """
+    pages = []
+    if pages_dir:
+        for path in sorted(Path(pages_dir).glob('*.html')):
+            match = re.search(r'(\d+)', path.stem)
+            book_id = match.group(1) if match else '0'
+            pages.append((path.read_bytes(), f"https://example.com/book-content-{book_id}.html", None))
+    if archive_dir:
+        archive = HtmlArchive(archive_dir)
+        for book_id in archive.book_ids():
+            entry = archive.get(book_id, KIND_DETAIL)
+            pages.append((read_entry(archive.archive_dir, entry), entry['url'], entry.get('charset')))
+            if limit and len(pages) >= limit:
+                break
+    return pages[:limit] if limit else pages
+
+
+def bench(func, pages, repeat: int) -> Tuple[float, List[Dict]]:
+    """
+    计时解析所有页面
+    
+    Returns:
+        (每秒页面数, 最后一轮的解析结果)
+    """
+    results = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        results = [func(body, url, charset) for body, url, charset in pages]
+    elapsed = time.perf_counter() - started
+    return len(pages) * repeat / elapsed, results
+
+
+CORPUS_DIR = Path(__file__).parent / "bench_corpus"
+MANIFEST_NAME = "manifest.json"
+BASELINE_NAME = "baseline.json"
+DEFAULT_THRESHOLD = 0.2  # 每秒页面数比基准下降超过 20% 时判定为变慢
+CORPUS_KINDS = (('detail', '详情页'), ('download', '下载页'), ('enhanced', '详情页+下载页（模拟请求）'))
+
+
+def calibration_workload():
+    """固定的纯 Python 工作量（字符串处理、字典和列表操作），用于折算不同机器的速度"""
+    counts = {}
+    for index in range(2000):
+        word = f"tag{index % 97}"
+        counts[word] = counts.get(word, 0) + len(word.upper().strip())
+    return sorted(counts.items())
+
+
+def time_calls(calls: List[Callable], rounds: int, min_round_time: float = 0.05) -> List[float]:
+    """
+    交替多轮计时一组无参数函数，返回每个函数最快一轮中每次调用的耗时（秒）
+    
+    每轮依次计时所有函数（每个函数重复到至少 min_round_time 秒），机器速度短时间波动时
+    只影响各函数的某一轮，不会让同一个函数的所有轮都变慢。
+    """
+    repeats = []
+    for func in calls:
+        started = time.perf_counter()
+        func()
+        repeats.append(max(1, int(min_round_time / max(time.perf_counter() - started, 1e-6))))
+    best = [float('inf')] * len(calls)
+    for _ in range(rounds):
+        for index, (func, repeat) in enumerate(zip(calls, repeats)):
+            started = time.perf_counter()
+            for _ in range(repeat):
+                func()
+            best[index] = min(best[index], (time.perf_counter() - started) / repeat)
+    return best
+
+
+class FakeResponse:
+    """模拟 requests.get 的响应（只提供解析函数用到的属性）"""
+    
+    def __init__(self, text: str):
+        self.text = text
+    
+    def raise_for_status(self):
+        pass
+
+
+def load_corpus(corpus_dir: Path) -> List[Dict]:
+    """读取 manifest.json 和其中列出的页面（页面字节放在 body 字段中）"""
+    entries = json.loads((corpus_dir / MANIFEST_NAME).read_text(encoding='utf-8'))
+    for entry in entries:
+        entry['body'] = (corpus_dir / entry['file']).read_bytes()
+    return entries
+
+
+# 计时的步骤：解析模块中被临时替换为计时包装的函数名 -> 步骤名
+STEP_HOOKS = (
+    ('BeautifulSoup', 'document'),
+    ('UnicodeDammit', 'document'),
+    ('scan_detail_document', 'scan'),
+    ('_section_text', 'sections'),
+    ('scan_detail_tree', 'scan'),
+)
+
+
+def _timed(func: Callable, step: str, timings: Dict[str, float]) -> Callable:
+    """包装 func，把每次调用的耗时累加到 timings[step]"""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings[step] = timings.get(step, 0.0) + time.perf_counter() - start
+    return wrapper
+
+
+def time_steps(call: Callable, rest_step: str, timings: Dict[str, float]):
+    """
+    调用一次 call，按步骤把耗时累加到 timings
+    
+    STEP_HOOKS 中的函数（以及 selectolax 的 LexborHTMLParser）在调用期间被替换为计时包装，
+    总耗时中不属于这些函数的部分记到 rest_step 上。
+    
+    Args:
+        call: 调用解析函数的无参数函数
+        rest_step: 其余耗时的步骤名（详情页为 fields，下载页为 search）
+        timings: 步骤名 -> 累计秒数
+    """
+    steps: Dict[str, float] = {}
+    with contextlib.ExitStack() as stack:
+        for name, step in STEP_HOOKS:
+            func = getattr(parse_book_detail_enhanced, name)
+            stack.enter_context(mock.patch.object(parse_book_detail_enhanced, name, _timed(func, step, steps)))
+        try:
+            from selectolax import lexbor
+        except ImportError:
+            pass
+        else:
+            stack.enter_context(mock.patch.object(
+                lexbor, 'LexborHTMLParser', _timed(lexbor.LexborHTMLParser, 'document', steps)))
+        start = time.perf_counter()
+        call()
+        total = time.perf_counter() - start
+    steps[rest_step] = total - sum(steps.values())
+    for step, seconds in steps.items():
+        timings[step] = timings.get(step, 0.0) + seconds
+
+
+def corpus_calls(entry: Dict, by_name: Dict[str, Dict]) -> List[Tuple[str, Callable, Optional[str]]]:
+    """
+    一个样本页面要计时的调用
+    
+    Returns:
+        [(类别, 调用解析函数并返回结果的无参数函数, 按步骤计时时其余耗时的步骤名，None 表示不分步骤计时)]
+    """
+    body, url, charset = entry['body'], entry['url'], entry.get('charset')
+    if entry['kind'] == 'download':
+        return [('download', lambda: parse_download_page_html(body, charset), 'search')]
+    
+    calls = [('detail', lambda: parse_book_detail_html(body, url, charset), 'fields')]
+    if entry.get('expected', {}).get('download_page') and entry.get('download'):
+        # 模拟网络请求：详情页和下载页都从样本中返回，计时 requests 之后的全部解析逻辑
+        download_entry = by_name[entry['download']]
+        responses = {url: body.decode(charset or 'utf-8'),
+                     entry['expected']['download_page']: download_entry['body'].decode(
+                         download_entry.get('charset') or 'utf-8')}
+        
+        def enhanced():
+            with mock.patch.object(parse_book_detail_enhanced.requests, 'get',
+                                   side_effect=lambda request_url, **kwargs: FakeResponse(responses[request_url])):
+                return parse_book_detail_with_requests(url)
+        
+        calls.append(('enhanced', enhanced, None))
+    return calls
+
+
+def expected_output(entry: Dict, kind: str, by_name: Dict[str, Dict]) -> Optional[Dict]:
+    """一个调用的期望输出（模拟请求时为详情页结果加上下载页给出的下载链接）"""
+    if kind != 'enhanced':
+        return entry.get('expected')
+    download_expected = by_name[entry['download']].get('expected') or {}
+    return dict(entry['expected'], download_url=download_expected.get('download_url', ''))
+
+
+def run_corpus(args) -> int:
+    """
+    在样本页面上检查解析结果并与基准比较
+    
+    Returns:
+        进程退出码：0 表示通过，1 表示解析结果不一致或变慢
+    """
+    corpus_dir = args.corpus
+    entries = load_corpus(corpus_dir)
+    by_name = {entry['name']: entry for entry in entries}
+    backend_key = f"{get_parser_backend()}/{'scoped' if parse_scope_enabled() else 'full'}"
+    
+    print("=" * 80)
+    print(f"📊 解析性能回归检查：{len(entries)} 个样本页面（{corpus_dir}）")
+    print(f"🧩 解析器: {backend_key}，每页 {args.rounds} 轮取最快")
+    print("=" * 80)
+    
+    if args.update_expected:
+        for entry in entries:
+            if entry['kind'] == 'download':
+                entry['expected'] = parse_download_page_html(entry['body'], entry.get('charset'))
+            else:
+                entry['expected'] = parse_book_detail_html(entry['body'], entry['url'], entry.get('charset'))
+        manifest = [{key: value for key, value in entry.items() if key != 'body'} for entry in entries]
+        (corpus_dir / MANIFEST_NAME).write_text(json.dumps(manifest, ensure_ascii=False, indent=2) + '\n',
+                                               encoding='utf-8')
+        print(f"📝 已重新记录期望输出: {corpus_dir / MANIFEST_NAME}")
+    
+    # 先检查解析结果，结果不对时计时没有意义
+    mismatches = 0
+    for entry in entries:
+        for kind, call, _ in corpus_calls(entry, by_name):
+            expected = expected_output(entry, kind, by_name)
+            actual = call()
+            if actual != expected:
+                mismatches += 1
+                print(f"❌ 输出与期望不一致: {entry['name']}（{kind}）")
+                if isinstance(actual, dict) and isinstance(expected, dict):
+                    for key in sorted(set(actual) | set(expected)):
+                        if actual.get(key) != expected.get(key):
+                            print(f"   {key}: {str(expected.get(key))[:80]!r} -> {str(actual.get(key))[:80]!r}")
+                else:
+                    print(f"   {expected!r} -> {actual!r}")
+    if mismatches:
+        print(f"❌ {mismatches} 个调用的输出与 manifest 中记录的不一致"
+              f"（有意修改解析结果时用 --update-expected 重新记录）")
+        return 1
+    
+    # 逐页计时（校准工作量和页面一起交替计时）
+    calls = [(entry['name'], kind, call, rest_step)
+             for entry in entries for kind, call, rest_step in corpus_calls(entry, by_name)]
+    seconds = time_calls([calibration_workload] + [call for _, _, call, _ in calls], args.rounds)
+    calibration = 1 / seconds[0]
+    page_rates: Dict[str, Dict[str, float]] = {kind: {} for kind, _ in CORPUS_KINDS}
+    step_times: Dict[str, Dict[str, float]] = {kind: {} for kind, _ in CORPUS_KINDS}
+    step_pages: Dict[str, int] = {kind: 0 for kind, _ in CORPUS_KINDS}
+    for (name, kind, call, rest_step), call_seconds in zip(calls, seconds[1:]):
+        page_rates[kind][name] = 1 / call_seconds
+        if rest_step is not None:
+            timings: Dict[str, float] = {}
+            for _ in range(args.rounds):
+                time_steps(call, rest_step, timings)
+            for step, step_seconds in timings.items():
+                step_times[kind][step] = step_times[kind].get(step, 0.0) + step_seconds / args.rounds
+            step_pages[kind] += 1
+    
+    # 每个类别：整体每秒页面数（每页解析一次）和每页的每秒次数
+    current = {kind: {'pages_per_second': len(rates) / sum(1 / rate for rate in rates.values()), 'pages': rates}
+               for kind, rates in page_rates.items() if rates}
+    
+    baseline_file = corpus_dir / BASELINE_NAME
+    baseline = json.loads(baseline_file.read_text(encoding='utf-8')) if baseline_file.exists() else {}
+    reference = baseline.get('results', {}).get(backend_key)
+    scale = calibration / baseline['calibration'] if reference else 1.0
+    
+    # 每页结果
+    print(f"\n{'页面':<28}{'类别':<10}{'页/秒':>10}{'对比基准':>12}")
+    for kind, _ in CORPUS_KINDS:
+        for name, rate in page_rates[kind].items():
+            change = ''
+            reference_rate = reference.get(kind, {}).get('pages', {}).get(name) if reference else None
+            if reference_rate:
+                change = f"{rate / (reference_rate * scale) - 1:+.1%}"
+            print(f"{name:<28}{kind:<10}{rate:>10.1f}{change:>12}")
+    
+    # 各字段 / 各步骤的平均耗时
+    for kind, label in CORPUS_KINDS:
+        if not step_pages[kind]:
+            continue
+        total = sum(step_times[kind].values())
+        print(f"\n⏱️  {label}各步骤平均耗时（{step_pages[kind]} 个页面）:")
+        for step, seconds in sorted(step_times[kind].items(), key=lambda item: item[1], reverse=True):
+            print(f"  - {step:<14}{seconds / step_pages[kind] * 1e6:>10.1f} µs/页  {seconds / total:>6.1%}")
+    
+    # 与基准比较
+    regressions = []
+    print(f"\n📈 每秒页面数（机器速度折算系数 {scale:.2f}）:")
+    for kind, label in CORPUS_KINDS:
+        if kind not in current:
+            continue
+        rate = current[kind]['pages_per_second']
+        line = f"  - {label}: {rate:.1f} 页/秒"
+        if reference and kind in reference:
+            expected_rate = reference[kind]['pages_per_second'] * scale
+            ratio = rate / expected_rate
+            line += f"（基准折算 {expected_rate:.1f}，{ratio - 1:+.1%}）"
+            if ratio < 1 - args.threshold:
+                regressions.append(label)
+                line += " ❌"
+        print(line)
+    
+    if args.update_baseline:
+        # 其他解析器的基准按本机速度折算后保留，所有基准都以本次的校准速度为准
+        old_scale = calibration / baseline['calibration'] if baseline.get('calibration') else 1.0
+        results = {key: result for key, result in baseline.get('results', {}).items() if key != backend_key}
+        results = {key: {kind: {'pages_per_second': values['pages_per_second'] * old_scale,
+                                'pages': {name: rate * old_scale for name, rate in values['pages'].items()}}
+                         for kind, values in result.items()}
+                   for key, result in results.items()}
+        results[backend_key] = current
+        baseline = {
+            'updated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'calibration': round(calibration, 1),
+            'results': {key: {kind: {'pages_per_second': round(values['pages_per_second'], 1),
+                                     'pages': {name: round(rate, 1) for name, rate in values['pages'].items()}}
+                              for kind, values in result.items()}
+                        for key, result in sorted(results.items())},
+        }
+        baseline_file.write_text(json.dumps(baseline, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+        print(f"\n📝 已更新基准: {baseline_file}（{backend_key}）")
+        return 0
+    
+    if reference is None:
+        print(f"\n⚠️  基准中没有 {backend_key} 的记录，只输出结果（用 --update-baseline 记录）")
+        return 0
+    if regressions:
+        print(f"\n❌ 解析变慢超过 {args.threshold:.0%}: {'、'.join(regressions)}")
+        return 1
+    print(f"\n✅ 解析结果一致，没有超过 {args.threshold:.0%} 的性能下降")
+    return 0
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='详情页解析基准测试（改写前 vs 当前）')
+    parser.add_argument('--pages', type=Path, help='包含 *.html 详情页的目录')
+    parser.add_argument('--archive', type=Path, help='原始页面归档目录')
+    parser.add_argument('--limit', type=int, default=0, help='最多测试的页面数（默认：全部）')
+    parser.add_argument('--repeat', type=int, default=1, help='重复轮数（默认：1）')
+    parser.add_argument('--parser', choices=sorted(HTML_PARSER_BACKENDS), help='当前实现使用的HTML解析器')
+    parser.add_argument('--scoped-parse', action='store_true',
+                        help='当前实现只构建需要的区域（默认构建完整文档树），与 --archive 一起用于在真实页面上确认输出一致')
+    parser.add_argument('--corpus', type=Path, nargs='?', const=CORPUS_DIR,
+                        help=f'在样本页面上做解析性能回归检查（默认样本目录：{CORPUS_DIR.name}/）')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'--corpus：每秒页面数下降超过这个比例时失败（默认：{DEFAULT_THRESHOLD}）')
+    parser.add_argument('--rounds', type=int, default=10, help='--corpus：每个页面计时的轮数（默认：10）')
+    parser.add_argument('--update-baseline', action='store_true', help='--corpus：用本次结果更新基准')
+    parser.add_argument('--update-expected', action='store_true', help='--corpus：用当前解析结果更新期望输出')
+    args = parser.parse_args()
+    
+    if args.parser:
+        os.environ['HTML_PARSER'] = args.parser
+    if args.scoped_parse:
+        os.environ['PARSE_SCOPE'] = 'regions'
+    
+    if args.corpus:
+        return run_corpus(args)
+    
+    if not args.pages and not args.archive:
+        default_archive = Path(__file__).parent.parent.parent / "md" / ".archive"
+        args.archive = default_archive
+    
+    pages = load_pages(args.pages, args.archive, args.limit)
+    if not pages:
+        print("❌ 没有找到可测试的页面")
+        return 1
+    
+    print("=" * 80)
+    print(f"📊 详情页解析基准测试：{len(pages)} 个页面 × {args.repeat} 轮")
+    print(f"🧩 当前实现: {get_parser_backend()}（{'完整文档' if not parse_scope_enabled() else '仅需要的区域'}）")
+    print("=" * 80)
+    
+    before_rate, before = bench(legacy_parse_book_detail_html, pages, args.repeat)
+    after_rate, after = bench(parse_book_detail_html, pages, args.repeat)
+    
+    # 检查输出一致性
+    mismatches = 0
+    for (body, url, _), old, new in zip(pages, before, after):
+        if old != new:
+            mismatches += 1
+            if mismatches <= 5:
+                diff = {k: (old.get(k), new.get(k)) for k in old if old.get(k) != new.get(k)}
+                print(f"❌ 输出不一致: {url}")
+                for key, (old_value, new_value) in diff.items():
+                    print(f"   {key}: {old_value!r} -> {new_value!r}")
+    
+    print(f"  - 改写前: {before_rate:.1f} 页/秒")
+    print(f"  - 当前:   {after_rate:.1f} 页/秒（{after_rate / before_rate:.2f}x）")
+    if mismatches:
+        print(f"❌ {mismatches}/{len(pages)} 个页面输出不一致")
+        return 1
+    print(f"✅ {len(pages)} 个页面输出完全一致")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
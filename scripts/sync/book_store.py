@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+书籍数据库：所有书籍、标签和抓取状态的唯一数据源（SQLite）
+
+md/<标签>.md、docs/all-books.json 和 stats.json 中的标签数量都由数据库生成：
+
+- books       每本书一行；站点书籍ID（book_id）或下载链接相同视为同一本书
+- tags        标签
+- book_tags   书籍与标签的对应关系，以及书籍在该标签md文件中的位置
+- crawl_status 每个书籍ID的抓取状态（与 crawl_status.bin 同步，取值见 status_table）
+- link_checks  下载链接的验证记录：上次验证时间、连续失效次数（见 revalidate_links）
+
+抓取结果按批次写入（每个事务 STORE_BATCH_SIZE 本书）。数据库第一次创建时从已有的
+md文件导入书籍（这些书没有站点书籍ID，之后抓取到同一下载链接时自动关联），
+并从 crawl_status.bin 导入抓取状态。
+
+配置（环境变量）：
+    BOOK_STORE   设为 0 时不使用数据库，md文件改为直接合并写入（见 md_merge_writer）
+"""
+
+import json
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from md_merge_writer import split_md_table
+
+STORE_BATCH_SIZE = 500  # 每个写事务包含的书籍数
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY,
+    book_id INTEGER UNIQUE,            -- 站点书籍ID（从md文件导入的书为NULL）
+    title TEXT NOT NULL,
+    author TEXT NOT NULL DEFAULT '',
+    download_url TEXT NOT NULL DEFAULT '',   -- 已把 ?pwd= 改为 ?p=，与md文件一致
+    category TEXT NOT NULL DEFAULT '',
+    isbn TEXT NOT NULL DEFAULT '',
+    rating TEXT NOT NULL DEFAULT '',
+    publish_date TEXT NOT NULL DEFAULT '',
+    cover_image TEXT NOT NULL DEFAULT '',
+    description TEXT NOT NULL DEFAULT '',
+    author_bio TEXT NOT NULL DEFAULT '',
+    formats TEXT NOT NULL DEFAULT '[]',      -- JSON 数组
+    updated_at TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS books_download_url ON books(download_url) WHERE download_url LIKE 'http%';
+CREATE TABLE IF NOT EXISTS tags (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS book_tags (
+    tag_id INTEGER NOT NULL REFERENCES tags(id),
+    book_key INTEGER NOT NULL REFERENCES books(id),
+    position INTEGER NOT NULL,         -- 在标签md文件中的顺序：已有的书保持原位，新书排在末尾
+    PRIMARY KEY (tag_id, book_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS book_tags_book ON book_tags(book_key);
+CREATE INDEX IF NOT EXISTS book_tags_position ON book_tags(tag_id, position);
+CREATE TABLE IF NOT EXISTS crawl_status (
+    book_id INTEGER PRIMARY KEY,
+    status INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS link_checks (
+    download_url TEXT PRIMARY KEY,
+    checked_at REAL NOT NULL,          -- 上次得到明确结果的时间（Unix 时间戳）
+    failures INTEGER NOT NULL DEFAULT 0  -- 连续失效次数，验证有效时清零
+) WITHOUT ROWID;
+"""
+
+BOOK_FIELDS = ('title', 'author', 'download_url', 'category', 'isbn', 'rating',
+               'publish_date', 'cover_image', 'description', 'author_bio')
+
+# md表格行：| 书名 | 作者 | [下载](链接) |，书名和作者中的 | 已转义为 \|
+MD_ROW_PATTERN = re.compile(r'^\|\s*((?:\\\||[^|])+?)\s*\|\s*((?:\\\||[^|])*?)\s*\|\s*\[下载\]\((.+?)\)\s*\|\s*$')
+
+
+def book_store_enabled() -> bool:
+    """是否使用书籍数据库（BOOK_STORE=0 时禁用）"""
+    return os.getenv("BOOK_STORE", "1") != "0"
+
+
+def normalize_download_url(url: str) -> str:
+    """下载链接的规范形式（与md文件一致：?pwd= 改为 ?p=）"""
+    return (url or '').strip().replace('?pwd=', '?p=')
+
+
+def is_link_key(url: str) -> bool:
+    """下载链接能否用来识别同一本书（旧md文件中有 "链接未找到" 之类的占位文字）"""
+    return url.startswith(('http://', 'https://'))
+
+
+def md_file_tag(file_path: Path, text: str) -> str:
+    """md文件对应的标签：优先取表格前的二级标题（跳过版权声明），否则用文件名"""
+    for line in text.split('\n'):
+        if line.startswith('| 书名'):
+            break
+        if line.startswith('# ') and '版权' not in line and '声明' not in line:
+            return line[2:].strip()
+    return file_path.stem
+
+
+def parse_md_rows(rows: Iterable[str]) -> Iterator[Tuple[str, str, str]]:
+    """把md表格行解析为 (书名, 作者, 下载链接)"""
+    for row in rows:
+        match = MD_ROW_PATTERN.match(row.strip())
+        if match:
+            title, author, url = match.groups()
+            yield title.replace('\\|', '|'), author.replace('\\|', '|'), url.strip()
+
+
+class BookStore:
+    """书籍数据库"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._tag_ids: Dict[str, int] = dict(
+            (name, tag_id) for tag_id, name in self.conn.execute("SELECT id, name FROM tags"))
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def is_empty(self) -> bool:
+        """数据库中还没有任何书籍"""
+        return self.conn.execute("SELECT 1 FROM books LIMIT 1").fetchone() is None
+
+    def _tag_id(self, name: str) -> int:
+        tag_id = self._tag_ids.get(name)
+        if tag_id is None:
+            tag_id = self.conn.execute("INSERT INTO tags (name) VALUES (?)", (name,)).lastrowid
+            self._tag_ids[name] = tag_id
+        return tag_id
+
+    def _find_row(self, book_id: Optional[int], download_url: str) -> Tuple[Optional[int], Optional[int]]:
+        """按站点书籍ID和下载链接查找已有的行，返回 (按ID找到的行, 按链接找到的行)"""
+        by_id = by_url = None
+        if book_id is not None:
+            row = self.conn.execute("SELECT id FROM books WHERE book_id = ?", (book_id,)).fetchone()
+            by_id = row[0] if row else None
+        if is_link_key(download_url):
+            # 条件与部分索引 books_download_url 的条件相同，查询才会使用该索引
+            row = self.conn.execute("SELECT id FROM books WHERE download_url = ? AND download_url LIKE 'http%'",
+                                    (download_url,)).fetchone()
+            by_url = row[0] if row else None
+        return by_id, by_url
+
+    def _delete_row(self, key: int):
+        self.conn.execute("DELETE FROM book_tags WHERE book_key = ?", (key,))
+        self.conn.execute("DELETE FROM books WHERE id = ?", (key,))
+
+    def _upsert(self, book: Dict, tags: List[str], replace_tags: bool = True) -> Tuple[int, Set[str]]:
+        """
+        写入一本书（需要在事务中调用）
+
+        Returns:
+            (行号, 受影响的标签：新旧标签的并集)
+        """
+        book_id = int(book['book_id']) if str(book.get('book_id') or '').strip() else None
+        values = {field: str(book.get(field) or '').strip() for field in BOOK_FIELDS}
+        values['download_url'] = normalize_download_url(values['download_url'])
+        values['author'] = values['author'] or '未知'
+        values['formats'] = json.dumps(book.get('formats') or [], ensure_ascii=False)
+        values['updated_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+
+        by_id, by_url = self._find_row(book_id, values['download_url'])
+        key = by_id if by_id is not None else by_url
+        affected: Set[str] = set(tags)
+        if by_id is not None and by_url is not None and by_url != by_id:
+            # 同一下载链接之前属于另一行（通常是从md导入的旧数据），合并到当前书籍，沿用其在各标签中的位置
+            affected |= self.tags_of(by_url)
+            self.conn.execute("UPDATE OR IGNORE book_tags SET book_key = ? WHERE book_key = ?", (key, by_url))
+            self._delete_row(by_url)
+
+        if key is None:
+            columns = ('book_id',) + tuple(values)
+            key = self.conn.execute(
+                f"INSERT INTO books ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                (book_id, *values.values())).lastrowid
+        else:
+            # 重新抓取时下载页失败会得到空链接，不覆盖已有的有效链接
+            assignments = ', '.join(f"{column} = COALESCE(NULLIF(?, ''), {column})" if column == 'download_url'
+                                    else f"{column} = ?" for column in values)
+            self.conn.execute(f"UPDATE books SET book_id = COALESCE(?, book_id), {assignments} WHERE id = ?",
+                              (book_id, *values.values(), key))
+
+        tag_ids = {self._tag_id(tag) for tag in tags}
+        current = {tag_id for (tag_id,) in self.conn.execute(
+            "SELECT tag_id FROM book_tags WHERE book_key = ?", (key,))}
+        if replace_tags and current - tag_ids:
+            affected |= self.tags_of(key)
+            self.conn.executemany("DELETE FROM book_tags WHERE tag_id = ? AND book_key = ?",
+                                  [(tag_id, key) for tag_id in current - tag_ids])
+        for tag_id in tag_ids - current:
+            self.conn.execute(
+                "INSERT INTO book_tags (tag_id, book_key, position) "
+                "SELECT ?, ?, COALESCE(MAX(position), 0) + 1 FROM book_tags WHERE tag_id = ?",
+                (tag_id, key, tag_id))
+        return key, affected
+
+    def tags_of(self, key: int) -> Set[str]:
+        """一本书（行号）当前的标签"""
+        return {name for (name,) in self.conn.execute(
+            "SELECT t.name FROM book_tags bt JOIN tags t ON t.id = bt.tag_id WHERE bt.book_key = ?", (key,))}
+
+    def upsert_books(self, books: Iterable[Tuple[Dict, List[str]]]) -> Tuple[int, Set[str]]:
+        """
+        批量写入抓取到的书籍（每 STORE_BATCH_SIZE 本一个事务）
+
+        Args:
+            books: (书籍信息, 标签列表) 序列
+
+        Returns:
+            (写入的书籍数, 受影响的标签)
+        """
+        written = 0
+        affected: Set[str] = set()
+        self.conn.execute("BEGIN")
+        try:
+            for book, tags in books:
+                _, book_affected = self._upsert(book, tags)
+                affected |= book_affected
+                written += 1
+                if written % STORE_BATCH_SIZE == 0:
+                    self.conn.execute("COMMIT")
+                    self.conn.execute("BEGIN")
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return written, affected
+
+    def add_book_tags(self, memberships: Dict[int, Set[str]]) -> Tuple[Set[str], Set[int]]:
+        """
+        给已有的书籍追加标签（来自标签列表页，不改动书籍信息和已有标签）
+
+        Args:
+            memberships: 站点书籍ID -> 要追加的标签
+
+        Returns:
+            (新增了书籍的标签, 数据库中没有的书籍ID)
+        """
+        affected: Set[str] = set()
+        unknown: Set[int] = set()
+        self.conn.execute("BEGIN")
+        try:
+            for book_id, tags in memberships.items():
+                row = self.conn.execute("SELECT id FROM books WHERE book_id = ?", (book_id,)).fetchone()
+                if row is None:
+                    unknown.add(book_id)
+                    continue
+                for tag in sorted(tags - self.tags_of(row[0])):
+                    tag_id = self._tag_id(tag)
+                    self.conn.execute(
+                        "INSERT INTO book_tags (tag_id, book_key, position) "
+                        "SELECT ?, ?, COALESCE(MAX(position), 0) + 1 FROM book_tags WHERE tag_id = ?",
+                        (tag_id, row[0], tag_id))
+                    affected.add(tag)
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return affected, unknown
+
+    def import_md_dir(self, md_dir: Path) -> int:
+        """
+        从已有的md文件导入书籍（同一下载链接出现在多个文件中时合并标签）
+
+        Args:
+            md_dir: md目录
+
+        Returns:
+            导入的表格行数
+        """
+        imported = 0
+        self.conn.execute("BEGIN")
+        try:
+            for md_file in sorted(md_dir.glob('*.md')):
+                if md_file.name == '热门分类.md':
+                    continue
+                text = md_file.read_text(encoding='utf-8')
+                tag = md_file_tag(md_file, text)
+                _, _, rows, _ = split_md_table(text)
+                for title, author, url in parse_md_rows(rows):
+                    self._upsert({'title': title, 'author': author, 'download_url': url},
+                                 [tag], replace_tags=False)
+                    imported += 1
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return imported
+
+    def tag_books(self, tag: str) -> List[Dict]:
+        """一个标签下的书籍（按md文件中的顺序）"""
+        cursor = self.conn.execute(
+            "SELECT b.title, b.author, b.download_url FROM book_tags bt "
+            "JOIN tags t ON t.id = bt.tag_id JOIN books b ON b.id = bt.book_key "
+            "WHERE t.name = ? ORDER BY bt.position", (tag,))
+        return [{'title': title, 'author': author, 'download_url': url} for title, author, url in cursor]
+
+    def tag_names(self) -> List[str]:
+        """所有有书籍的标签"""
+        return [name for (name,) in self.conn.execute(
+            "SELECT name FROM tags WHERE id IN (SELECT DISTINCT tag_id FROM book_tags) ORDER BY name")]
+
+    def tag_counts(self) -> Dict[str, int]:
+        """各标签中有书名和下载链接的书籍数量（即md文件中的行数）"""
+        return dict(self.conn.execute(
+            "SELECT t.name, COUNT(*) FROM book_tags bt JOIN tags t ON t.id = bt.tag_id "
+            "JOIN books b ON b.id = bt.book_key WHERE b.download_url != '' AND b.title != '' "
+            "GROUP BY t.name ORDER BY t.name"))
+
+    def iter_tag_rows(self) -> Iterator[Tuple[str, str, str, str]]:
+        """按标签、md文件中的顺序返回 (标签, 书名, 作者, 下载链接)，只包含md文件中会出现的书"""
+        return self.conn.execute(
+            "SELECT t.name, b.title, b.author, b.download_url FROM book_tags bt "
+            "JOIN tags t ON t.id = bt.tag_id JOIN books b ON b.id = bt.book_key "
+            "WHERE b.download_url != '' AND b.title != '' ORDER BY t.name, bt.position")
+
+    def link_check_candidates(self) -> Iterator[Tuple[int, Optional[int], str, Optional[float], int, int]]:
+        """
+        所有出现在md文件中的下载链接及其验证记录
+
+        Returns:
+            (行号, 站点书籍ID, 下载链接, 上次验证时间, 连续失效次数, 所在标签中最大的书籍数) 序列
+        """
+        return self.conn.execute(
+            "WITH tag_sizes AS (SELECT tag_id, COUNT(*) AS size FROM book_tags GROUP BY tag_id) "
+            "SELECT b.id, b.book_id, b.download_url, lc.checked_at, COALESCE(lc.failures, 0), MAX(ts.size) "
+            "FROM books b JOIN book_tags bt ON bt.book_key = b.id JOIN tag_sizes ts ON ts.tag_id = bt.tag_id "
+            "LEFT JOIN link_checks lc ON lc.download_url = b.download_url "
+            "WHERE b.download_url LIKE 'http%' AND b.title != '' GROUP BY b.id")
+
+    def record_link_check(self, download_url: str, alive: bool) -> int:
+        """
+        记录一次下载链接验证结果
+
+        Args:
+            download_url: 下载链接
+            alive: 链接是否有效
+
+        Returns:
+            连续失效次数
+        """
+        self.conn.execute(
+            "INSERT INTO link_checks (download_url, checked_at, failures) VALUES (?, ?, ?) "
+            "ON CONFLICT(download_url) DO UPDATE SET checked_at = excluded.checked_at, "
+            "failures = CASE WHEN excluded.failures = 0 THEN 0 ELSE link_checks.failures + 1 END",
+            (download_url, time.time(), 0 if alive else 1))
+        return self.conn.execute("SELECT failures FROM link_checks WHERE download_url = ?",
+                                 (download_url,)).fetchone()[0]
+
+    def dead_links(self) -> List[Dict]:
+        """仍在md文件中、最近一次验证失效的下载链接"""
+        cursor = self.conn.execute(
+            "SELECT b.book_id, b.title, b.author, b.download_url, lc.failures, lc.checked_at, "
+            "(SELECT GROUP_CONCAT(t.name, ',') FROM book_tags bt JOIN tags t ON t.id = bt.tag_id "
+            " WHERE bt.book_key = b.id) "
+            "FROM link_checks lc JOIN books b ON b.download_url = lc.download_url "
+            "WHERE lc.failures > 0 ORDER BY lc.failures DESC, b.id")
+        return [{
+            'book_id': book_id, 'title': title, 'author': author, 'download_url': url,
+            'failures': failures, 'checked_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(checked_at)),
+            'tags': tags.split(',') if tags else [],
+        } for book_id, title, author, url, failures, checked_at, tags in cursor]
+
+    def remove_book(self, key: int) -> Set[str]:
+        """
+        删除一本书（下载链接确认失效后从所有标签中移除）
+
+        Args:
+            key: 行号
+
+        Returns:
+            该书所在的标签
+        """
+        tags = self.tags_of(key)
+        self.conn.execute("BEGIN")
+        self._delete_row(key)
+        self.conn.execute("COMMIT")
+        return tags
+
+    def save_statuses(self, data: bytes) -> int:
+        """
+        把状态表同步到 crawl_status（只写入有变化的ID）
+
+        Args:
+            data: StatusTable.data（第 N 个字节是书籍ID N 的状态）
+
+        Returns:
+            写入的行数
+        """
+        stored = bytearray(len(data))
+        stale = []
+        for book_id, status in self.conn.execute("SELECT book_id, status FROM crawl_status"):
+            if book_id < len(stored):
+                stored[book_id] = status
+            else:
+                stale.append((book_id,))
+        changed = [(book_id, status) for book_id, status in enumerate(data) if stored[book_id] != status]
+        self.conn.execute("BEGIN")
+        self.conn.executemany("DELETE FROM crawl_status WHERE book_id = ?",
+                              [(book_id,) for book_id, status in changed if status == 0] + stale)
+        self.conn.executemany("INSERT OR REPLACE INTO crawl_status (book_id, status) VALUES (?, ?)",
+                              [(book_id, status) for book_id, status in changed if status != 0])
+        self.conn.execute("COMMIT")
+        return len(changed)
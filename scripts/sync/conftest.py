@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""pytest 配置：测试在 tests 目录中，与各同步脚本一样把 scripts/sync 加入模块搜索路径"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+# test_batch_sync.py 是批量抓取脚本，不是测试
+collect_ignore = ["test_batch_sync.py"]
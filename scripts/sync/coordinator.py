@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多机协同抓取：协调器把ID范围切成工作单元，多台机器上的抓取进程领取单元、抓取并上传结果
+
+- 协调器状态保存在 SQLite 文件中；多个进程可以直接共享这个文件（同一台机器或共享磁盘），
+  也可以用 serve 子命令启动一个小型 HTTP 服务，其他机器通过 URL 访问
+- 领取单元时获得租约（默认 10 分钟），抓取过程中定期续约（心跳）；
+  进程崩溃或失联导致租约过期后，单元会被其他进程重新领取
+- 单元抓取完成后上传：排好序的结果日志（gzip）、单元范围内的状态表字节和死信记录
+- 所有单元完成后，reduce 步骤按单元顺序合并结果，生成 md 目录
+
+用法：
+    python3 coordinator.py init --db coord.sqlite --start-id 1 --end-id 60000 --unit-size 2000
+    python3 coordinator.py serve --db coord.sqlite --port 8780        # 可选：提供 HTTP 访问
+    python3 sync_all_books.py --worker --coordinator coord.sqlite      # 或 http://主机:8780
+    python3 sync_all_books.py --reduce --coordinator coord.sqlite
+    python3 coordinator.py status --coordinator coord.sqlite
+"""
+
+import argparse
+import asyncio
+import base64
+import gzip
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import requests
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+LEASE_SECONDS = float(os.getenv("COORDINATOR_LEASE", "600"))  # 租约时长（秒）
+HEARTBEAT_INTERVAL = LEASE_SECONDS / 3  # 续约间隔（秒）
+DEFAULT_UNIT_SIZE = 2000  # 每个工作单元的ID数量
+HTTP_TIMEOUT = 60  # 访问 HTTP 协调器的超时（秒）
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY,
+    start_id INTEGER NOT NULL,
+    end_id INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',   -- pending / leased / done
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS results (
+    unit_id INTEGER PRIMARY KEY REFERENCES units(id),
+    journal BLOB NOT NULL,       -- gzip 压缩、按书籍ID排序的结果日志（JSON Lines）
+    status BLOB NOT NULL,        -- 单元范围内的状态表字节（第 i 个字节对应 start_id + i）
+    dead_letter TEXT NOT NULL,   -- 死信记录（JSON 数组）
+    stats TEXT NOT NULL          -- 单元统计信息（JSON）
+);
+"""
+
+
+def _unit_dict(row) -> Dict:
+    keys = ('id', 'start_id', 'end_id', 'state', 'owner', 'lease_expires', 'attempts', 'finished_at')
+    return dict(zip(keys, row))
+
+
+class SqliteCoordinator:
+    """直接读写 SQLite 文件的协调器（多个进程可共享同一个文件）"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        conn.executescript(SCHEMA)
+        return conn
+
+    def init_units(self, start_id: int, end_id: int, unit_size: int = DEFAULT_UNIT_SIZE) -> int:
+        """
+        创建工作单元（已存在单元时不重复创建）
+
+        Returns:
+            单元总数
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            count = conn.execute("SELECT COUNT(*) FROM units").fetchone()[0]
+            if count == 0:
+                for unit_start in range(start_id, end_id + 1, unit_size):
+                    conn.execute("INSERT INTO units (start_id, end_id) VALUES (?, ?)",
+                                 (unit_start, min(unit_start + unit_size - 1, end_id)))
+                count = conn.execute("SELECT COUNT(*) FROM units").fetchone()[0]
+            conn.execute("COMMIT")
+            return count
+        finally:
+            conn.close()
+
+    def claim(self, worker: str, lease: float = LEASE_SECONDS) -> Optional[Dict]:
+        """领取一个待处理或租约已过期的单元，没有可领取的单元时返回None"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM units WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?) "
+                "ORDER BY id LIMIT 1", (now,)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute("UPDATE units SET state = 'leased', owner = ?, lease_expires = ?, "
+                         "attempts = attempts + 1 WHERE id = ?", (worker, now + lease, row[0]))
+            row = conn.execute("SELECT * FROM units WHERE id = ?", (row[0],)).fetchone()
+            conn.execute("COMMIT")
+            return _unit_dict(row)
+        finally:
+            conn.close()
+
+    def heartbeat(self, unit_id: int, worker: str, lease: float = LEASE_SECONDS) -> bool:
+        """续约；单元已被其他进程领取或已完成时返回False"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE units SET lease_expires = ? WHERE id = ? AND owner = ? AND state = 'leased'",
+                (time.time() + lease, unit_id, worker))
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def complete(self, unit_id: int, worker: str, result: Dict) -> bool:
+        """
+        上传单元结果并标记完成（只有当前持有者可以提交）
+
+        Args:
+            unit_id: 单元ID
+            worker: 抓取进程标识
+            result: {'journal': bytes, 'status': bytes, 'dead_letter': list, 'stats': dict}
+
+        Returns:
+            是否提交成功
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.execute(
+                "UPDATE units SET state = 'done', finished_at = ?, lease_expires = NULL "
+                "WHERE id = ? AND owner = ? AND state = 'leased'", (time.time(), unit_id, worker))
+            if cursor.rowcount != 1:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)", (
+                unit_id, result['journal'], result['status'],
+                json.dumps(result['dead_letter'], ensure_ascii=False),
+                json.dumps(result['stats'], ensure_ascii=False)))
+            conn.execute("COMMIT")
+            return True
+        finally:
+            conn.close()
+
+    def units(self) -> List[Dict]:
+        """所有单元（按ID排序）"""
+        conn = self._connect()
+        try:
+            return [_unit_dict(row) for row in conn.execute("SELECT * FROM units ORDER BY id")]
+        finally:
+            conn.close()
+
+    def result(self, unit_id: int) -> Optional[Dict]:
+        """读取单元结果"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT journal, status, dead_letter, stats FROM results WHERE unit_id = ?",
+                               (unit_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return {'journal': bytes(row[0]), 'status': bytes(row[1]),
+                'dead_letter': json.loads(row[2]), 'stats': json.loads(row[3])}
+
+
+def _encode_result(result: Dict) -> Dict:
+    return dict(result, journal=base64.b64encode(result['journal']).decode('ascii'),
+                status=base64.b64encode(result['status']).decode('ascii'))
+
+
+def _decode_result(data: Dict) -> Dict:
+    return dict(data, journal=base64.b64decode(data['journal']), status=base64.b64decode(data['status']))
+
+
+class HttpCoordinator:
+    """通过 HTTP 访问协调器（接口与 SqliteCoordinator 相同；心跳在后台线程中调用，因此不共用会话）"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip('/')
+
+    def _post(self, path: str, payload: Dict) -> Dict:
+        response = requests.post(self.url + path, json=payload, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+    def _get(self, path: str) -> Dict:
+        response = requests.get(self.url + path, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+    def claim(self, worker: str, lease: float = LEASE_SECONDS) -> Optional[Dict]:
+        return self._post('/claim', {'worker': worker, 'lease': lease})['unit']
+
+    def heartbeat(self, unit_id: int, worker: str, lease: float = LEASE_SECONDS) -> bool:
+        return self._post('/heartbeat', {'unit_id': unit_id, 'worker': worker, 'lease': lease})['ok']
+
+    def complete(self, unit_id: int, worker: str, result: Dict) -> bool:
+        payload = {'unit_id': unit_id, 'worker': worker, 'result': _encode_result(result)}
+        return self._post('/complete', payload)['ok']
+
+    def units(self) -> List[Dict]:
+        return self._get('/units')['units']
+
+    def result(self, unit_id: int) -> Optional[Dict]:
+        data = self._get(f'/result/{unit_id}')['result']
+        return _decode_result(data) if data else None
+
+
+def open_coordinator(spec: str):
+    """根据参数打开协调器：http(s):// 开头为 HTTP 协调器，否则为 SQLite 文件路径"""
+    if spec.startswith(('http://', 'https://')):
+        return HttpCoordinator(spec)
+    return SqliteCoordinator(Path(spec))
+
+
+def serve(db_path: Path, host: str = '0.0.0.0', port: int = 8780):
+    """
+    启动 HTTP 协调器服务（JSON 接口，底层仍是 SQLite 文件）
+
+    Args:
+        db_path: SQLite 文件路径
+        host: 监听地址
+        port: 监听端口
+    """
+    store = SqliteCoordinator(db_path)
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, payload: Dict, status: int = 200):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/units':
+                self._send({'units': store.units()})
+            elif self.path.startswith('/result/'):
+                result = store.result(int(self.path.rsplit('/', 1)[1]))
+                self._send({'result': _encode_result(result) if result else None})
+            else:
+                self._send({'error': 'not found'}, 404)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            if self.path == '/claim':
+                self._send({'unit': store.claim(payload['worker'], payload.get('lease', LEASE_SECONDS))})
+            elif self.path == '/heartbeat':
+                self._send({'ok': store.heartbeat(payload['unit_id'], payload['worker'],
+                                                  payload.get('lease', LEASE_SECONDS))})
+            elif self.path == '/complete':
+                result = _decode_result(payload['result'])
+                self._send({'ok': store.complete(payload['unit_id'], payload['worker'], result)})
+            else:
+                self._send({'error': 'not found'}, 404)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"🛰️  协调器服务已启动: http://{host}:{port}（数据库: {db_path}）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def print_progress(coordinator):
+    """输出各状态的单元数量"""
+    units = coordinator.units()
+    counts = {}
+    for unit in units:
+        counts[unit['state']] = counts.get(unit['state'], 0) + 1
+    print(f"📊 工作单元: 共 {len(units)} 个，待处理 {counts.get('pending', 0)}，"
+          f"进行中 {counts.get('leased', 0)}，已完成 {counts.get('done', 0)}")
+    return counts
+
+
+def _heartbeat_loop(coordinator, unit_id: int, worker: str, stop: threading.Event, lost: threading.Event):
+    """后台续约，租约被其他进程接管时设置 lost"""
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        try:
+            if not coordinator.heartbeat(unit_id, worker):
+                lost.set()
+                return
+        except requests.RequestException as e:
+            print(f"⚠️  续约失败（稍后重试）: {e}")
+
+
+def collect_unit_result(unit: Dict, shard_dir: Path) -> Dict:
+    """
+    收集单元的抓取结果：排序后的结果日志、单元范围内的状态字节和死信记录
+
+    Args:
+        unit: 工作单元
+        shard_dir: 单元的分片目录
+
+    Returns:
+        上传给协调器的结果
+    """
+    import test_batch_sync
+    from result_journal import iter_journal
+    from retry_scheduler import DeadLetterList
+    from status_table import StatusTable
+
+    records = sorted(iter_journal([shard_dir / test_batch_sync.SHARD_JOURNAL_NAME]),
+                     key=lambda record: int(record['book_id']))
+    journal = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+
+    start_id, end_id = unit['start_id'], unit['end_id']
+    status = bytes(StatusTable(shard_dir / test_batch_sync.STATUS_FILE.name).data[start_id:end_id + 1])
+    status += bytes(end_id - start_id + 1 - len(status))
+
+    dead_letter = DeadLetterList(shard_dir / test_batch_sync.DEAD_LETTER_FILE.name)
+    stats_file = shard_dir / test_batch_sync.SHARD_STATS_NAME
+    stats = json.loads(stats_file.read_text(encoding='utf-8')) if stats_file.exists() else {}
+    return {
+        'journal': gzip.compress(journal.encode('utf-8')),
+        'status': status,
+        'dead_letter': [dead_letter.entries[book_id] for book_id in dead_letter.ids(start_id, end_id)],
+        'stats': stats,
+    }
+
+
+def run_worker(coordinator, worker: Optional[str] = None) -> int:
+    """
+    抓取进程主循环：领取单元 → 抓取 → 上传结果，直到没有可领取的单元
+
+    单元在 md/.shards/unit-<ID>/ 中按分片模式抓取（见 test_batch_sync.main 的 shard_dir 参数），
+    进程中断后重新运行会从该目录续传（租约过期前需由同一进程标识重新领取，否则由其他进程重新抓取）。
+
+    Args:
+        coordinator: 协调器（SqliteCoordinator / HttpCoordinator）
+        worker: 进程标识，默认 主机名-进程ID
+
+    Returns:
+        本进程完成的单元数
+    """
+    import test_batch_sync
+
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    print(f"👷 抓取进程 {worker} 已启动")
+    completed = 0
+    while True:
+        unit = coordinator.claim(worker)
+        if unit is None:
+            print(f"✅ 没有可领取的工作单元，本进程共完成 {completed} 个")
+            return completed
+
+        unit_id = unit['id']
+        shard_dir = test_batch_sync.SHARDS_DIR / f"unit-{unit_id}"
+        print(f"\n📦 领取单元 {unit_id}: ID {unit['start_id']}-{unit['end_id']}（第 {unit['attempts']} 次领取）")
+
+        stop, lost = threading.Event(), threading.Event()
+        heartbeat = threading.Thread(target=_heartbeat_loop,
+                                     args=(coordinator, unit_id, worker, stop, lost), daemon=True)
+        heartbeat.start()
+        try:
+            asyncio.run(test_batch_sync.main(unit['start_id'], unit['end_id'], shard_dir=shard_dir))
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        if lost.is_set():
+            print(f"⚠️  单元 {unit_id} 的租约已被其他进程接管，丢弃本次结果")
+        elif coordinator.complete(unit_id, worker, collect_unit_result(unit, shard_dir)):
+            completed += 1
+            print(f"📤 单元 {unit_id} 结果已上传")
+        else:
+            print(f"⚠️  单元 {unit_id} 提交被拒绝（租约已过期并被重新领取）")
+        shutil.rmtree(shard_dir, ignore_errors=True)
+
+
+def _unit_records(coordinator, units: List[Dict]) -> Iterator[Dict]:
+    """按单元顺序流式读取各单元的结果日志（单元不重叠且各自已排序，拼接后整体按书籍ID有序）"""
+    for unit in units:
+        result = coordinator.result(unit['id'])
+        for line in gzip.decompress(result['journal']).decode('utf-8').splitlines():
+            if line.strip():
+                yield json.loads(line)
+
+
+def reduce_results(coordinator) -> bool:
+    """
+    合并所有单元的结果：写回状态表和死信列表，并生成md文件、统计信息和热门分类索引
+
+    Args:
+        coordinator: 协调器
+
+    Returns:
+        是否成功（还有未完成的单元时返回False）
+    """
+    import test_batch_sync
+    from retry_scheduler import DeadLetterList
+    from status_table import STATUS_UNSEEN, format_status_counts
+
+    counts = print_progress(coordinator)
+    units = sorted(coordinator.units(), key=lambda unit: unit['start_id'])
+    if not units or counts.get('done', 0) != len(units):
+        print("❌ 还有未完成的工作单元，无法合并")
+        return False
+
+    print(f"\n🔀 合并 {len(units)} 个工作单元的结果...")
+    test_batch_sync.OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    status_table = test_batch_sync.load_status_table()
+    dead_letter = DeadLetterList(test_batch_sync.DEAD_LETTER_FILE)
+    shard_stats = {}
+    for unit in units:
+        result = coordinator.result(unit['id'])
+        failed = {int(entry['book_id']): entry for entry in result['dead_letter']}
+        for offset, status in enumerate(result['status']):
+            if status == STATUS_UNSEEN:
+                continue
+            book_id = unit['start_id'] + offset
+            status_table.set(book_id, status)
+            if book_id in failed:
+                dead_letter.entries[book_id] = failed[book_id]
+                dead_letter.dirty = True
+            else:
+                dead_letter.discard(book_id)
+        shard_stats[f"{unit['start_id']}-{unit['end_id']}"] = dict(result['stats'], owner=unit['owner'])
+    status_table.checkpoint()
+    dead_letter.save()
+    test_batch_sync.save_status_to_store(status_table)
+
+    start_id, end_id = units[0]['start_id'], units[-1]['end_id']
+    status_counts = status_table.counts(start_id, end_id)
+    print(f"  - 抓取状态: {format_status_counts(status_counts)}")
+    test_batch_sync.generate_outputs(_unit_records(coordinator, units), {
+        'total_worker_time': sum(stats.get('elapsed_time', 0) for stats in shard_stats.values()),
+        'units': len(units),
+        'crawl_status': status_counts,
+        'dead_letter': len(dead_letter.entries),
+        'shards': shard_stats,
+    })
+
+    max_id = max(end_id, test_batch_sync.load_max_book_id())
+    test_batch_sync.save_max_book_id(max_id)
+    print(f"\n📊 最大书籍ID: {max_id}（已保存，用于增量更新）")
+    return True
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='多机协同抓取协调器')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    init_parser = subparsers.add_parser('init', help='创建工作单元')
+    init_parser.add_argument('--db', required=True, help='SQLite 文件路径')
+    init_parser.add_argument('--start-id', type=int, default=1, help='起始书籍ID（默认：1）')
+    init_parser.add_argument('--end-id', type=int, required=True, help='结束书籍ID')
+    init_parser.add_argument('--unit-size', type=int, default=DEFAULT_UNIT_SIZE,
+                             help=f'每个单元的ID数量（默认：{DEFAULT_UNIT_SIZE}）')
+
+    serve_parser = subparsers.add_parser('serve', help='启动 HTTP 协调器服务')
+    serve_parser.add_argument('--db', required=True, help='SQLite 文件路径')
+    serve_parser.add_argument('--host', default='0.0.0.0', help='监听地址（默认：0.0.0.0）')
+    serve_parser.add_argument('--port', type=int, default=8780, help='监听端口（默认：8780）')
+
+    status_parser = subparsers.add_parser('status', help='查看工作单元进度')
+    status_parser.add_argument('--coordinator', required=True, help='SQLite 文件路径或 HTTP 地址')
+
+    worker_parser = subparsers.add_parser('worker', help='领取并抓取工作单元（输出目录由 OUTPUT_DIR 决定）')
+    worker_parser.add_argument('--coordinator', required=True, help='SQLite 文件路径或 HTTP 地址')
+
+    reduce_parser = subparsers.add_parser('reduce', help='合并所有单元的结果并生成md文件')
+    reduce_parser.add_argument('--coordinator', required=True, help='SQLite 文件路径或 HTTP 地址')
+
+    args = parser.parse_args()
+    if args.command == 'init':
+        count = SqliteCoordinator(Path(args.db)).init_units(args.start_id, args.end_id, args.unit_size)
+        print(f"✅ 工作单元: {count} 个（{args.db}）")
+    elif args.command == 'serve':
+        serve(Path(args.db), args.host, args.port)
+    elif args.command == 'status':
+        print_progress(open_coordinator(args.coordinator))
+    elif args.command == 'worker':
+        run_worker(open_coordinator(args.coordinator))
+    elif args.command == 'reduce':
+        if not reduce_results(open_coordinator(args.coordinator)):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+抓取指标：各阶段的计数器、耗时直方图和队列深度，定期写入指标文件
+
+进度输出只能看出整体快慢，看不出一次慢的运行是网络、解析还是站点限流造成的。
+抓取流水线在各阶段记录指标，定期（METRICS_INTERVAL 秒）写入输出目录（与 stats.json 同目录）：
+
+- metrics.prom   Prometheus 文本格式（可以交给 node_exporter 的 textfile collector）
+- metrics.json   同样内容的 JSON 快照，多个分片的快照可以合并（merge_snapshot）
+
+主要指标：
+    crawl_dns_seconds / crawl_connect_seconds   DNS 解析、建立连接耗时（aiohttp TraceConfig）
+    crawl_request_seconds{kind}                 详情页 / 下载页请求耗时（不含限速等待）
+    crawl_rate_limit_wait_seconds{kind}         在限速器处等待令牌的时间（站点限流时变长）
+    crawl_parse_seconds{kind}                   解析耗时（使用进程池时包含排队时间）
+    crawl_responses_total{kind,status}          各状态码的响应数（error 表示超时或连接错误）
+    crawl_response_bytes_total{kind}            下载的页面字节数
+    crawl_cpu_seconds_total{stage}              各阶段的CPU时间：parse（解析，在解析进程中统计）、
+                                                write（写入结果）、fetch（事件循环中其余的工作：
+                                                请求、限速、调度）、render（生成md文件）
+    crawl_retries_total{status} / crawl_books_total{status}   重试次数、各抓取状态的书籍数
+    crawl_queue_depth{queue}                    各队列中的任务数
+
+配置（环境变量）：
+    METRICS            设为 0 时不写指标文件（仍然在内存中统计）
+    METRICS_INTERVAL   写入间隔（秒），默认 15
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", "15"))
+METRICS_PROM_NAME = "metrics.prom"
+METRICS_JSON_NAME = "metrics.json"
+
+# 耗时直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_HELP = {
+    'crawl_dns_seconds': 'DNS 解析耗时',
+    'crawl_dns_cache_hits_total': 'DNS 缓存命中次数',
+    'crawl_connect_seconds': '建立新连接的耗时',
+    'crawl_connections_reused_total': '复用已有连接的请求数',
+    'crawl_request_seconds': '页面请求耗时（不含限速等待）',
+    'crawl_rate_limit_wait_seconds': '在限速器处等待令牌的时间',
+    'crawl_parse_seconds': '页面解析耗时（使用进程池时包含排队时间）',
+    'crawl_responses_total': '各状态码的响应数',
+    'crawl_response_bytes_total': '下载的页面字节数',
+    'crawl_cache_total': '页面缓存命中次数',
+    'crawl_cpu_seconds_total': '各阶段占用的CPU时间',
+    'crawl_retries_total': '按状态统计的重试次数',
+    'crawl_books_total': '各抓取状态的书籍数',
+    'crawl_queue_depth': '各队列中的任务数',
+    'crawl_rate_limit': '各主机当前的请求速率上限（每秒）',
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def metrics_enabled() -> bool:
+    """是否写指标文件（METRICS=0 时禁用）"""
+    return os.getenv("METRICS", "1") != "0"
+
+
+def _label_key(labels: Dict) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Histogram:
+    """固定桶的直方图（桶计数不累加，输出时再累加）"""
+
+    __slots__ = ('buckets', 'sum', 'count')
+
+    def __init__(self, bucket_count: int):
+        self.buckets = [0] * (bucket_count + 1)  # 最后一个桶是 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+
+class CrawlMetrics:
+    """一次抓取的指标"""
+
+    def __init__(self, output_dir: Optional[Path] = None, interval: float = METRICS_INTERVAL):
+        self.output_dir = Path(output_dir) if output_dir is not None else None
+        self.interval = interval
+        self.started = time.time()
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self.histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._last_write = time.monotonic()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """计数器加 value"""
+        series = self.counters.setdefault(name, {})
+        key = _label_key(labels)
+        series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """设置当前值"""
+        self.gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        """记录一次耗时（秒）"""
+        series = self.histograms.setdefault(name, {})
+        key = _label_key(labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram(len(LATENCY_BUCKETS))
+        index = 0
+        while index < len(LATENCY_BUCKETS) and value > LATENCY_BUCKETS[index]:
+            index += 1
+        histogram.buckets[index] += 1
+        histogram.sum += value
+        histogram.count += 1
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """记录 DNS 解析和建立连接耗时的 aiohttp TraceConfig（创建会话时传入）"""
+        trace = aiohttp.TraceConfig()
+
+        async def dns_start(session, context, params):
+            context.dns_started = time.monotonic()
+
+        async def dns_end(session, context, params):
+            self.observe('crawl_dns_seconds', time.monotonic() - context.dns_started)
+
+        async def dns_cache_hit(session, context, params):
+            self.inc('crawl_dns_cache_hits_total')
+
+        async def connect_start(session, context, params):
+            context.connect_started = time.monotonic()
+
+        async def connect_end(session, context, params):
+            self.observe('crawl_connect_seconds', time.monotonic() - context.connect_started)
+
+        async def connection_reused(session, context, params):
+            self.inc('crawl_connections_reused_total')
+
+        trace.on_dns_resolvehost_start.append(dns_start)
+        trace.on_dns_resolvehost_end.append(dns_end)
+        trace.on_dns_cache_hit.append(dns_cache_hit)
+        trace.on_connection_create_start.append(connect_start)
+        trace.on_connection_create_end.append(connect_end)
+        trace.on_connection_reuseconn.append(connection_reused)
+        return trace
+
+    def snapshot(self) -> Dict:
+        """JSON 快照"""
+        def series(metrics: Dict[str, Dict[LabelKey, float]]) -> Dict[str, List[Dict]]:
+            return {name: [{'labels': dict(key), 'value': value} for key, value in sorted(values.items())]
+                    for name, values in sorted(metrics.items())}
+
+        return {
+            'updated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'elapsed_seconds': round(time.time() - self.started, 3),
+            'latency_buckets': list(LATENCY_BUCKETS),
+            'counters': series(self.counters),
+            'gauges': series(self.gauges),
+            'histograms': {
+                name: [{'labels': dict(key), 'buckets': histogram.buckets,
+                        'sum': round(histogram.sum, 6), 'count': histogram.count}
+                       for key, histogram in sorted(values.items())]
+                for name, values in sorted(self.histograms.items())
+            },
+        }
+
+    def merge_snapshot(self, snapshot: Dict):
+        """把另一份 JSON 快照（例如分片进程的）的计数器和直方图加进来（当前值不合并）"""
+        for name, entries in snapshot.get('counters', {}).items():
+            for entry in entries:
+                self.inc(name, entry['value'], **entry['labels'])
+        for name, entries in snapshot.get('histograms', {}).items():
+            series = self.histograms.setdefault(name, {})
+            for entry in entries:
+                key = _label_key(entry['labels'])
+                histogram = series.get(key)
+                if histogram is None:
+                    histogram = series[key] = Histogram(len(LATENCY_BUCKETS))
+                histogram.buckets = [a + b for a, b in zip(histogram.buckets, entry['buckets'])]
+                histogram.sum += entry['sum']
+                histogram.count += entry['count']
+
+    def counter_value(self, name: str, **labels) -> float:
+        """计数器的当前值（没有记录时返回0）"""
+        return self.counters.get(name, {}).get(_label_key(labels), 0)
+
+    def mean(self, name: str, **labels) -> Optional[float]:
+        """直方图的平均值（没有记录时返回None）"""
+        histogram = self.histograms.get(name, {}).get(_label_key(labels))
+        if histogram is None or histogram.count == 0:
+            return None
+        return histogram.sum / histogram.count
+
+    def summary(self) -> str:
+        """各阶段平均耗时和下载量的一行摘要"""
+        parts = []
+        for label, name in (('请求', 'crawl_request_seconds'), ('限速等待', 'crawl_rate_limit_wait_seconds'),
+                            ('解析', 'crawl_parse_seconds')):
+            means = []
+            for kind, kind_label in (('detail', '详情页'), ('download', '下载页')):
+                value = self.mean(name, kind=kind)
+                if value is not None:
+                    means.append(f"{kind_label} {value * 1000:.0f}ms")
+            if means:
+                parts.append(f"{label}（{'，'.join(means)}）")
+        cpu = [f"{stage_label} {self.counter_value('crawl_cpu_seconds_total', stage=stage):.1f}s"
+               for stage, stage_label in (('fetch', '抓取'), ('parse', '解析'), ('write', '写入'))
+               if self.counter_value('crawl_cpu_seconds_total', stage=stage)]
+        if cpu:
+            parts.append(f"CPU（{'，'.join(cpu)}）")
+        total_bytes = sum(self.counters.get('crawl_response_bytes_total', {}).values())
+        parts.append(f"下载 {total_bytes / 1024 / 1024:.1f} MB")
+        return ' / '.join(parts)
+
+    def to_prometheus(self) -> str:
+        """Prometheus 文本格式"""
+        lines = []
+
+        def header(name: str, kind: str):
+            lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for name, values in sorted(self.counters.items()):
+            header(name, 'counter')
+            lines.extend(f"{name}{_format_labels(key)} {value:g}" for key, value in sorted(values.items()))
+        for name, values in sorted(self.gauges.items()):
+            header(name, 'gauge')
+            lines.extend(f"{name}{_format_labels(key)} {value:g}" for key, value in sorted(values.items()))
+        for name, values in sorted(self.histograms.items()):
+            header(name, 'histogram')
+            for key, histogram in sorted(values.items()):
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + (float('inf'),), histogram.buckets):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else f"{bound:g}"
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', le))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def write_due(self) -> bool:
+        """距上次写入是否已超过写入间隔"""
+        return self.output_dir is not None and time.monotonic() - self._last_write >= self.interval
+
+    def write(self):
+        """原子写入 metrics.prom 和 metrics.json（未指定输出目录时不写）"""
+        self._last_write = time.monotonic()
+        if self.output_dir is None:
+            return
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        for file_name, content in ((METRICS_PROM_NAME, self.to_prometheus()),
+                                   (METRICS_JSON_NAME, json.dumps(self.snapshot(), ensure_ascii=False, indent=2))):
+            path = self.output_dir / file_name
+            tmp_path = path.with_name(path.name + '.tmp')
+            tmp_path.write_text(content, encoding='utf-8')
+            os.replace(tmp_path, path)
@@ -7,8 +7,10 @@
 
 import requests
 import re
+import time
 from bs4 import BeautifulSoup
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 import os
 import sys
 
@@ -22,6 +24,15 @@ except ImportError:
         print("请设置环境变量或创建 config.py")
         sys.exit(1)
 
+# 并发查找配置（环境变量）
+SEARCH_FANOUT = int(os.getenv("FIND_ID_FANOUT", "8"))  # 每轮并发检查的候选位置数
+SEARCH_GAP_WINDOW = int(os.getenv("FIND_ID_GAP_WINDOW", "5"))  # 每个候选位置检查的连续ID数（可容忍的缺失间隔）
+SEARCH_CONFIRM_WINDOW = int(os.getenv("FIND_ID_CONFIRM_WINDOW", "32"))  # 判定位置不存在前确认的连续ID数（边界处放宽的间隔）
+SEARCH_RETRIES = int(os.getenv("FIND_ID_RETRIES", "3"))  # 请求出错的ID最多重新检查的次数
+SEARCH_RETRY_DELAY = 1.0  # 重新检查前的等待时间（秒），按次数递增
+SEARCH_INITIAL_STEP = 16  # 跳跃阶段的初始步长
+SEARCH_MAX_PARALLEL = 64  # 同时进行的 HEAD 请求数上限
+
 
 def extract_book_id_from_url(url: str) -> Optional[int]:
     """从URL中提取书籍ID"""
@@ -84,76 +95,170 @@ def find_max_book_id_from_homepage() -> Optional[int]:
         return None
 
 
-def find_max_book_id_by_binary_search(start: int = 1, end: int = 100000) -> Optional[int]:
+def check_book_ids_exist(book_ids: List[int]) -> Dict[int, Optional[bool]]:
     """
-    使用二分查找法找到最大有效的书籍ID
-    
+    并发发送 HEAD 请求，检查一批书籍ID是否存在
+
+    超时、连接错误、429 / 5xx 无法判断ID是否存在，等待后重新检查，最多 SEARCH_RETRIES 次。
+
     Args:
-        start: 起始ID
-        end: 结束ID（预估的最大值）
-    
+        book_ids: 书籍ID列表
+
     Returns:
-        最大有效的书籍ID
+        {书籍ID: 是否存在}，重试后仍无法判断的ID为None
     """
     headers = {
         'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
         'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
     }
-    
-    def check_book_exists(book_id: int) -> bool:
-        """检查书籍ID是否存在"""
+
+    def check_book_exists(book_id: int) -> Optional[bool]:
+        """检查书籍ID是否存在，无法判断时返回None"""
         url = f"{BOOK_SITE_DOMAIN}/book-content-{book_id}.html"
         try:
             response = requests.head(url, headers=headers, timeout=5, allow_redirects=False)
-            return response.status_code == 200
-        except:
-            return False
-    
-    print(f"🔍 使用二分查找法查找最大书籍ID (范围: {start} - {end})")
-    
-    left, right = start, end
-    max_valid_id = 0
-    
-    # 先快速找到一个大致的上限
-    print("📊 步骤1: 快速定位大致范围...")
-    step = 1000
-    current = start
-    while current <= end:
-        if check_book_exists(current):
-            max_valid_id = current
-            current += step
-        else:
+        except requests.RequestException:
+            return None
+        if response.status_code == 429 or response.status_code >= 500:
+            return None
+        return response.status_code == 200
+
+    results: Dict[int, Optional[bool]] = {}
+    pending = sorted(set(book_ids))
+    for attempt in range(SEARCH_RETRIES + 1):
+        if not pending:
             break
-        if current % 10000 == 0:
-            print(f"   已检查到 ID: {current}")
-    
-    if max_valid_id == 0:
-        print("⚠️  未找到任何有效书籍ID")
-        return None
-    
-    print(f"✅ 找到大致范围，最大ID约在: {max_valid_id}")
-    
-    # 在找到的范围内进行精确查找
-    print("📊 步骤2: 精确查找最大ID...")
-    left = max_valid_id
-    right = min(max_valid_id + step * 2, end)
-    
-    while left <= right:
-        mid = (left + right) // 2
-        if check_book_exists(mid):
-            max_valid_id = mid
-            left = mid + 1
+        if attempt:
+            time.sleep(SEARCH_RETRY_DELAY * attempt)
+        with ThreadPoolExecutor(max_workers=min(len(pending), SEARCH_MAX_PARALLEL)) as executor:
+            results.update(zip(pending, executor.map(check_book_exists, pending)))
+        pending = [book_id for book_id in pending if results[book_id] is None]
+    if pending:
+        print(f"   ⚠️  {len(pending)} 个ID重试 {SEARCH_RETRIES} 次后仍无法判断是否存在")
+    return results
+
+
+def find_max_book_id_by_galloping(known_max: int = 0, limit: Optional[int] = None,
+                                  fanout: int = SEARCH_FANOUT, window: int = SEARCH_GAP_WINDOW,
+                                  confirm_window: int = SEARCH_CONFIRM_WINDOW) -> Optional[int]:
+    """
+    从已知最大ID开始指数跳跃 + k 分查找最大有效书籍ID
+
+    每一轮同时检查 fanout 个候选位置，每个候选位置检查连续 window 个ID（任一存在即视为
+    该位置之前还有书）。window 个ID都不存在的位置在被当作边界之前，再把检查范围扩大到连续
+    confirm_window 个ID确认，因此ID稀疏（中间有较长的连续缺失）时查找也不会提前结束，
+    额外的请求只花在边界附近。无法判断是否存在的ID（请求出错）不会让位置被判定为不存在。
+
+    - 跳跃阶段：候选位置为 已知最大ID + step * 2^i（i = 0..fanout-1），全部存在时
+      从最远的位置继续、step 扩大 2^fanout 倍，直到出现不存在的位置
+    - 收缩阶段：把 (最大存在ID, 第一个不存在的位置) 区间均分为 fanout+1 段，每轮缩小约 fanout+1 倍
+    - 区间足够小时一次检查区间内所有ID
+
+    Args:
+        known_max: 已知存在（或已同步）的最大ID，通常来自 max_book_id.json
+        limit: 查找上限（包含），None 表示不限
+        fanout: 每轮并发检查的候选位置数
+        window: 每个候选位置检查的连续ID数
+        confirm_window: 判定位置不存在前确认的连续ID数（可容忍的缺失ID间隔）
+
+    Returns:
+        最大有效书籍ID；known_max 之后没有新书时返回 known_max（为0时返回None）
+    """
+    confirm_window = max(confirm_window, window)
+    print(f"🔍 并发跳跃查找最大书籍ID（从 {known_max} 开始，每轮 {fanout} 个位置 × {window} 个ID，"
+          f"边界确认 {confirm_window} 个ID）")
+    lower = known_max  # 已确认的最大ID（之后的书都比它大）
+    upper = None  # 第一个确认不存在的位置（其后 confirm_window 个ID都不存在）
+    step = SEARCH_INITIAL_STEP
+    rounds = 0
+    requests_sent = 0
+    exists: Dict[int, Optional[bool]] = {}  # 已检查过的ID，不重复请求
+
+    def check(ids: List[int]):
+        nonlocal requests_sent
+        ids = [book_id for book_id in ids if book_id not in exists and (limit is None or book_id <= limit)]
+        if ids:
+            exists.update(check_book_ids_exist(ids))
+            requests_sent += len(ids)
+
+    def ids_from(pos: int, count: int) -> range:
+        end = pos + count if limit is None else min(pos + count, limit + 1)
+        return range(pos, end)
+
+    def probe(positions: List[int]) -> Tuple[int, Optional[int]]:
+        """检查候选位置，返回 (找到的最大存在ID, 最大存在位置之后第一个不存在的位置)"""
+        nonlocal rounds
+        positions = [pos for pos in positions if limit is None or pos <= limit]
+        check([book_id for pos in positions for book_id in ids_from(pos, window)])
+        rounds += 1
+        found = max([lower] + [book_id for book_id, ok in exists.items() if ok])
+        for pos in sorted(positions):
+            if pos <= found or any(exists[book_id] is not False for book_id in ids_from(pos, window)):
+                continue
+            # 边界处放宽间隔：确认之后更多的连续ID都不存在
+            check(list(ids_from(pos, confirm_window)))
+            confirm_ids = ids_from(pos, confirm_window)
+            hits = [book_id for book_id in confirm_ids if exists[book_id]]
+            if hits:
+                found = max(found, max(hits))
+            elif all(exists[book_id] is False for book_id in confirm_ids):
+                return found, pos
+        return found, None
+
+    # 跳跃阶段：找到一个不存在的位置作为上界
+    while upper is None:
+        positions = [lower + step * 2 ** i for i in range(fanout)]
+        if limit is not None and positions[0] > limit:
+            upper = limit + 1
+            break
+        found, dead = probe(positions)
+        print(f"   第 {rounds} 轮（跳跃）: 检查到 {positions[-1]}，最大存在ID {found}")
+        if found == lower and dead is None and all(
+                exists[book_id] is None for pos in positions if limit is None or pos <= limit
+                for book_id in ids_from(pos, window)):
+            print("❌ 请求持续出错，无法判断ID是否存在，停止查找")
+            return lower or None
+        lower = found
+        if dead is not None:
+            upper = dead
+        elif limit is not None and positions[-1] >= limit:
+            upper = limit + 1
         else:
-            right = mid - 1
-        
-        if (left + right) // 2 % 100 == 0:
-            print(f"   当前范围: {left} - {right}, 最大有效ID: {max_valid_id}")
-    
-    return max_valid_id
+            step *= 2 ** fanout
+
+    # 收缩阶段：k 分查找
+    while upper - lower - 1 > fanout * window:
+        span = upper - lower
+        positions = sorted({lower + span * i // (fanout + 1) for i in range(1, fanout + 1)} - {lower})
+        found, dead = probe(positions)
+        lower = max(lower, found)
+        upper = dead if dead is not None else upper
+        print(f"   第 {rounds} 轮（收缩）: 范围 {lower} - {upper}")
+
+    # 区间内剩余的ID一次检查完
+    remaining = list(range(lower + 1, upper))
+    if remaining:
+        check(remaining)
+        rounds += 1
+        lower = max([lower] + [book_id for book_id in remaining if exists[book_id]])
+
+    print(f"✅ 查找完成: 最大书籍ID {lower}（{rounds} 轮，{requests_sent} 个请求）")
+    return lower or None
+
+
+def find_max_book_id_by_binary_search(start: int = 1, end: int = 100000) -> Optional[int]:
+    """
+    查找 [start, end] 范围内最大有效的书籍ID（保留原函数名，内部使用并发跳跃查找）
+
+    Args:
+        start: 起始ID
+        end: 结束ID（预估的最大值）
+
+    Returns:
+        最大有效的书籍ID
+    """
+    return find_max_book_id_by_galloping(known_max=start - 1, limit=end)
 
 
 def find_max_book_id_from_latest_books(max_pages: int = 10) -> Optional[int]:
@@ -247,8 +352,8 @@ def main():
         print(f"\n✅ 找到最大书籍ID: {max_id}")
         return max_id
     
-    # 方法3：使用二分查找（最可靠但较慢）
-    print("\n方法3: 使用二分查找法（较慢但更准确）...")
+    # 方法3：并发跳跃查找（逐个检查ID，最可靠）
+    print("\n方法3: 使用并发跳跃查找...")
     max_id = find_max_book_id_by_binary_search(start=1, end=100000)
     
     if max_id:
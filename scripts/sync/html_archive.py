@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+原始页面归档：把抓取到的详情页和下载页压缩后追加保存，支持离线重新解析
+
+目录结构：
+    segment-00000.zst / segment-00000.gz   追加写入的分段文件，每个页面是一个独立的压缩帧
+    index.jsonl                            偏移索引，每行一条记录，同一 (book_id, kind) 以最后一条为准
+    segment-<writer>-00000.zst / index-<writer>.jsonl
+                                           多进程分片抓取时每个进程各自的分段文件和索引，
+                                           读取时合并所有索引，同一 (book_id, kind) 以写入时间最新的为准
+
+- 安装了 zstandard 时使用 zstd 压缩，否则使用 gzip；读取时按分段文件后缀选择解压方式
+- 内容未变化（sha1 相同）的页面不会重复写入
+- 分段文件超过 SEGMENT_SIZE 后切换到新分段
+
+配置（环境变量）：
+    HTML_ARCHIVE       设为 0 时禁用归档
+    HTML_ARCHIVE_DIR   归档目录（默认：输出目录下的 .archive）
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SEGMENT_SIZE = 256 * 1024 * 1024  # 单个分段文件的最大字节数
+INDEX_FILE_NAME = "index.jsonl"
+
+KIND_DETAIL = "detail"  # 详情页 book-content-N.html
+KIND_DOWNLOAD = "download"  # 下载页 download-book-N.html
+
+
+def html_archive_enabled() -> bool:
+    """是否启用页面归档（HTML_ARCHIVE=0 时禁用）"""
+    return os.getenv("HTML_ARCHIVE", "1") != "0"
+
+
+def _compress(data: bytes, suffix: str) -> bytes:
+    if suffix == '.zst':
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _decompress(data: bytes, suffix: str) -> bytes:
+    if suffix == '.zst':
+        if zstandard is None:
+            raise RuntimeError("归档使用 zstd 压缩，请先安装 zstandard: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def read_entry(archive_dir: Path, entry: Dict) -> bytes:
+    """
+    按索引记录读取并解压页面内容
+
+    Args:
+        archive_dir: 归档目录
+        entry: 索引记录
+
+    Returns:
+        页面原始字节
+    """
+    segment_path = Path(archive_dir) / entry['segment']
+    with open(segment_path, 'rb') as f:
+        f.seek(entry['offset'])
+        data = f.read(entry['length'])
+    return _decompress(data, segment_path.suffix)
+
+
+class HtmlArchive:
+    """追加写入的压缩页面归档"""
+
+    def __init__(self, archive_dir: Path, writer: Optional[str] = None):
+        self.archive_dir = Path(archive_dir)
+        self.suffix = '.zst' if zstandard is not None else '.gz'
+        # 指定 writer 时写入独立的分段文件和索引（多个进程可以同时写同一个归档目录）
+        self.segment_prefix = f"segment-{writer}-" if writer else "segment-"
+        self.index_name = f"index-{writer}.jsonl" if writer else INDEX_FILE_NAME
+        self.entries: Dict[Tuple[int, str], Dict] = {}
+        self.appended = 0
+        self._segment_file = None
+        self._segment_name = None
+        self._index_file = None
+        self._load_index()
+
+    def _load_index(self):
+        """读取所有索引，同一 (book_id, kind) 保留写入时间最新的一条（时间相同时保留后读到的）"""
+        index_paths = sorted(self.archive_dir.glob('index*.jsonl'),
+                             key=lambda path: (path.name != INDEX_FILE_NAME, path.name))
+        for index_path in index_paths:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 中断时可能留下不完整的最后一行，忽略即可
+                        continue
+                    key = (entry['book_id'], entry['kind'])
+                    previous = self.entries.get(key)
+                    if previous is None or entry['stored_at'] >= previous['stored_at']:
+                        self.entries[key] = entry
+
+    def _open_segment(self, size: int):
+        """打开可追加的分段文件，当前分段写满时切换到下一个"""
+        if self._segment_file is not None and self._segment_file.tell() + size <= SEGMENT_SIZE:
+            return
+        if self._segment_file is not None:
+            self._segment_file.close()
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        segments = sorted(self.archive_dir.glob(self.segment_prefix + '[0-9]' * 5 + self.suffix))
+        number = int(segments[-1].stem.rsplit('-', 1)[1]) if segments else 0
+        if segments and segments[-1].stat().st_size + size > SEGMENT_SIZE:
+            number += 1
+        self._segment_name = f"{self.segment_prefix}{number:05d}{self.suffix}"
+        self._segment_file = open(self.archive_dir / self._segment_name, 'ab')
+
+    def get(self, book_id: int, kind: str) -> Optional[Dict]:
+        """获取 (book_id, kind) 最新的索引记录"""
+        return self.entries.get((book_id, kind))
+
+    def append(self, book_id: int, kind: str, url: str, body: bytes,
+               charset: Optional[str] = None) -> bool:
+        """
+        追加一个页面（内容未变化时跳过）
+
+        Args:
+            book_id: 书籍ID
+            kind: 页面类型（KIND_DETAIL / KIND_DOWNLOAD）
+            url: 页面URL
+            body: 页面原始字节
+            charset: 响应头中的字符集
+
+        Returns:
+            是否写入了新记录
+        """
+        digest = hashlib.sha1(body).hexdigest()
+        previous = self.entries.get((book_id, kind))
+        if previous and previous.get('sha1') == digest:
+            return False
+
+        data = _compress(body, self.suffix)
+        self._open_segment(len(data))
+        offset = self._segment_file.tell()
+        self._segment_file.write(data)
+        self._segment_file.flush()
+
+        entry = {
+            'book_id': book_id,
+            'kind': kind,
+            'url': url,
+            'segment': self._segment_name,
+            'offset': offset,
+            'length': len(data),
+            'charset': charset,
+            'sha1': digest,
+            'stored_at': int(time.time()),
+        }
+        if self._index_file is None:
+            self._index_file = open(self.archive_dir / self.index_name, 'a', encoding='utf-8')
+        self._index_file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._index_file.flush()
+
+        self.entries[(book_id, kind)] = entry
+        self.appended += 1
+        return True
+
+    def read(self, book_id: int, kind: str) -> Optional[bytes]:
+        """读取 (book_id, kind) 最新的页面内容"""
+        entry = self.get(book_id, kind)
+        if entry is None:
+            return None
+        return read_entry(self.archive_dir, entry)
+
+    def book_ids(self, start_id: int = 1, end_id: Optional[int] = None) -> List[int]:
+        """返回归档中有详情页的书籍ID（升序）"""
+        return sorted(
+            book_id for (book_id, kind) in self.entries
+            if kind == KIND_DETAIL and book_id >= start_id and (end_id is None or book_id <= end_id)
+        )
+
+    def iter_books(self, start_id: int = 1, end_id: Optional[int] = None) -> Iterator[Tuple[Dict, Optional[Dict]]]:
+        """按书籍ID升序返回 (详情页记录, 下载页记录或None)"""
+        for book_id in self.book_ids(start_id, end_id):
+            yield self.entries[(book_id, KIND_DETAIL)], self.entries.get((book_id, KIND_DOWNLOAD))
+
+    def close(self):
+        """关闭文件并落盘"""
+        for f in (self._segment_file, self._index_file):
+            if f is not None:
+                f.flush()
+                os.fsync(f.fileno())
+                f.close()
+        self._segment_file = None
+        self._index_file = None
+
+
+def reparse_archived_book(archive_dir: str, detail_entry: Dict, download_entry: Optional[Dict]) -> Optional[Dict]:
+    """
+    从归档中重新解析一本书（离线，不发起网络请求），供进程池调用
+
+    Args:
+        archive_dir: 归档目录
+        detail_entry: 详情页索引记录
+        download_entry: 下载页索引记录（没有则为None）
+
+    Returns:
+        书籍信息字典，详情页中没有书名时返回None
+    """
+    from parse_book_detail_enhanced import parse_book_detail_html, parse_download_page_html
+
+    body = read_entry(Path(archive_dir), detail_entry)
+    result = parse_book_detail_html(body, detail_entry['url'], detail_entry.get('charset'))
+    if not result.get('title'):
+        return None
+
+    if download_entry is not None:
+        download_body = read_entry(Path(archive_dir), download_entry)
+        download_info = parse_download_page_html(download_body, download_entry.get('charset'))
+        if download_info and download_info.get('download_url'):
+            result['download_url'] = download_info['download_url']
+
+    result['book_id'] = str(detail_entry['book_id'])
+    return result
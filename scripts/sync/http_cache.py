@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+磁盘 HTTP 响应缓存：按 URL 保存页面内容和校验信息（ETag / Last-Modified）
+
+- 有校验信息的页面：再次抓取时发送 If-None-Match / If-Modified-Since，
+  服务器返回 304 时直接复用缓存内容
+- 没有校验信息的页面：在 TTL 内直接使用缓存，不发请求；过期后重新抓取
+- 页面内容以 gzip 压缩保存，写入采用临时文件 + 原子替换，进程中断不会留下半个文件
+
+配置（环境变量）：
+    HTTP_CACHE       设为 0 时禁用缓存
+    HTTP_CACHE_DIR   缓存目录（默认：输出目录下的 .http_cache）
+    HTTP_CACHE_TTL   无校验信息页面的缓存有效期（秒），默认 7 天
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+HTTP_CACHE_TTL = float(os.getenv("HTTP_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+def http_cache_enabled() -> bool:
+    """是否启用 HTTP 缓存（HTTP_CACHE=0 时禁用）"""
+    return os.getenv("HTTP_CACHE", "1") != "0"
+
+
+def _write_atomic(path: Path, data: bytes):
+    """写入临时文件后原子替换，避免中断时留下不完整的文件"""
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+class HttpCache:
+    """按 URL 缓存页面内容和校验信息的磁盘缓存"""
+
+    def __init__(self, cache_dir: Path, ttl: float = HTTP_CACHE_TTL):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+
+        # 统计信息
+        self.fresh_hits = 0  # TTL 内直接命中，未发请求
+        self.revalidated = 0  # 304 复用缓存
+        self.misses = 0  # 无缓存或缓存已失效，完整下载
+        self.bytes_saved = 0
+
+    def _paths(self, url: str):
+        """URL 对应的元数据文件和内容文件（按哈希前两位分目录，避免单目录文件过多）"""
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        directory = self.cache_dir / key[:2]
+        return directory / f"{key}.json", directory / f"{key}.html.gz"
+
+    def lookup(self, url: str) -> Optional[Dict]:
+        """
+        查找 URL 的缓存元数据
+
+        Args:
+            url: 页面URL
+
+        Returns:
+            元数据字典（url / etag / last_modified / charset / stored_at / size），不存在返回None
+        """
+        meta_path, body_path = self._paths(url)
+        if not meta_path.exists() or not body_path.exists():
+            return None
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get('url') == url else None
+
+    def is_fresh(self, entry: Dict) -> bool:
+        """没有校验信息的缓存在 TTL 内视为新鲜，可以不发请求直接使用"""
+        if entry.get('etag') or entry.get('last_modified'):
+            return False
+        return time.time() - entry.get('stored_at', 0) < self.ttl
+
+    def conditional_headers(self, entry: Optional[Dict]) -> Dict[str, str]:
+        """根据缓存的校验信息生成条件请求头"""
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def load_body(self, url: str) -> Optional[bytes]:
+        """读取缓存的页面内容"""
+        _, body_path = self._paths(url)
+        try:
+            return gzip.decompress(body_path.read_bytes())
+        except (OSError, EOFError, gzip.BadGzipFile):
+            return None
+
+    def store(self, url: str, body: bytes, charset: Optional[str] = None,
+              etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """
+        保存页面内容和校验信息
+
+        Args:
+            url: 页面URL
+            body: 页面原始字节
+            charset: 响应头中的字符集
+            etag: ETag 响应头
+            last_modified: Last-Modified 响应头
+        """
+        meta_path, body_path = self._paths(url)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        # 先写内容再写元数据：元数据存在即表示缓存完整
+        _write_atomic(body_path, gzip.compress(body, compresslevel=6))
+        entry = {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'charset': charset,
+            'stored_at': time.time(),
+            'size': len(body),
+        }
+        _write_atomic(meta_path, json.dumps(entry, ensure_ascii=False).encode('utf-8'))
+
+    def discard(self, url: str):
+        """删除 URL 的缓存（内容文件缺失或损坏时）"""
+        for path in self._paths(url):
+            path.unlink(missing_ok=True)
+
+    def touch(self, url: str, entry: Dict):
+        """服务器返回 304 后刷新缓存时间"""
+        meta_path, _ = self._paths(url)
+        entry = dict(entry, stored_at=time.time())
+        _write_atomic(meta_path, json.dumps(entry, ensure_ascii=False).encode('utf-8'))
+
+    def stats(self) -> Dict:
+        """返回统计信息"""
+        return {
+            'fresh_hits': self.fresh_hits,
+            'revalidated': self.revalidated,
+            'misses': self.misses,
+            'bytes_saved': self.bytes_saved,
+        }
@@ -2,8 +2,14 @@
 # -*- coding: utf-8 -*-
 """
 增量同步脚本：比较已更新的最大书籍ID和读书站的最大ID，只处理新增书籍
+
+--delta 模式改为遍历"最新书籍"列表页（可选标签列表页），只重新抓取新增和有改动的书籍，
+可以发现已有书籍的修改（见 listing_delta.py）
+
+--by-tag 模式读取全部标签的列表页刷新标签归属，只抓取新书的详情页（见 tag_crawl.py）
 """
 
+import argparse
 import sys
 import os
 from pathlib import Path
@@ -17,8 +23,13 @@ sys.path.insert(0, str(Path(__file__).parent))
 os.environ['OUTPUT_DIR'] = 'md'
 
 # 导入test_batch_sync（必须在设置环境变量后）
-from find_max_book_id import find_max_book_id_from_homepage
-from test_batch_sync import load_max_book_id, main as sync_main
+from find_max_book_id import find_max_book_id_from_homepage, find_max_book_id_by_galloping
+from listing_delta import DELTA_MAX_PAGES, ListingCursor, collect_delta_ids
+from status_table import DONE_STATUSES, StatusTable
+from test_batch_sync import BOOK_SITE_DOMAIN, OUTPUT_DIR, STATUS_FILE, load_max_book_id, main as sync_main
+from update_readme_hot_categories import update_readme_and_json
+
+LISTING_CURSOR_FILE = OUTPUT_DIR / "listing_cursor.json"  # 列表页增量游标
 
 
 async def incremental_sync():
@@ -44,7 +55,10 @@ async def incremental_sync():
     # 步骤2：查找读书站当前的最大ID
     print("🔍 步骤2: 查找读书站当前的最大ID")
     print("-" * 80)
-    current_max_id = find_max_book_id_from_homepage()
+    # 首页给出一个已存在的ID作为起点，再向后并发跳跃查找（首页未列出的更新ID也能找到）
+    homepage_max_id = find_max_book_id_from_homepage() or 0
+    print()
+    current_max_id = find_max_book_id_by_galloping(known_max=max(homepage_max_id, last_max_id))
     
     if not current_max_id:
         print("❌ 未能找到读书站的最大ID")
@@ -82,44 +96,77 @@ async def incremental_sync():
     
     # 只有同步成功才更新README和all_books.json
     if sync_success:
-        print("\n" + "=" * 80)
-        print("📝 步骤4: 更新README.md和all_books.json")
-        print("=" * 80)
-        print()
-        
-        # 更新README.md的热门分类章节
-        print("📝 更新README.md热门分类章节...")
-        try:
-            from update_readme_hot_categories import update_readme
-            if update_readme():
-                print("✅ README.md已更新")
-            else:
-                print("⚠️  README.md更新失败，但继续执行")
-        except Exception as e:
-            print(f"⚠️  更新README.md失败: {e}")
-        
-        # 生成all_books.json
-        print("\n📝 生成all_books.json...")
-        try:
-            import subprocess
-            result = subprocess.run(
-                ["python3", str(Path(__file__).parent.parent.parent / "scripts" / "parse_md_to_json.py")],
-                cwd=str(Path(__file__).parent.parent.parent),
-                capture_output=True,
-                text=True
-            )
-            if result.returncode == 0:
-                print("✅ all_books.json已生成")
-                if result.stdout:
-                    print(result.stdout)
-            else:
-                print(f"⚠️  生成all_books.json失败: {result.stderr}")
-        except Exception as e:
-            print(f"⚠️  生成all_books.json失败: {e}")
+        update_readme_and_json()
     
     return sync_success
 
 
+async def delta_sync(tags=None, max_pages: int = DELTA_MAX_PAGES):
+    """
+    列表页增量同步：只重新抓取列表页中新增和有改动的书籍
+    
+    Args:
+        tags: 要额外遍历的标签列表
+        max_pages: 每个列表来源最多读取的页数
+    """
+    print("=" * 80)
+    print("🔄 列表页增量同步")
+    print("=" * 80)
+    print()
+    
+    cursor = ListingCursor(LISTING_CURSOR_FILE)
+    print("📜 步骤1: 遍历列表页，查找新增和有改动的书籍")
+    print("-" * 80)
+    book_ids = collect_delta_ids(BOOK_SITE_DOMAIN, cursor, tags, max_pages)
+    print()
+    
+    if not book_ids:
+        print("✅ 没有新增或有改动的书籍")
+        cursor.save()
+        return True
+    
+    print(f"⏳ 步骤2: 重新抓取 {len(book_ids)} 本书籍...")
+    try:
+        await sync_main(book_ids[0], book_ids[-1], only_ids=book_ids)
+    except Exception as e:
+        print(f"\n❌ 同步失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    
+    # 只把已有最终状态的书籍的指纹记入游标，抓取失败的书籍下次运行会重新发现
+    status_table = StatusTable(STATUS_FILE)
+    skipped = cursor.commit({bid for bid in book_ids if status_table.get(bid) in DONE_STATUSES})
+    cursor.save()
+    if skipped:
+        print(f"\n⚠️  {skipped} 个条目对应的书籍抓取失败，未记入列表游标，下次运行重新抓取")
+    print("\n" + "=" * 80)
+    print("✅ 列表页增量同步完成！")
+    print("=" * 80)
+    
+    update_readme_and_json()
+    return True
+
+
 if __name__ == "__main__":
-    success = asyncio.run(incremental_sync())
+    parser = argparse.ArgumentParser(description='增量同步书籍数据')
+    parser.add_argument('--delta', action='store_true',
+                        help='遍历最新书籍列表页，只重新抓取新增和有改动的书籍（可以发现已有书籍的修改）')
+    parser.add_argument('--delta-tags', help='--delta 时额外遍历的标签列表页，逗号分隔，例如 小说,历史')
+    parser.add_argument('--by-tag', action='store_true',
+                        help='读取标签列表页刷新标签归属，只抓取新书的详情页，再从归档生成md文件')
+    parser.add_argument('--delta-max-pages', type=int, default=DELTA_MAX_PAGES,
+                        help=f'--delta 时每个列表最多读取的页数（默认：{DELTA_MAX_PAGES}）')
+    args = parser.parse_args()
+    
+    if args.by_tag:
+        from tag_crawl import run_tag_crawl
+        success = asyncio.run(run_tag_crawl())
+        if success:
+            update_readme_and_json()
+    elif args.delta:
+        tags = [tag.strip() for tag in args.delta_tags.split(',') if tag.strip()] if args.delta_tags else None
+        success = asyncio.run(delta_sync(tags, args.delta_max_pages))
+    else:
+        success = asyncio.run(incremental_sync())
     exit(0 if success else 1)
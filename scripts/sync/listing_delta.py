@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列表页增量抓取：遍历"最新书籍"列表页（可选标签列表页），找出新增和有改动的书籍ID
+
+按ID递增的增量同步只能发现新书，已有书籍的修改（新增标签、更换下载链接）不会被重新抓取。
+列表页按更新时间排列，每个条目的指纹由书籍ID和条目文本计算，条目内容变化时指纹随之变化：
+
+- 逐页读取列表，收集指纹没有见过的条目对应的书籍ID
+- 遇到整页条目都已见过时停止（之后的页面上次已经看过）
+- 见过的指纹保存在游标文件中（每个列表来源保留最近 CURSOR_KEEP 个）。
+  新指纹先暂存，调用方重新抓取后只提交抓取成功的书籍的指纹，
+  抓取失败的书籍下次运行会被重新发现
+
+一次增量运行只需要几十个列表页请求，而不是每个可能的ID一个请求。
+
+配置（环境变量）：
+    DELTA_MAX_PAGES      每个列表来源最多读取的页数，默认 20
+    TAG_PAGE_URL         标签列表第2页起的路径模板，默认 /book-tag-{tag}-{page}.html
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import requests
+from bs4 import BeautifulSoup
+
+from parse_book_detail_enhanced import REQUEST_HEADERS
+
+DELTA_MAX_PAGES = int(os.getenv("DELTA_MAX_PAGES", "20"))
+TAG_PAGE_URL = os.getenv("TAG_PAGE_URL", "/book-tag-{tag}-{page}.html")
+CURSOR_KEEP = 2000  # 每个列表来源保留的指纹数量
+LISTING_TIMEOUT = 10  # 列表页请求超时（秒）
+
+BOOK_LINK_PATTERN = re.compile(r'book-content-(\d+)\.html')
+
+
+def latest_page_url(domain: str, page: int) -> str:
+    """最新书籍列表第 page 页的URL（第1页是首页）"""
+    return f"{domain}/" if page == 1 else f"{domain}/book-{page}.html"
+
+
+def tag_page_url(domain: str, tag: str, page: int) -> str:
+    """标签列表第 page 页的URL"""
+    if page == 1:
+        return f"{domain}/book-tag-{tag}.html"
+    return domain + TAG_PAGE_URL.format(tag=tag, page=page)
+
+
+def parse_listing_entries(html: str) -> List[Tuple[int, str]]:
+    """
+    从列表页中提取书籍条目
+
+    Args:
+        html: 列表页HTML
+
+    Returns:
+        [(书籍ID, 条目指纹)]，按页面顺序，同一书籍只保留第一次出现
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    entries = []
+    seen_ids = set()
+    for link in soup.find_all('a', href=BOOK_LINK_PATTERN):
+        book_id = int(BOOK_LINK_PATTERN.search(link['href']).group(1))
+        if book_id in seen_ids:
+            continue
+        seen_ids.add(book_id)
+        # 条目容器（通常是 li / div）的文本包含书名、标签、更新时间等，内容变化时指纹也变化
+        container = link.parent if link.parent is not None else link
+        text = ' '.join(container.get_text(' ', strip=True).split())
+        digest = hashlib.sha1(f"{book_id}\n{text}".encode('utf-8')).hexdigest()[:16]
+        entries.append((book_id, digest))
+    return entries
+
+
+class ListingCursor:
+    """每个列表来源见过的条目指纹（JSON 文件）"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.sources: Dict[str, Dict] = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.sources = json.load(f)
+            except (ValueError, OSError):
+                print(f"⚠️  列表游标文件损坏，忽略: {self.path}")
+        self.pending: Dict[str, List[Tuple[int, str]]] = {}
+        self.dirty = False
+
+    def seen(self, source: str) -> Set[str]:
+        """该来源见过的条目指纹"""
+        return set(self.sources.get(source, {}).get('seen', []))
+
+    def update(self, source: str, fingerprints: List[str]):
+        """记录新见到的指纹（新的在前，超出 CURSOR_KEEP 的旧指纹丢弃）"""
+        if not fingerprints:
+            return
+        old = [fp for fp in self.sources.get(source, {}).get('seen', []) if fp not in set(fingerprints)]
+        self.sources[source] = {
+            'seen': (fingerprints + old)[:CURSOR_KEEP],
+            'updated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        self.dirty = True
+
+    def stage(self, source: str, entries: List[Tuple[int, str]]):
+        """暂存新见到的条目 [(书籍ID, 指纹)]，重新抓取后由 commit 决定哪些记入游标"""
+        self.pending.setdefault(source, []).extend(entries)
+
+    def commit(self, done_ids: Set[int]) -> int:
+        """
+        把重新抓取成功的书籍的暂存指纹记入游标
+
+        Args:
+            done_ids: 重新抓取成功（已有最终状态）的书籍ID
+
+        Returns:
+            没有记入的条目数（对应的书籍下次运行会被重新发现）
+        """
+        skipped = 0
+        for source, entries in self.pending.items():
+            self.update(source, [fp for book_id, fp in entries if book_id in done_ids])
+            skipped += sum(1 for book_id, _ in entries if book_id not in done_ids)
+        self.pending = {}
+        return skipped
+
+    def save(self):
+        """有修改时原子写入游标文件"""
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.sources, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+def walk_listing(session: requests.Session, source: str, page_urls, cursor: ListingCursor,
+                 max_pages: int = DELTA_MAX_PAGES) -> Tuple[List[int], int]:
+    """
+    逐页读取一个列表来源，直到整页条目都已见过
+
+    Args:
+        session: requests会话
+        source: 列表来源名称（游标中的键），例如 latest、tag:中国
+        page_urls: 页码 -> URL 的函数
+        cursor: 列表游标（新指纹暂存，由调用方在重新抓取后提交）
+        max_pages: 最多读取的页数
+
+    Returns:
+        (新增或有改动的书籍ID, 读取的页数)
+    """
+    seen = cursor.seen(source)
+    changed_ids = []
+    new_entries = []
+    pages = 0
+    for page in range(1, max_pages + 1):
+        url = page_urls(page)
+        try:
+            response = session.get(url, timeout=LISTING_TIMEOUT)
+        except requests.RequestException as e:
+            print(f"⚠️  读取列表页失败 {url}: {e}")
+            break
+        pages += 1
+        if response.status_code != 200:
+            break
+        response.encoding = response.apparent_encoding or 'utf-8'
+        entries = parse_listing_entries(response.text)
+        if not entries:
+            break
+        fresh = [(book_id, fp) for book_id, fp in entries if fp not in seen]
+        changed_ids.extend(book_id for book_id, _ in fresh)
+        new_entries.extend(fresh)
+        print(f"   {source} 第 {page} 页: {len(entries)} 个条目，{len(fresh)} 个新增或有改动")
+        if not fresh:
+            break
+    cursor.stage(source, new_entries)
+    return changed_ids, pages
+
+
+def collect_delta_ids(domain: str, cursor: ListingCursor, tags: Optional[List[str]] = None,
+                      max_pages: int = DELTA_MAX_PAGES) -> List[int]:
+    """
+    遍历最新书籍列表和指定标签的列表，收集新增和有改动的书籍ID
+
+    Args:
+        domain: 站点域名（含协议）
+        cursor: 列表游标（调用方在重新抓取后提交成功的书籍并保存）
+        tags: 要额外遍历的标签列表
+        max_pages: 每个列表来源最多读取的页数
+
+    Returns:
+        书籍ID列表（升序）
+    """
+    session = requests.Session()
+    # requests 只有在安装 brotli 时才能解压 br，这里只声明 gzip/deflate
+    session.headers.update(dict(REQUEST_HEADERS, **{'Accept-Encoding': 'gzip, deflate'}))
+    sources = [('latest', lambda page: latest_page_url(domain, page))]
+    for tag in tags or []:
+        sources.append((f"tag:{tag}", lambda page, tag=tag: tag_page_url(domain, tag, page)))
+
+    book_ids: Set[int] = set()
+    total_pages = 0
+    for source, page_urls in sources:
+        ids, pages = walk_listing(session, source, page_urls, cursor, max_pages)
+        book_ids.update(ids)
+        total_pages += pages
+    print(f"✅ 列表页增量: 读取 {total_pages} 个列表页，发现 {len(book_ids)} 本新增或有改动的书")
+    return sorted(book_ids)
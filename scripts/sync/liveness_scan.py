@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+书籍ID存活预扫描：在完整抓取之前用 HEAD 请求判断哪些ID存在
+
+范围内很多ID并不存在，完整抓取时每个ID都要 GET 整个详情页再解析才知道没有书名。
+预扫描只看状态码（200 存在，404 等 4xx 不存在），不下载页面正文，可以用更高的并发完成；
+之后的完整抓取只访问存在的ID。
+
+- 扫描结果保存在存活位图中（每个ID占2位：未知 / 存在 / 不存在），下次运行时
+  已确认存在的ID不再探测，只重新探测上次不存在和未知的ID
+- 服务器不支持 HEAD（405 / 501）时改用 GET，只读取开头少量字节后关闭连接
+- 429 / 5xx / 超时 / 重定向等无法判断的情况视为未知，交给完整抓取处理（不会漏抓）
+- 探测请求使用自己的限速器（probe_rate_limiter），速率预算独立于完整抓取：HEAD 请求不下载、
+  不解析正文，开销远小于详情页，按详情页的速率探测省不下多少时间。预扫描在完整抓取开始之前
+  完成，两者不会同时占用带宽；探测同样按 AIMD 调速，遇到 429 / 大量错误时降速
+
+配置（环境变量）：
+    LIVENESS_CONCURRENCY   预扫描并发数，默认 64
+    LIVENESS_METHOD        探测方法 head / get，默认 head
+    LIVENESS_RATE          探测的初始速率（请求/秒），默认 RATE_LIMIT_DEFAULT 的 4 倍
+    LIVENESS_RATE_MAX      探测的速率上限，默认 RATE_LIMIT_MAX 的 4 倍
+"""
+
+import asyncio
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+
+from rate_limiter import DEFAULT_RATE, MAX_RATE, HostRateLimiter
+
+LIVENESS_CONCURRENCY = int(os.getenv("LIVENESS_CONCURRENCY", "64"))
+LIVENESS_METHOD = os.getenv("LIVENESS_METHOD", "head").lower()
+LIVENESS_RATE = float(os.getenv("LIVENESS_RATE", str(DEFAULT_RATE * 4)))  # 探测的初始速率（请求/秒）
+LIVENESS_RATE_MAX = float(os.getenv("LIVENESS_RATE_MAX", str(MAX_RATE * 4)))  # 探测的速率上限
+LIVENESS_TIMEOUT = 10  # 单个探测请求超时（秒）
+PEEK_BYTES = 1024  # GET 探测时读取的字节数
+PROGRESS_EVERY = 1000  # 每探测多少个ID输出一次进度
+
+LIVE_UNKNOWN = 0
+LIVE_YES = 1
+LIVE_NO = 2
+
+LIVENESS_NAMES = {LIVE_UNKNOWN: 'unknown', LIVE_YES: 'live', LIVE_NO: 'dead'}
+
+
+class LivenessMap:
+    """按书籍ID索引的存活位图，每个ID占2位（一个字节存4个ID）"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.data = bytearray(self.path.read_bytes()) if self.path.exists() else bytearray()
+        self.dirty = False
+
+    def get(self, book_id: int) -> int:
+        """获取书籍ID的存活状态（超出位图范围视为未知）"""
+        index = book_id >> 2
+        if index >= len(self.data):
+            return LIVE_UNKNOWN
+        return (self.data[index] >> ((book_id & 3) * 2)) & 3
+
+    def set(self, book_id: int, state: int):
+        """设置书籍ID的存活状态，位图不够长时自动扩展"""
+        index = book_id >> 2
+        if index >= len(self.data):
+            self.data.extend(bytes(index + 1 - len(self.data)))
+        shift = (book_id & 3) * 2
+        value = (self.data[index] & ~(3 << shift)) | (state << shift)
+        if value != self.data[index]:
+            self.data[index] = value
+            self.dirty = True
+
+    def counts(self, book_ids: Iterable[int]) -> Dict[str, int]:
+        """统计给定ID中各存活状态的数量"""
+        counts = {name: 0 for name in LIVENESS_NAMES.values()}
+        for book_id in book_ids:
+            counts[LIVENESS_NAMES[self.get(book_id)]] += 1
+        return counts
+
+    def save(self):
+        """有修改时原子写入位图文件"""
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(self.data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+def probe_rate_limiter() -> HostRateLimiter:
+    """预扫描专用的限速器（不使用 RATE_LIMITS 中按主机指定的抓取速率）"""
+    return HostRateLimiter(limits={}, default_rate=LIVENESS_RATE, max_rate=LIVENESS_RATE_MAX)
+
+
+def classify_status(status: Optional[int]) -> int:
+    """
+    把探测请求的状态码转换为存活状态
+
+    Args:
+        status: HTTP 状态码；超时或连接错误为 None
+
+    Returns:
+        LIVE_YES / LIVE_NO / LIVE_UNKNOWN
+    """
+    if status == 200:
+        return LIVE_YES
+    if status is not None and 400 <= status < 500 and status != 429:
+        return LIVE_NO
+    return LIVE_UNKNOWN
+
+
+async def probe_url(session: aiohttp.ClientSession, rate_limiter: HostRateLimiter, url: str) -> Optional[int]:
+    """
+    探测一个页面的状态码（不下载正文）
+
+    Args:
+        session: aiohttp会话
+        rate_limiter: 按主机的限速器
+        url: 页面URL
+
+    Returns:
+        HTTP 状态码，超时或连接错误时返回None
+    """
+    await rate_limiter.acquire(url)
+    started = time.monotonic()
+    try:
+        status = None
+        if LIVENESS_METHOD == 'head':
+            async with session.head(url, allow_redirects=False) as response:
+                status = response.status
+        if status is None or status in (405, 501):
+            async with session.get(url, allow_redirects=False) as response:
+                status = response.status
+                await response.content.read(PEEK_BYTES)
+                # 不读完正文，直接关闭连接
+                response.close()
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        rate_limiter.record(url, None, time.monotonic() - started)
+        return None
+    rate_limiter.record(url, status, time.monotonic() - started)
+    return status
+
+
+async def scan_liveness(book_ids: List[int], url_template: str, liveness: LivenessMap,
+                        rate_limiter: Optional[HostRateLimiter] = None,
+                        headers: Optional[Dict[str, str]] = None) -> Tuple[List[int], List[int]]:
+    """
+    预扫描书籍ID，已确认存在的ID不再探测
+
+    Args:
+        book_ids: 书籍ID列表（升序）
+        url_template: 详情页URL模板（含一个 {} 占位符）
+        liveness: 存活位图（扫描结果直接写入）
+        rate_limiter: 按主机的限速器，None 时使用 probe_rate_limiter()（与完整抓取分开的速率预算）
+        headers: 请求头
+
+    Returns:
+        (需要完整抓取的ID, 确认不存在的ID)，均为升序；未知状态的ID归入需要抓取
+    """
+    if rate_limiter is None:
+        rate_limiter = probe_rate_limiter()
+    to_probe = [book_id for book_id in book_ids if liveness.get(book_id) != LIVE_YES]
+    print(f"🔦 存活预扫描: {len(book_ids)} 个ID，其中 {len(book_ids) - len(to_probe)} 个上次已确认存在，"
+          f"探测 {len(to_probe)} 个（{LIVENESS_METHOD.upper()}，并发 {LIVENESS_CONCURRENCY}）")
+
+    start_time = time.time()
+    probed = 0
+    pending = iter(to_probe)
+    connector = aiohttp.TCPConnector(limit=LIVENESS_CONCURRENCY, limit_per_host=LIVENESS_CONCURRENCY)
+    timeout = aiohttp.ClientTimeout(total=LIVENESS_TIMEOUT)
+
+    async def probe_worker(session: aiohttp.ClientSession):
+        nonlocal probed
+        # 所有协程共用一个迭代器，内存占用与ID数量无关
+        for book_id in pending:
+            status = await probe_url(session, rate_limiter, url_template.format(book_id))
+            liveness.set(book_id, classify_status(status))
+            probed += 1
+            if probed % PROGRESS_EVERY == 0:
+                elapsed = time.time() - start_time
+                print(f"  🔦 已探测 {probed}/{len(to_probe)}（{probed / elapsed:.1f} 个/秒）")
+
+    async with aiohttp.ClientSession(connector=connector, headers=headers, timeout=timeout) as session:
+        await asyncio.gather(*(probe_worker(session) for _ in range(LIVENESS_CONCURRENCY)))
+    liveness.save()
+
+    dead_ids = [book_id for book_id in book_ids if liveness.get(book_id) == LIVE_NO]
+    dead = set(dead_ids)
+    live_ids = [book_id for book_id in book_ids if book_id not in dead]
+    counts = liveness.counts(to_probe)
+    print(f"✅ 预扫描完成（{time.time() - start_time:.1f} 秒）: 存在 {counts['live']}，"
+          f"不存在 {counts['dead']}，未知 {counts['unknown']}；需要完整抓取 {len(live_ids)} 个")
+    print(f"   探测速率: {rate_limiter.summary()}")
+    return live_ids, dead_ids
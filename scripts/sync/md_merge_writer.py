@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按标签合并写入md文件：把本次抓取到的书籍合并进已有的 md/<标签>.md，而不是整个覆盖
+
+分批同步（--batch-size）和增量同步每次只抓取一部分书籍，直接重写标签文件会丢掉之前批次的内容。
+合并写入时只读取本次涉及的标签文件：
+
+- 表格之前的内容（版权声明、标题等）和表格之后的内容原样保留
+- 表格行以下载链接为键：链接相同的行原地更新，新的行追加到表格末尾
+- 写临时文件后原子替换，中断时不会留下写了一半的文件
+
+使用书籍数据库（book_store）时，表格内容由数据库整体生成，用 write_md_table 替换整个表格，
+表格前后的内容同样原样保留。
+"""
+
+import os
+import re
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+TABLE_HEADER = ["| 书名 | 作者 | epub/mobi/azw3 |", "| --- | --- | --- |"]
+
+DOWNLOAD_LINK_PATTERN = re.compile(r'\[下载\]\((.+?)\)\s*\|\s*$')
+
+
+def row_key(row: str) -> str:
+    """表格行的键：下载链接（没有下载链接时使用整行内容）"""
+    match = DOWNLOAD_LINK_PATTERN.search(row)
+    return match.group(1).strip() if match else row.strip()
+
+
+def split_md_table(text: str) -> Tuple[List[str], List[str], List[str], List[str]]:
+    """
+    把md文件拆成 表格之前的内容、表头、表格行、表格之后的内容
+
+    Args:
+        text: md文件内容
+
+    Returns:
+        (表格之前的行, 表头两行, 表格行, 表格之后的行)；没有表格时表头使用默认表头
+    """
+    lines = text.split('\n')
+    header_index = next((i for i, line in enumerate(lines) if line.startswith('| 书名')), None)
+    if header_index is None:
+        preamble = lines if text.strip() else []
+        return preamble, list(TABLE_HEADER), [], []
+
+    preamble = lines[:header_index]
+    header = lines[header_index:header_index + 2]
+    rows = []
+    index = header_index + 2
+    while index < len(lines) and lines[index].startswith('|'):
+        rows.append(lines[index])
+        index += 1
+    return preamble, header, rows, lines[index:]
+
+
+def merge_md_file(file_path: Path, new_rows: Iterable[str]) -> int:
+    """
+    把表格行合并写入md文件（文件不存在时新建）
+
+    Args:
+        file_path: md文件路径
+        new_rows: 新的表格行（已格式化）
+
+    Returns:
+        合并后的表格行数
+    """
+    file_path = Path(file_path)
+    text = file_path.read_text(encoding='utf-8') if file_path.exists() else ''
+    preamble, header, rows, postamble = split_md_table(text)
+
+    positions = {row_key(row): position for position, row in enumerate(rows)}
+    for row in new_rows:
+        key = row_key(row)
+        if key in positions:
+            rows[positions[key]] = row
+        else:
+            positions[key] = len(rows)
+            rows.append(row)
+
+    _write_table(file_path, text, preamble, header, rows, postamble)
+    return len(rows)
+
+
+def write_md_table(file_path: Path, rows: List[str]) -> int:
+    """
+    用给定的表格行替换md文件中的整个表格（文件不存在时新建）
+
+    Args:
+        file_path: md文件路径
+        rows: 表格行（已格式化，按显示顺序）
+
+    Returns:
+        表格行数
+    """
+    file_path = Path(file_path)
+    text = file_path.read_text(encoding='utf-8') if file_path.exists() else ''
+    preamble, header, _, postamble = split_md_table(text)
+    _write_table(file_path, text, preamble, header, list(rows), postamble)
+    return len(rows)
+
+
+def _write_table(file_path: Path, text: str, preamble: List[str], header: List[str],
+                 rows: List[str], postamble: List[str]):
+    """拼接各部分并原子写入md文件"""
+    content = '\n'.join(preamble + header + rows + postamble)
+    # 保留原文件末尾是否有换行（新文件与 generate_md_file 一致，不加换行）
+    if text.endswith('\n') and not content.endswith('\n'):
+        content += '\n'
+
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = file_path.with_name(file_path.name + '.tmp')
+    tmp_path.write_text(content, encoding='utf-8')
+    os.replace(tmp_path, file_path)
@@ -3,12 +3,24 @@
 """
 增强版书籍详情页解析模块
 功能：解析书籍详情页，提取完整信息（包括标签、图片等）
+
+HTML 解析器（环境变量 HTML_PARSER）：
+    html.parser   Python 内置解析器（默认，兼容性最好）
+    lxml          基于 libxml2 的 C 解析器，需要 pip install lxml
+    selectolax    基于 lexbor 的解析器（仅用于详情页），需要 pip install selectolax
+所选解析器未安装时自动回退到 html.parser。
+
+详情页默认构建完整文档树。PARSE_SCOPE=regions 时只构建提取字段需要的区域（.post-title /
+.post-info / .post-content / .post-download 以及标签、分类链接），更快，但会丢掉顶层文本和
+区域之外的内容；打开前先用 bench_parser.py --archive 在真实页面上确认输出与完整解析一致。
 """
 
 import requests
 import re
 import os
-from bs4 import BeautifulSoup
+import importlib.util
+from bs4 import BeautifulSoup, NavigableString, SoupStrainer
+from bs4.dammit import UnicodeDammit
 from urllib.parse import urljoin
 from typing import Dict, List, Optional
 
@@ -22,6 +34,195 @@ except ImportError:
         # 如果都没有，使用占位符（但会导致功能不可用）
         BOOK_SITE_DOMAIN = ""
 
+# 请求头（同步 requests 与异步 aiohttp 抓取共用）
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+# 可选的 HTML 解析器（按依赖的模块名检查是否安装）
+HTML_PARSER_BACKENDS = {
+    'html.parser': None,
+    'lxml': 'lxml',
+    'selectolax': 'selectolax',
+}
+DEFAULT_HTML_PARSER = 'html.parser'
+
+# 详情页需要保留的区域（按 class 判断）
+DETAIL_REGION_CLASSES = ('post-title', 'post-info', 'post-content', 'post-download')
+
+_warned_backends = set()
+
+
+def get_parser_backend() -> str:
+    """
+    读取当前使用的 HTML 解析器（HTML_PARSER 环境变量），未安装时回退到 html.parser
+    
+    Returns:
+        解析器名称：html.parser / lxml / selectolax
+    """
+    backend = os.getenv("HTML_PARSER", DEFAULT_HTML_PARSER).strip().lower() or DEFAULT_HTML_PARSER
+    if backend not in HTML_PARSER_BACKENDS:
+        if backend not in _warned_backends:
+            _warned_backends.add(backend)
+            print(f"⚠️  未知的解析器 {backend}，使用 {DEFAULT_HTML_PARSER}（可选: {', '.join(HTML_PARSER_BACKENDS)}）")
+        return DEFAULT_HTML_PARSER
+    
+    module = HTML_PARSER_BACKENDS[backend]
+    if module and importlib.util.find_spec(module) is None:
+        if backend not in _warned_backends:
+            _warned_backends.add(backend)
+            print(f"⚠️  解析器 {backend} 未安装（pip install {module}），使用 {DEFAULT_HTML_PARSER}")
+        return DEFAULT_HTML_PARSER
+    return backend
+
+
+def _soup_features(backend: str) -> str:
+    """BeautifulSoup 使用的解析器（selectolax 不是 BeautifulSoup 后端，退回 lxml 或 html.parser）"""
+    if backend == 'selectolax':
+        return 'lxml' if importlib.util.find_spec('lxml') is not None else DEFAULT_HTML_PARSER
+    return backend
+
+
+def parse_scope_enabled() -> bool:
+    """详情页是否只构建需要的区域（PARSE_SCOPE=regions 时开启，默认构建完整文档树）"""
+    return os.getenv("PARSE_SCOPE", "full").strip().lower() == "regions"
+
+
+def _keep_detail_region(name: str, attrs) -> bool:
+    """判断顶层元素是否属于详情页需要保留的区域"""
+    attrs = attrs or {}
+    classes = attrs.get('class') or ''
+    if isinstance(classes, (list, tuple)):
+        classes = ' '.join(classes)
+    class_list = classes.split()
+    if any(region in class_list for region in DETAIL_REGION_CLASSES):
+        return True
+    if name == 'a':
+        href = attrs.get('href') or ''
+        return 'book-tag' in href or 'book-category' in href
+    return False
+
+
+try:
+    # bs4 >= 4.13：通过 ElementFilter 判断顶层元素是否创建
+    from bs4.filter import ElementFilter
+
+    class _DetailRegionFilter(ElementFilter):
+        def allow_tag_creation(self, nsprefix, name, attrs):
+            return _keep_detail_region(name, attrs)
+
+        def allow_string_creation(self, string):
+            return False
+
+    def detail_parse_only():
+        """详情页的 parse_only 过滤器：只构建需要的区域"""
+        return _DetailRegionFilter()
+except ImportError:
+    # bs4 < 4.13：SoupStrainer 的函数参数接收 (name, attrs)
+    def detail_parse_only():
+        """详情页的 parse_only 过滤器：只构建需要的区域"""
+        return SoupStrainer(_keep_detail_region)
+
+
+def parse_download_page_html(html, encoding: Optional[str] = None) -> Optional[Dict[str, str]]:
+    """
+    从下载页面 HTML 中提取诚通网盘的真实下载链接（不发起网络请求）
+    
+    Args:
+        html: 下载页面的 HTML 内容（str 或 bytes）
+        encoding: html 为 bytes 时的字符集（例如响应头中的 charset），None 则自动检测
+    
+    Returns:
+        Optional[Dict]: 如果找到诚通网盘下载链接，返回包含 download_url 的字典；
+                       如果不存在该下载方式，返回 None
+    """
+    soup = BeautifulSoup(html, _soup_features(get_parser_backend()), from_encoding=encoding)
+    
+    # 步骤1: 精确定位"诚通网盘下载"区域
+    # 方法1: 查找 class="source-title" 且包含"诚通网盘"的 div
+    cheng_tong_title = soup.find('div', class_='source-title', string=lambda x: x and '诚通网盘' in str(x) if x else False)
+    
+    if not cheng_tong_title:
+        # 方法2: 查找包含"诚通网盘下载"文本的元素
+        cheng_tong_text = soup.find(string=lambda x: x and '诚通网盘下载' in str(x) if x else False)
+        if cheng_tong_text:
+            # 向上查找包含该文本的 source-title div
+            parent = cheng_tong_text.parent
+            while parent:
+                if parent.name == 'div' and 'source-title' in str(parent.get('class', [])):
+                    cheng_tong_title = parent
+                    break
+                if parent.name in ['body', 'html']:
+                    break
+                parent = parent.parent
+    
+    if not cheng_tong_title:
+        # 如果找不到"诚通网盘下载"区域，返回 None
+        return None
+    
+    # 步骤2: 找到包含"诚通网盘下载"的容器（通常是 <div class="box">）
+    container = cheng_tong_title.parent
+    while container:
+        # 如果当前容器是 box，使用它
+        if container.name == 'div' and 'box' in str(container.get('class', [])):
+            break
+    
+        # 检查当前容器是否包含 button
+        button_div = container.find('div', class_='button')
+        if button_div:
+            # 找到了包含按钮的容器
+            break
+    
+        # 继续向上查找
+        container = container.parent
+    
+        # 如果已经到 body 或 html，停止
+        if not container or container.name in ['body', 'html']:
+            container = None
+            break
+    
+    if not container:
+        return None
+    
+    # 步骤3: 在容器内查找"立即下载"按钮并提取链接
+    # 方法1: 查找 class="button" 的 div 中的链接（最精确）
+    button_div = container.find('div', class_='button')
+    if button_div:
+        download_link = button_div.find('a', href=True)
+        if download_link:
+            download_url = download_link.get('href', '').strip()
+            # 验证是否是 ctfile.com 链接
+            if download_url and 'ctfile.com' in download_url.lower():
+                return {
+                    "download_url": download_url
+                }
+    
+    # 方法2: 在容器内查找包含"立即下载"文本的链接
+    download_links = container.find_all('a', string=lambda x: x and '立即下载' in str(x) if x else False)
+    for link in download_links:
+        href = link.get('href', '').strip()
+        if href and 'ctfile.com' in href.lower():
+            return {
+                "download_url": href
+            }
+    
+    # 方法3: 在容器内查找所有包含 ctfile.com 的链接（最后备用）
+    ctfile_links = container.find_all('a', href=lambda x: x and 'ctfile.com' in str(x).lower() if x else False)
+    if ctfile_links:
+        download_url = ctfile_links[0].get('href', '').strip()
+        if download_url:
+            return {
+                "download_url": download_url
+            }
+    
+    # 如果都没找到，返回 None
+    return None
+
 
 def parse_download_page(url: str) -> Optional[Dict[str, str]]:
     """
@@ -34,102 +235,13 @@ def parse_download_page(url: str) -> Optional[Dict[str, str]]:
         Optional[Dict]: 如果找到诚通网盘下载链接，返回包含 download_url 的字典；
                        如果不存在该下载方式，返回 None
     """
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
-    }
-    
     try:
         # 发送请求
-        response = requests.get(url, headers=headers, timeout=10)
+        response = requests.get(url, headers=REQUEST_HEADERS, timeout=10)
         response.raise_for_status()
         
         # 解析 HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 步骤1: 精确定位"诚通网盘下载"区域
-        # 方法1: 查找 class="source-title" 且包含"诚通网盘"的 div
-        cheng_tong_title = soup.find('div', class_='source-title', string=lambda x: x and '诚通网盘' in str(x) if x else False)
-        
-        if not cheng_tong_title:
-            # 方法2: 查找包含"诚通网盘下载"文本的元素
-            cheng_tong_text = soup.find(string=lambda x: x and '诚通网盘下载' in str(x) if x else False)
-            if cheng_tong_text:
-                # 向上查找包含该文本的 source-title div
-                parent = cheng_tong_text.parent
-                while parent:
-                    if parent.name == 'div' and 'source-title' in str(parent.get('class', [])):
-                        cheng_tong_title = parent
-                        break
-                    if parent.name in ['body', 'html']:
-                        break
-                    parent = parent.parent
-        
-        if not cheng_tong_title:
-            # 如果找不到"诚通网盘下载"区域，返回 None
-            return None
-        
-        # 步骤2: 找到包含"诚通网盘下载"的容器（通常是 <div class="box">）
-        container = cheng_tong_title.parent
-        while container:
-            # 如果当前容器是 box，使用它
-            if container.name == 'div' and 'box' in str(container.get('class', [])):
-                break
-            
-            # 检查当前容器是否包含 button
-            button_div = container.find('div', class_='button')
-            if button_div:
-                # 找到了包含按钮的容器
-                break
-            
-            # 继续向上查找
-            container = container.parent
-            
-            # 如果已经到 body 或 html，停止
-            if not container or container.name in ['body', 'html']:
-                container = None
-                break
-        
-        if not container:
-            return None
-        
-        # 步骤3: 在容器内查找"立即下载"按钮并提取链接
-        # 方法1: 查找 class="button" 的 div 中的链接（最精确）
-        button_div = container.find('div', class_='button')
-        if button_div:
-            download_link = button_div.find('a', href=True)
-            if download_link:
-                download_url = download_link.get('href', '').strip()
-                # 验证是否是 ctfile.com 链接
-                if download_url and 'ctfile.com' in download_url.lower():
-                    return {
-                        "download_url": download_url
-                    }
-        
-        # 方法2: 在容器内查找包含"立即下载"文本的链接
-        download_links = container.find_all('a', string=lambda x: x and '立即下载' in str(x) if x else False)
-        for link in download_links:
-            href = link.get('href', '').strip()
-            if href and 'ctfile.com' in href.lower():
-                return {
-                    "download_url": href
-                }
-        
-        # 方法3: 在容器内查找所有包含 ctfile.com 的链接（最后备用）
-        ctfile_links = container.find_all('a', href=lambda x: x and 'ctfile.com' in str(x).lower() if x else False)
-        if ctfile_links:
-            download_url = ctfile_links[0].get('href', '').strip()
-            if download_url:
-                return {
-                    "download_url": download_url
-                }
-        
-        # 如果都没找到，返回 None
-        return None
+        return parse_download_page_html(response.text)
         
     except requests.exceptions.RequestException as e:
         return None
@@ -153,39 +265,17 @@ def extract_book_id(url: str) -> Optional[str]:
     return None
 
 
-def parse_book_detail_enhanced(url: str) -> Dict:
+def new_book_result(url: str) -> Dict:
     """
-    解析书籍详情页，提取完整信息
+    创建空的书籍信息字典（字段说明见 parse_book_detail_enhanced）
     
     Args:
-        url: 书籍详情页 URL，例如: "https://www.dushupai.com/book-content-63067.html"
+        url: 书籍详情页 URL
     
     Returns:
-        Dict: 包含以下字段的字典：
-            - book_id: 书籍ID
-            - title: 书名
-            - author: 作者信息
-            - cover_image: 封面图片URL
-            - download_page: 下载页面URL
-            - download_url: 实际下载链接（需要进一步解析下载页）
-            - tags: 标签列表
-            - category: 分类
-            - isbn: ISBN号
-            - rating: 评分
-            - publish_date: 发布日期
-            - description: 内容简介
-            - author_bio: 作者简介
+        各字段均为默认值的结果字典
     """
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
-    }
-    
-    result = {
+    return {
         "book_id": extract_book_id(url) or "",
         "title": "",
         "author": "未知",
@@ -201,192 +291,438 @@ def parse_book_detail_enhanced(url: str) -> Dict:
         "author_bio": "",
         "formats": []
     }
+
+
+def _class_list(tag) -> List[str]:
+    """返回标签的 class 列表（兼容 class 为字符串的情况）"""
+    classes = tag.get('class') or []
+    if isinstance(classes, str):
+        classes = classes.split()
+    return classes
+
+
+def _tag_name_from_link(tag_text: str) -> str:
+    """从标签链接文本中提取标签名（链接文本可能是 "中国(5333)" 或 "中国"）"""
+    if '(' in tag_text:
+        return tag_text.split('(')[0].strip()
+    return tag_text
+
+
+def _section_text(reader, label_node, label: str, max_length: int) -> Optional[str]:
+    """
+    提取"内容简介"/"作者简介"这类小节的正文
     
-    try:
-        # 发送请求
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
+    优先取标题所在元素之后第一个有文本的兄弟节点，否则取标题所在元素自身的文本（去掉标题前缀）。
+    """
+    parent = reader.parent(label_node)
+    if parent is None:
+        return None
+    
+    text = ""
+    for text in reader.sibling_texts(parent):
+        if text:
+            break
+    
+    if not text:
+        text = reader.text(parent, strip=True)
+        text = re.sub(label + r'[：:]?\s*', '', text)
+    
+    return text[:max_length]
+
+
+class _SoupReader:
+    """BeautifulSoup 节点的读取方法（fill_book_fields 通过它访问节点）"""
+    
+    @staticmethod
+    def text(node, strip: bool = False) -> str:
+        return node.get_text(strip=strip)
+    
+    @staticmethod
+    def attr(node, name: str) -> str:
+        return node.get(name, '') or ''
+    
+    @staticmethod
+    def first(node, tag: str):
+        return node.find(tag)
+    
+    @staticmethod
+    def author_links(li) -> List:
+        return li.find_all('a', href=lambda x: x and 'book-author' in str(x) if x else False)
+    
+    @staticmethod
+    def parent(node):
+        return node.find_parent()
+    
+    @staticmethod
+    def sibling_texts(node):
+        for sibling in node.next_siblings:
+            if hasattr(sibling, 'get_text'):
+                yield sibling.get_text(strip=True)
+
+
+class _LexborReader:
+    """selectolax（lexbor）节点的读取方法，与 _SoupReader 一一对应"""
+    
+    @staticmethod
+    def text(node, strip: bool = False) -> str:
+        return node.text(strip=strip)
+    
+    @staticmethod
+    def attr(node, name: str) -> str:
+        return node.attributes.get(name) or ''
+    
+    @staticmethod
+    def first(node, tag: str):
+        return node.css_first(tag)
+    
+    @staticmethod
+    def author_links(li) -> List:
+        return li.css('a[href*="book-author"]')
+    
+    @staticmethod
+    def parent(node):
+        return node.parent
+    
+    @staticmethod
+    def sibling_texts(node):
+        sibling = node.next
+        while sibling is not None:
+            if sibling.tag == '-text':
+                yield (sibling.text_content or '').strip()
+            elif sibling.tag != '-comment':
+                yield sibling.text(strip=True)
+            sibling = sibling.next
+
+
+def scan_detail_document(soup) -> Dict:
+    """
+    单次遍历详情页文档树，收集提取各字段所需的节点
+    
+    按文档顺序深度优先遍历一次，同时记录（均为文档中第一个满足条件的节点，除非另有说明）：
+        - title_elem: h4.post-title
+        - post_info: .post-info，以及其子树中所有 li（info_items，按文档顺序）
+        - cover_img: .post-content 内的 img
+        - download_link: .post-download 内的 a
+        - tag_links: 所有 href 包含 book-tag 的 a（按文档顺序）
+        - category_link: href 包含 book-category 的 a
+        - desc_label / bio_label: 包含"内容简介"/"作者简介"的文本节点
+    
+    Args:
+        soup: BeautifulSoup 文档（或子树）
+    
+    Returns:
+        上述节点组成的字典
+    """
+    found = {
+        'title_elem': None,
+        'post_info': None,
+        'info_items': [],
+        'cover_img': None,
+        'download_link': None,
+        'tag_links': [],
+        'category_link': None,
+        'desc_label': None,
+        'bio_label': None,
+    }
+    
+    # 栈元素：(节点, 是否在 .post-content 内, 是否在 .post-download 内, 是否在第一个 .post-info 内)
+    stack = [(soup, False, False, False)]
+    while stack:
+        node, in_content, in_download, in_info = stack.pop()
         
-        # 解析 HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
+        if isinstance(node, NavigableString):
+            if found['desc_label'] is None and '内容简介' in node:
+                found['desc_label'] = node
+            if found['bio_label'] is None and '作者简介' in node:
+                found['bio_label'] = node
+            continue
         
-        # 1. 提取书名
-        title_elem = soup.select_one('h4.post-title')
-        if title_elem:
-            result["title"] = title_elem.get_text(strip=True)
+        name = node.name
+        classes = _class_list(node)
         
-        if not result["title"]:
-            post_info = soup.select_one('.post-info')
-            if post_info:
-                for li in post_info.find_all('li'):
-                    strong = li.find('strong')
-                    if strong and '书名' in strong.get_text():
-                        title_text = li.get_text().replace('书名：', '').strip()
-                        if title_text:
-                            result["title"] = title_text
-                            break
+        if name == 'h4' and found['title_elem'] is None and 'post-title' in classes:
+            found['title_elem'] = node
+        elif name == 'li' and in_info:
+            found['info_items'].append(node)
+        elif name == 'img' and in_content and found['cover_img'] is None:
+            found['cover_img'] = node
+        elif name == 'a':
+            if in_download and found['download_link'] is None:
+                found['download_link'] = node
+            href = node.get('href')
+            if href:
+                if 'book-tag' in str(href):
+                    found['tag_links'].append(node)
+                if found['category_link'] is None and 'book-category' in str(href):
+                    found['category_link'] = node
         
-        # 2. 提取作者信息
-        post_info = soup.select_one('.post-info')
-        if post_info:
-            for li in post_info.find_all('li'):
-                strong = li.find('strong')
-                if strong and '作者' in strong.get_text():
-                    author_links = li.find_all('a', href=lambda x: x and 'book-author' in str(x) if x else False)
-                    if author_links:
-                        authors = [link.get_text(strip=True) for link in author_links if link.get_text(strip=True)]
-                        if authors:
-                            result["author"] = " / ".join(authors)
-                    else:
-                        author_text = li.get_text().replace('作者：', '').strip()
-                        if author_text:
-                            result["author"] = author_text
-                    break
+        if found['post_info'] is None and 'post-info' in classes:
+            found['post_info'] = node
+            in_info = True
+        in_content = in_content or 'post-content' in classes
+        in_download = in_download or 'post-download' in classes
         
-        # 3. 提取封面图片
-        img_elem = soup.select_one('.post-content img')
-        if img_elem:
-            img_src = img_elem.get('src', '')
-            if img_src:
-                result["cover_image"] = urljoin(url, img_src)
+        children = node.contents
+        for child in reversed(children):
+            stack.append((child, in_content, in_download, in_info))
+    
+    return found
+
+
+def scan_detail_tree(tree) -> Dict:
+    """
+    selectolax 版本的 scan_detail_document：用 CSS 选择器收集同样的节点
+    
+    Args:
+        tree: LexborHTMLParser 文档
+    
+    Returns:
+        与 scan_detail_document 键相同的节点字典
+    """
+    post_info = tree.css_first('.post-info')
+    found = {
+        'title_elem': tree.css_first('h4.post-title'),
+        'post_info': post_info,
+        'info_items': post_info.css('li') if post_info is not None else [],
+        'cover_img': tree.css_first('.post-content img'),
+        'download_link': tree.css_first('.post-download a'),
+        'tag_links': tree.css('a[href*="book-tag"]'),
+        'category_link': tree.css_first('a[href*="book-category"]'),
+        'desc_label': None,
+        'bio_label': None,
+    }
+    
+    # 第一个包含小节标题文字的文本节点（注释也算，与 BeautifulSoup 的 Comment 一致）
+    for node in tree.root.traverse(include_text=True):
+        if node.tag == '-text':
+            text = node.text_content or ''
+        elif node.tag == '-comment':
+            text = node.comment_content or ''
+        else:
+            continue
+        if found['desc_label'] is None and '内容简介' in text:
+            found['desc_label'] = node
+        if found['bio_label'] is None and '作者简介' in text:
+            found['bio_label'] = node
+        if found['desc_label'] is not None and found['bio_label'] is not None:
+            break
+    return found
+
+
+def fill_book_fields(found: Dict, url: str, result: Dict, reader) -> Dict:
+    """
+    按收集到的节点提取书籍信息（各解析器共用的字段规则）
+    
+    Args:
+        found: scan_detail_document / scan_detail_tree 返回的节点字典
+        url: 详情页 URL，用于补全相对链接
+        result: 结果字典（new_book_result 创建），提取到的字段直接写入
+        reader: 节点读取方法（_SoupReader / _LexborReader）
+    
+    Returns:
+        result
+    """
+    # 1. 提取书名
+    title_elem = found['title_elem']
+    if title_elem is not None:
+        result["title"] = reader.text(title_elem, strip=True)
+    need_title = not result["title"]
+    
+    # 2. 提取作者信息，以及 7. 其他信息（ISBN、评分、发布日期等），书名缺失时顺便取书名
+    author_done = False
+    for li in found['info_items']:
+        strong = reader.first(li, 'strong')
+        if strong is None:
+            continue
         
-        # 4. 提取下载页面URL并解析实际下载链接
-        download_elem = soup.select_one('.post-download a')
-        if download_elem:
-            download_href = download_elem.get('href', '')
-            if download_href:
-                result["download_page"] = urljoin(url, download_href)
-                
-                # 解析下载页面，获取诚通网盘的实际下载链接
-                try:
-                    download_info = parse_download_page(result["download_page"])
-                    if download_info and download_info.get("download_url"):
-                        result["download_url"] = download_info["download_url"]
-                except Exception as e:
-                    # 如果解析失败，不影响其他信息的提取
-                    pass
+        strong_text = reader.text(strong)
+        li_text = reader.text(li)
         
-        # 5. 提取标签列表（关键功能）
-        # 方法1：直接查找包含 book-tag 的链接（最可靠）
-        tag_links = soup.find_all('a', href=lambda x: x and 'book-tag' in str(x) if x else False)
-        if tag_links:
-            tags = []
-            for link in tag_links:
-                tag_text = link.get_text(strip=True)
-                # 格式可能是 "中国(5333)" 或 "中国"
-                if '(' in tag_text:
-                    tag_name = tag_text.split('(')[0].strip()
-                else:
-                    tag_name = tag_text
-                
-                # 过滤掉空标签和数字标签（如年份）
-                if tag_name and tag_name not in tags:
-                    # 跳过纯数字标签（如年份）
-                    if not tag_name.isdigit():
-                        tags.append(tag_name)
-            
-            result["tags"] = tags
+        if need_title and '书名' in strong_text:
+            title_text = li_text.replace('书名：', '').strip()
+            if title_text:
+                result["title"] = title_text
+                need_title = False
         
-        # 方法2：如果方法1没找到，尝试查找"标签："后面的内容
-        if not result["tags"]:
-            for elem in soup.find_all(['div', 'p', 'span', 'strong']):
-                text = elem.get_text()
-                if '标签' in text and ('：' in text or ':' in text):
-                    # 查找父元素或兄弟元素中的标签链接
-                    parent = elem.find_parent()
-                    if parent:
-                        tag_links = parent.find_all('a', href=lambda x: x and 'book-tag' in str(x) if x else False)
-                        if tag_links:
-                            tags = []
-                            for link in tag_links:
-                                tag_text = link.get_text(strip=True)
-                                if '(' in tag_text:
-                                    tag_name = tag_text.split('(')[0].strip()
-                                else:
-                                    tag_name = tag_text
-                                if tag_name and tag_name not in tags and not tag_name.isdigit():
-                                    tags.append(tag_name)
-                            if tags:
-                                result["tags"] = tags
-                                break
+        if not author_done and '作者' in strong_text:
+            author_done = True
+            author_links = reader.author_links(li)
+            if author_links:
+                authors = [reader.text(link, strip=True) for link in author_links]
+                authors = [author for author in authors if author]
+                if authors:
+                    result["author"] = " / ".join(authors)
+            else:
+                author_text = li_text.replace('作者：', '').strip()
+                if author_text:
+                    result["author"] = author_text
         
-        # 6. 提取分类
-        category_link = soup.find('a', href=lambda x: x and 'book-category' in str(x) if x else False)
-        if category_link:
-            result["category"] = category_link.get_text(strip=True)
+        if 'ISBN' in strong_text:
+            result["isbn"] = li_text.replace('ISBN：', '').replace('ISBN:', '').strip()
+        elif '评分' in strong_text:
+            result["rating"] = li_text.replace('评分：', '').replace('评分:', '').strip()
+        elif '时间' in strong_text or '日期' in strong_text:
+            result["publish_date"] = li_text.replace('时间：', '').replace('日期：', '').strip()
+        elif '格式' in strong_text:
+            formats_text = li_text.replace('格式：', '').replace('格式:', '').strip()
+            result["formats"] = [f.strip() for f in formats_text.split(',') if f.strip()]
+    
+    # 3. 提取封面图片
+    img_elem = found['cover_img']
+    if img_elem is not None:
+        img_src = reader.attr(img_elem, 'src')
+        if img_src:
+            result["cover_image"] = urljoin(url, img_src)
+    
+    # 4. 提取下载页面URL（实际下载链接需要进一步解析下载页）
+    download_elem = found['download_link']
+    if download_elem is not None:
+        download_href = reader.attr(download_elem, 'href')
+        if download_href:
+            result["download_page"] = urljoin(url, download_href)
+    
+    # 5. 提取标签列表（关键功能）：包含 book-tag 的链接
+    # 过滤掉空标签和纯数字标签（如年份）
+    tags = []
+    for link in found['tag_links']:
+        tag_name = _tag_name_from_link(reader.text(link, strip=True))
+        if tag_name and tag_name not in tags and not tag_name.isdigit():
+            tags.append(tag_name)
+    result["tags"] = tags
+    
+    # 6. 提取分类
+    category_link = found['category_link']
+    if category_link is not None:
+        result["category"] = reader.text(category_link, strip=True)
+    
+    # 8. 提取内容简介 / 9. 提取作者简介
+    if found['desc_label'] is not None:
+        desc_text = _section_text(reader, found['desc_label'], '内容简介', 500)
+        if desc_text is not None:
+            result["description"] = desc_text
+    if found['bio_label'] is not None:
+        bio_text = _section_text(reader, found['bio_label'], '作者简介', 300)
+        if bio_text is not None:
+            result["author_bio"] = bio_text
+    
+    return result
+
+
+def extract_book_fields(soup, url: str, result: Dict) -> Dict:
+    """
+    从已解析的详情页文档中提取书籍信息（单次遍历文档树）
+    
+    Args:
+        soup: BeautifulSoup 文档
+        url: 详情页 URL，用于补全相对链接
+        result: 结果字典（new_book_result 创建），提取到的字段直接写入
+    
+    Returns:
+        result
+    """
+    return fill_book_fields(scan_detail_document(soup), url, result, _SoupReader)
+
+
+def extract_book_fields_selectolax(html, url: str, result: Dict, encoding: Optional[str] = None) -> Dict:
+    """
+    使用 selectolax（lexbor）提取书籍信息，字段规则与 extract_book_fields 共用（fill_book_fields）
+    
+    Args:
+        html: 详情页 HTML 内容（str 或 bytes）
+        url: 详情页 URL，用于补全相对链接
+        result: 结果字典（new_book_result 创建），提取到的字段直接写入
+        encoding: html 为 bytes 时的字符集，None 则自动检测
+    
+    Returns:
+        result
+    """
+    from selectolax.lexbor import LexborHTMLParser
+    
+    if isinstance(html, bytes):
+        html = UnicodeDammit(html, [encoding] if encoding else []).unicode_markup
+    tree = LexborHTMLParser(html)
+    return fill_book_fields(scan_detail_tree(tree), url, result, _LexborReader)
+
+
+def parse_book_detail_html(html, url: str, encoding: Optional[str] = None) -> Dict:
+    """
+    从详情页 HTML 中提取书籍信息（不发起网络请求，不解析下载页）
+    
+    Args:
+        html: 详情页 HTML 内容（str 或 bytes）
+        url: 详情页 URL，用于提取书籍ID和补全相对链接
+        encoding: html 为 bytes 时的字符集（例如响应头中的 charset），None 则自动检测
+    
+    Returns:
+        Dict: 字段同 parse_book_detail_enhanced，其中 download_url 为空，
+              由调用方抓取 download_page 后用 parse_download_page_html 填充
+    """
+    result = new_book_result(url)
+    
+    try:
+        backend = get_parser_backend()
+        if backend == 'selectolax':
+            return extract_book_fields_selectolax(html, url, result, encoding)
+        
+        # 解析 HTML（PARSE_SCOPE=regions 时只构建需要的区域）
+        parse_only = detail_parse_only() if parse_scope_enabled() else None
+        soup = BeautifulSoup(html, backend, from_encoding=encoding, parse_only=parse_only)
+        return extract_book_fields(soup, url, result)
         
-        # 7. 提取其他信息（ISBN、评分、发布日期等）
-        if post_info:
-            for li in post_info.find_all('li'):
-                strong = li.find('strong')
-                if not strong:
-                    continue
-                
-                strong_text = strong.get_text()
-                li_text = li.get_text()
-                
-                if 'ISBN' in strong_text:
-                    result["isbn"] = li_text.replace('ISBN：', '').replace('ISBN:', '').strip()
-                elif '评分' in strong_text:
-                    rating_text = li_text.replace('评分：', '').replace('评分:', '').strip()
-                    result["rating"] = rating_text
-                elif '时间' in strong_text or '日期' in strong_text:
-                    date_text = li_text.replace('时间：', '').replace('日期：', '').strip()
-                    result["publish_date"] = date_text
-                elif '格式' in strong_text:
-                    formats_text = li_text.replace('格式：', '').replace('格式:', '').strip()
-                    result["formats"] = [f.strip() for f in formats_text.split(',') if f.strip()]
+    except Exception as e:
+        print(f"❌ 解析过程出错: {e}")
+        import traceback
+        traceback.print_exc()
+        return result
+
+
+def parse_book_detail_enhanced(url: str) -> Dict:
+    """
+    解析书籍详情页，提取完整信息
+    
+    Args:
+        url: 书籍详情页 URL，例如: "https://www.dushupai.com/book-content-63067.html"
+    
+    Returns:
+        Dict: 包含以下字段的字典：
+            - book_id: 书籍ID
+            - title: 书名
+            - author: 作者信息
+            - cover_image: 封面图片URL
+            - download_page: 下载页面URL
+            - download_url: 实际下载链接（需要进一步解析下载页）
+            - tags: 标签列表
+            - category: 分类
+            - isbn: ISBN号
+            - rating: 评分
+            - publish_date: 发布日期
+            - description: 内容简介
+            - author_bio: 作者简介
+    """
+    result = new_book_result(url)
+    
+    try:
+        # 发送请求
+        response = requests.get(url, headers=REQUEST_HEADERS, timeout=10)
+        response.raise_for_status()
         
-        # 8. 提取内容简介
-        desc_elem = soup.find(string=re.compile(r'内容简介'))
-        if desc_elem:
-            # 查找简介内容（通常在"内容简介"后面的元素中）
-            parent = desc_elem.find_parent()
-            if parent:
-                # 查找下一个兄弟元素或父元素中的文本
-                desc_text = ""
-                for sibling in parent.next_siblings:
-                    if hasattr(sibling, 'get_text'):
-                        desc_text = sibling.get_text(strip=True)
-                        if desc_text:
-                            break
-                
-                if not desc_text:
-                    # 尝试从父元素中提取
-                    desc_text = parent.get_text(strip=True)
-                    # 去掉"内容简介："前缀
-                    desc_text = re.sub(r'内容简介[：:]?\s*', '', desc_text)
-                
-                result["description"] = desc_text[:500]  # 限制长度
+        result = parse_book_detail_html(response.text, url)
         
-        # 9. 提取作者简介
-        author_bio_elem = soup.find(string=re.compile(r'作者简介'))
-        if author_bio_elem:
-            parent = author_bio_elem.find_parent()
-            if parent:
-                bio_text = ""
-                for sibling in parent.next_siblings:
-                    if hasattr(sibling, 'get_text'):
-                        bio_text = sibling.get_text(strip=True)
-                        if bio_text:
-                            break
-                
-                if not bio_text:
-                    bio_text = parent.get_text(strip=True)
-                    bio_text = re.sub(r'作者简介[：:]?\s*', '', bio_text)
-                
-                result["author_bio"] = bio_text[:300]  # 限制长度
+        # 解析下载页面，获取诚通网盘的实际下载链接
+        if result["download_page"]:
+            try:
+                download_info = parse_download_page(result["download_page"])
+                if download_info and download_info.get("download_url"):
+                    result["download_url"] = download_info["download_url"]
+            except Exception:
+                # 如果解析失败，不影响其他信息的提取
+                pass
         
         return result
         
     except requests.exceptions.RequestException as e:
         print(f"❌ 请求失败: {e}")
         return result
-    except Exception as e:
-        print(f"❌ 解析过程出错: {e}")
-        import traceback
-        traceback.print_exc()
-        return result
 
 
 def main():
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能剖析模式：在 cProfile（可选 tracemalloc / 采样剖析器）下运行同步和构建脚本
+
+test_batch_sync.py、sync_all_books.py、parse_md_to_json.py、generate_index.py 都支持：
+
+    --profile                 在 cProfile 下运行，结束后输出热点函数报告
+    --profile-dir DIR         报告输出目录（默认 profiles/）
+    --profile-sample N        只处理前 N 个样本（书籍ID / md文件 / 书籍），不同运行之间的结果可以直接比较
+    --profile-memory          同时用 tracemalloc 统计内存分配（会明显变慢）
+    --profile-sampler         同时用采样剖析器 pyinstrument 记录调用树（需要 pip install pyinstrument）
+
+每次运行在输出目录中生成（<名称> 为 脚本名-时间）：
+    <名称>.pstats        cProfile 原始数据，可用 python -m pstats 或 snakeviz 打开
+    <名称>.txt           按累计耗时和自身耗时排序的热点函数
+    <名称>-memory.txt    分配内存最多的代码行和峰值内存（--profile-memory）
+    <名称>-sampler.html  采样剖析器的调用树（--profile-sampler）
+
+cProfile 只剖析当前进程：解析进程池和分片子进程中的工作不会出现在报告中，
+调用方在剖析模式下应改为在当前进程中解析。
+"""
+
+import cProfile
+import importlib.util
+import io
+import pstats
+import time
+import tracemalloc
+from pathlib import Path
+
+PROFILE_DIR = Path(__file__).parent.parent.parent / "profiles"  # 默认输出目录（仓库根目录下）
+PROFILE_TOP = 40  # 报告中列出的函数数量
+MEMORY_TOP = 30  # 内存报告中列出的代码行数量
+
+
+def add_profile_arguments(parser, sample_help: str = '只处理前 N 个样本'):
+    """
+    给命令行解析器添加剖析相关的参数
+
+    Args:
+        parser: argparse 解析器
+        sample_help: --profile-sample 的说明（各脚本的样本含义不同）
+    """
+    group = parser.add_argument_group('性能剖析')
+    group.add_argument('--profile', action='store_true', help='在 cProfile 下运行，输出热点函数报告')
+    group.add_argument('--profile-dir', type=Path, default=PROFILE_DIR,
+                       help=f'剖析报告输出目录（默认：{PROFILE_DIR.name}/）')
+    group.add_argument('--profile-sample', type=int, metavar='N', help=sample_help)
+    group.add_argument('--profile-memory', action='store_true', help='同时用 tracemalloc 统计内存分配')
+    group.add_argument('--profile-sampler', action='store_true',
+                       help='同时用采样剖析器 pyinstrument 记录调用树（需要 pip install pyinstrument）')
+
+
+def format_stats(profiler: cProfile.Profile, top: int = PROFILE_TOP) -> str:
+    """按累计耗时和自身耗时排序的热点函数报告"""
+    parts = []
+    for sort_key, title in (('cumulative', '按累计耗时排序'), ('tottime', '按自身耗时排序')):
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.strip_dirs().sort_stats(sort_key).print_stats(top)
+        parts.append(f"===== {title}（前 {top} 个）=====\n{stream.getvalue()}")
+    return '\n'.join(parts)
+
+
+def format_memory(snapshot: tracemalloc.Snapshot, peak: int, top: int = MEMORY_TOP) -> str:
+    """分配内存最多的代码行"""
+    lines = [f"峰值内存（tracemalloc）: {peak / 1024 / 1024:.1f} MB", f"===== 分配最多的 {top} 行 ====="]
+    for index, stat in enumerate(snapshot.statistics('lineno')[:top], 1):
+        frame = stat.traceback[0]
+        lines.append(f"{index:3d}. {frame.filename}:{frame.lineno}  {stat.size / 1024:.1f} KB（{stat.count} 次）")
+    return '\n'.join(lines) + '\n'
+
+
+def run_profiled(name: str, func, args):
+    """
+    按命令行参数决定是否在剖析器下运行 func
+
+    Args:
+        name: 报告文件名前缀（通常是脚本名）
+        func: 要运行的函数（无参数）
+        args: 包含 add_profile_arguments 添加的参数的命令行参数
+
+    Returns:
+        func 的返回值
+    """
+    if not args.profile:
+        return func()
+
+    sampler = None
+    if args.profile_sampler:
+        if importlib.util.find_spec('pyinstrument') is None:
+            print("⚠️  未安装 pyinstrument，跳过采样剖析（pip install pyinstrument）")
+        else:
+            from pyinstrument import Profiler
+            sampler = Profiler()
+    if args.profile_memory:
+        tracemalloc.start()
+
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    if sampler:
+        sampler.start()
+    profiler.enable()
+    try:
+        return func()
+    finally:
+        profiler.disable()
+        if sampler:
+            sampler.stop()
+        elapsed = time.perf_counter() - started
+        if args.profile_memory:
+            # 在生成报告之前拍快照，报告本身的内存分配不计入
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        output_dir = Path(args.profile_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        prefix = output_dir / f"{name}-{time.strftime('%Y%m%d-%H%M%S')}"
+        profiler.dump_stats(f"{prefix}.pstats")
+        sample = f"，样本 {args.profile_sample}" if args.profile_sample else ""
+        header = f"{name}：总耗时 {elapsed:.2f} 秒{sample}\n\n"
+        Path(f"{prefix}.txt").write_text(header + format_stats(profiler), encoding='utf-8')
+        print(f"\n🔬 剖析报告: {prefix}.txt（原始数据 {prefix.name}.pstats）")
+        if args.profile_memory:
+            Path(f"{prefix}-memory.txt").write_text(format_memory(snapshot, peak), encoding='utf-8')
+            print(f"🔬 内存报告: {prefix}-memory.txt（峰值 {peak / 1024 / 1024:.1f} MB）")
+        if sampler:
+            Path(f"{prefix}-sampler.html").write_text(sampler.output_html(), encoding='utf-8')
+            print(f"🔬 采样调用树: {prefix}-sampler.html")
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应限速模块：按主机划分的令牌桶 + AIMD 调速
+
+- 响应正常且延迟不高时，请求速率线性增加（加性增）；第一次降速之前按指数增加（慢启动），
+  很快找到站点能承受的速率
+- 遇到 429 时速率按比例下降（乘性减）；5xx / 超时 / 连接错误只有在最近的请求中占比超过
+  ERROR_RATIO_THRESHOLD 时才降速，偶发的单个错误不会让速率减半（失败的请求由重试机制处理）
+- 每个主机（或主机后缀，例如 ctfile.com）有独立的速率预算
+- 记录实际完成的请求数，用于报告有效请求速率
+
+配置（环境变量）：
+    RATE_LIMIT_DEFAULT   默认初始速率（请求/秒），默认 20（原固定延迟版本 20 并发 × 0.5 秒间隔的量级）
+    RATE_LIMIT_MIN       速率下限，默认 0.5
+    RATE_LIMIT_MAX       速率上限，默认 50
+    RATE_LIMITS          按主机指定初始速率，例如 "www.dushupai.com=8,ctfile.com=2"
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+# 默认配置
+DEFAULT_RATE = float(os.getenv("RATE_LIMIT_DEFAULT", "20"))  # 初始速率（请求/秒）
+MIN_RATE = float(os.getenv("RATE_LIMIT_MIN", "0.5"))  # 速率下限
+MAX_RATE = float(os.getenv("RATE_LIMIT_MAX", "50"))  # 速率上限
+ADDITIVE_INCREASE = 1.0  # 每秒正常流量带来的速率增量（请求/秒）
+SLOW_START_INCREASE = 0.5  # 慢启动阶段每个正常请求带来的速率增量（速率每秒约增加一半）
+MULTIPLICATIVE_DECREASE = 0.5  # 出错时速率乘以该系数
+SLOW_LATENCY = 3.0  # 超过该延迟（秒）视为服务端吃紧，暂停加速
+DECREASE_COOLDOWN = 1.0  # 两次降速之间的最小间隔（秒），避免并发失败把速率一次压到底
+RATE_WINDOW = 60.0  # 有效速率统计窗口（秒）
+ERROR_WINDOW = 10.0  # 错误率统计窗口（秒）
+ERROR_RATIO_THRESHOLD = 0.2  # 窗口内 5xx / 超时 / 连接错误的占比超过该值时降速
+MIN_ERROR_SAMPLES = 10  # 窗口内至少有这么多个请求才计算错误率
+
+
+def parse_rate_limits(spec: str) -> Dict[str, float]:
+    """
+    解析按主机配置的速率
+
+    Args:
+        spec: 形如 "www.dushupai.com=8,ctfile.com=2" 的字符串
+
+    Returns:
+        {主机: 初始速率}
+    """
+    limits = {}
+    for item in spec.split(','):
+        item = item.strip()
+        if not item or '=' not in item:
+            continue
+        host, rate = item.split('=', 1)
+        try:
+            limits[host.strip().lower()] = float(rate)
+        except ValueError:
+            print(f"⚠️  忽略无效的限速配置: {item}")
+    return limits
+
+
+class AdaptiveRateLimiter:
+    """单个主机的令牌桶限速器（AIMD 调速）"""
+
+    def __init__(self, rate: float = DEFAULT_RATE, min_rate: float = MIN_RATE,
+                 max_rate: float = MAX_RATE):
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, min_rate)
+        self.rate = min(max(rate, self.min_rate), self.max_rate)
+        self.tokens = 1.0
+        self._updated = time.monotonic()
+        self._last_decrease = 0.0
+        self._slow_start = True
+        self._lock = asyncio.Lock()
+
+        # 统计信息
+        self.started = time.monotonic()
+        self.requests = 0
+        self.throttled = 0
+        self._recent = deque()
+        self._outcomes = deque()  # 最近的 (时间, 是否出错)，用于计算错误率
+        self._window_errors = 0
+
+    def _refill(self, now: float):
+        """按当前速率补充令牌（桶容量为 1 秒的请求量）"""
+        capacity = max(1.0, self.rate)
+        self.tokens = min(capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """获取一个令牌，不足时等待（等待期间不占用并发槽位）"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self.tokens) / self.rate)
+
+    def record(self, status: Optional[int], latency: float):
+        """
+        记录一次请求结果并调整速率
+
+        Args:
+            status: HTTP 状态码；超时或连接错误传 None
+            latency: 请求耗时（秒）
+        """
+        now = time.monotonic()
+        self.requests += 1
+        self._recent.append(now)
+        while self._recent and now - self._recent[0] > RATE_WINDOW:
+            self._recent.popleft()
+
+        failed = status is None or status >= 500
+        self._outcomes.append((now, failed))
+        self._window_errors += failed
+        # 只统计上次降速之后的请求，降速前的错误不会再次触发降速
+        window_start = max(now - ERROR_WINDOW, self._last_decrease)
+        while self._outcomes and self._outcomes[0][0] < window_start:
+            self._window_errors -= self._outcomes.popleft()[1]
+
+        if status == 429 or failed:
+            self.throttled += 1
+            # 429 是服务器明确要求降速；其他错误只在错误率超过阈值时降速
+            overloaded = status == 429 or (len(self._outcomes) >= MIN_ERROR_SAMPLES and
+                                           self._window_errors > ERROR_RATIO_THRESHOLD * len(self._outcomes))
+            if overloaded and now - self._last_decrease >= DECREASE_COOLDOWN:
+                self.rate = max(self.min_rate, self.rate * MULTIPLICATIVE_DECREASE)
+                self.tokens = min(self.tokens, 0.0)
+                self._last_decrease = now
+                self._slow_start = False
+        elif latency < SLOW_LATENCY:
+            # 加性增：每个请求增加 ADDITIVE_INCREASE / rate，相当于每秒增加 ADDITIVE_INCREASE；
+            # 慢启动阶段每个请求增加 SLOW_START_INCREASE，速率按指数增长
+            increase = SLOW_START_INCREASE if self._slow_start else ADDITIVE_INCREASE / self.rate
+            self.rate = min(self.max_rate, self.rate + increase)
+
+    def effective_rate(self) -> float:
+        """最近统计窗口内的实际请求速率（请求/秒）"""
+        if not self._recent:
+            return 0.0
+        span = min(RATE_WINDOW, time.monotonic() - self.started)
+        return len(self._recent) / span if span > 0 else 0.0
+
+    def stats(self) -> Dict:
+        """返回统计信息"""
+        elapsed = time.monotonic() - self.started
+        return {
+            'rate_limit': round(self.rate, 2),
+            'effective_rate': round(self.effective_rate(), 2),
+            'average_rate': round(self.requests / elapsed, 2) if elapsed > 0 else 0.0,
+            'requests': self.requests,
+            'throttled': self.throttled,
+        }
+
+
+class HostRateLimiter:
+    """按主机分配独立的限速器"""
+
+    def __init__(self, limits: Optional[Dict[str, float]] = None,
+                 default_rate: float = DEFAULT_RATE, max_rate: float = MAX_RATE):
+        if limits is None:
+            limits = parse_rate_limits(os.getenv("RATE_LIMITS", ""))
+        self.limits = limits
+        self.default_rate = default_rate
+        self.max_rate = max_rate
+        self._limiters: Dict[str, AdaptiveRateLimiter] = {}
+
+    def _key(self, url: str) -> str:
+        """找到 URL 对应的配置键：精确主机或主机后缀（ctfile.com 匹配 xxx.ctfile.com）"""
+        host = (urlparse(url).hostname or '').lower()
+        for pattern in self.limits:
+            if host == pattern or host.endswith('.' + pattern):
+                return pattern
+        return host
+
+    def get(self, url: str) -> AdaptiveRateLimiter:
+        """获取 URL 所属主机的限速器"""
+        key = self._key(url)
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            limiter = AdaptiveRateLimiter(self.limits.get(key, self.default_rate), max_rate=self.max_rate)
+            self._limiters[key] = limiter
+        return limiter
+
+    async def acquire(self, url: str):
+        """获取 URL 所属主机的令牌"""
+        await self.get(url).acquire()
+
+    def record(self, url: str, status: Optional[int], latency: float):
+        """记录 URL 所属主机的请求结果"""
+        self.get(url).record(status, latency)
+
+    def stats(self) -> Dict[str, Dict]:
+        """返回所有主机的统计信息"""
+        return {host: limiter.stats() for host, limiter in sorted(self._limiters.items())}
+
+    def summary(self) -> str:
+        """返回一行速率摘要，用于进度输出"""
+        return ", ".join(
+            f"{host} {limiter.effective_rate():.1f}/s (上限 {limiter.rate:.1f}/s)"
+            for host, limiter in sorted(self._limiters.items())
+        )
+
+
+def split_rate_env(parts: int) -> Dict[str, str]:
+    """
+    把当前的速率配置平均分给多个进程，返回子进程需要设置的环境变量
+
+    多进程分片抓取时每个进程都有自己的限速器，按进程数均分速率预算，
+    保证对同一主机的总请求速率与单进程时一致。
+
+    Args:
+        parts: 进程数
+
+    Returns:
+        环境变量字典（RATE_LIMIT_DEFAULT / RATE_LIMIT_MIN / RATE_LIMIT_MAX / RATE_LIMITS）
+    """
+    parts = max(1, parts)
+    limits = parse_rate_limits(os.getenv("RATE_LIMITS", ""))
+    return {
+        'RATE_LIMIT_DEFAULT': f"{DEFAULT_RATE / parts:g}",
+        'RATE_LIMIT_MIN': f"{MIN_RATE / parts:g}",
+        'RATE_LIMIT_MAX': f"{MAX_RATE / parts:g}",
+        'RATE_LIMITS': ",".join(f"{host}={rate / parts:g}" for host, rate in limits.items()),
+    }
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+抓取结果日志：每解析完一本书立即追加一行 JSON，定期 fsync
+
+- 进程中断或超时被杀时，已写入（并 fsync）的书籍不会丢失，下次运行可直接复用
+- 生成md文件时从日志流式读取，并按标签分组写入临时分片文件（TagSpool），
+  内存占用与抓取范围大小无关
+- 需要按书籍ID顺序读取时（合并多个分片的日志）分段外部排序后归并，同样不整体加载
+"""
+
+import heapq
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List
+
+from status_table import FAILED_STATUSES, STATUS_CODES, STATUS_OK
+
+FSYNC_EVERY = 200  # 每写入多少条记录 fsync 一次
+FSYNC_INTERVAL = 5.0  # 距上次 fsync 超过多少秒时 fsync
+SPOOL_MAX_OPEN = 256  # 按标签分组时最多同时打开的分片文件数
+SORT_RUN_RECORDS = 20000  # 外部排序时每个有序分段的最大记录数
+
+
+class ResultJournal:
+    """追加写入的 JSONL 结果日志"""
+
+    def __init__(self, path: Path, fsync_every: int = FSYNC_EVERY,
+                 fsync_interval: float = FSYNC_INTERVAL):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.written = 0
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def append(self, record: Dict):
+        """追加一条记录，按条数或时间间隔 fsync"""
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.written += 1
+        self._pending += 1
+        if self._pending >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        """把缓冲区内容写入磁盘"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        """fsync 并关闭日志"""
+        if self._file.closed:
+            return
+        self.sync()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_journal(paths: Iterable[Path]) -> Iterator[Dict]:
+    """
+    按顺序流式读取一个或多个日志文件
+
+    中断时最后一行可能不完整，解析失败的行会被跳过。
+    """
+    for path in paths:
+        path = Path(path)
+        if not path.exists():
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def _record_book_id(record: Dict) -> int:
+    return int(record['book_id'])
+
+
+def sort_journal_runs(path: Path, run_dir: Path, run_records: int = SORT_RUN_RECORDS) -> List[Path]:
+    """
+    把日志分段按书籍ID排序：每读入 run_records 条记录排序后写入一个分段文件
+
+    内存中最多同时保留一个分段，run_dir 中之前留下的分段会先被删除。
+
+    Args:
+        path: 日志文件
+        run_dir: 存放有序分段的目录
+        run_records: 每个分段的最大记录数
+
+    Returns:
+        分段文件列表（每个文件内部按书籍ID升序）
+    """
+    run_dir = Path(run_dir)
+    shutil.rmtree(run_dir, ignore_errors=True)
+    run_dir.mkdir(parents=True)
+    runs = []
+
+    def write_run(records: List[Dict]):
+        records.sort(key=_record_book_id)
+        run_file = run_dir / f"run-{len(runs):05d}.jsonl"
+        with open(run_file, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        runs.append(run_file)
+
+    records = []
+    for record in iter_journal([path]):
+        records.append(record)
+        if len(records) >= run_records:
+            write_run(records)
+            records = []
+    if records:
+        write_run(records)
+    return runs
+
+
+def merge_journal_runs(runs: Iterable[Path]) -> Iterator[Dict]:
+    """按书籍ID顺序流式归并多个有序分段（sort_journal_runs 的结果，可以来自多个日志）"""
+    return heapq.merge(*(iter_journal([run]) for run in runs), key=_record_book_id)
+
+
+def journal_statuses(paths: Iterable[Path]) -> Dict[int, str]:
+    """读取日志中已记录的书籍ID及其抓取状态名称（旧版日志没有状态字段，按成功处理）"""
+    statuses = {}
+    for record in iter_journal(paths):
+        try:
+            book_id = int(record['book_id'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        statuses.setdefault(book_id, record.get('crawl_status') or 'ok')
+    return statuses
+
+
+def restore_journaled_statuses(statuses: Dict[int, str], status_table, dead_letter):
+    """
+    按结果日志中记录的最终状态补记状态表和死信列表（中断时状态表可能还没落盘）
+
+    下载页失败的书保持失败状态并留在死信列表中，之后的运行会重新抓取。
+
+    Args:
+        statuses: journal_statuses 的返回值（书籍ID -> 状态名称）
+        status_table: 抓取状态表（StatusTable）
+        dead_letter: 死信列表（DeadLetterList）
+    """
+    for book_id, name in statuses.items():
+        status = STATUS_CODES.get(name, STATUS_OK)
+        status_table.set(book_id, status)
+        if status not in FAILED_STATUSES:
+            dead_letter.discard(book_id)
+        elif book_id not in dead_letter.entries:
+            dead_letter.add(book_id, name, 0, '中断前已写入结果日志')
+
+
+class TagSpool:
+    """
+    把记录按标签分组写入临时分片文件，之后逐个标签读回
+
+    同时打开的文件数受 SPOOL_MAX_OPEN 限制（最近最少使用的先关闭），
+    适合标签数量多、记录总量大、无法全部放进内存的场景。
+    """
+
+    def __init__(self, parent_dir: Path, max_open: int = SPOOL_MAX_OPEN):
+        Path(parent_dir).mkdir(parents=True, exist_ok=True)
+        self.spool_dir = Path(tempfile.mkdtemp(prefix='spool-', dir=str(parent_dir)))
+        self.max_open = max_open
+        self.counts: Dict[str, int] = {}
+        self._names: Dict[str, str] = {}
+        self._handles = OrderedDict()
+
+    def _handle(self, key: str):
+        handle = self._handles.get(key)
+        if handle is not None:
+            self._handles.move_to_end(key)
+            return handle
+        if len(self._handles) >= self.max_open:
+            _, oldest = self._handles.popitem(last=False)
+            oldest.close()
+        if key not in self._names:
+            self._names[key] = f"{len(self._names):06d}.jsonl"
+        handle = open(self.spool_dir / self._names[key], 'a', encoding='utf-8')
+        self._handles[key] = handle
+        return handle
+
+    def count(self, key: str, n: int = 1):
+        """只计数不写入（例如没有下载链接、不会出现在md文件中的书）"""
+        self.counts[key] = self.counts.get(key, 0) + n
+
+    def add(self, key: str, record: Dict):
+        """写入一条记录并计数"""
+        self._handle(key).write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.count(key)
+
+    def read(self, key: str) -> List[Dict]:
+        """读回某个标签的全部记录（按写入顺序）"""
+        handle = self._handles.pop(key, None)
+        if handle is not None:
+            handle.close()
+        name = self._names.get(key)
+        if name is None:
+            return []
+        return list(iter_journal([self.spool_dir / name]))
+
+    def close(self):
+        """关闭并删除所有分片文件"""
+        for handle in self._handles.values():
+            handle.close()
+        self._handles.clear()
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+失败重试：带随机抖动的指数退避 + 死信列表
+
+- 超时、连接错误、429 / 5xx 等临时错误在本次运行中按指数退避重试，每个ID最多尝试 RETRY_MAX_ATTEMPTS 次
+- 服务器返回 Retry-After 时，等待时间不少于该值
+- 用完重试次数仍失败的ID写入死信文件，之后可以用 --retry-failed 只重新抓取这些ID
+
+配置（环境变量）：
+    RETRY_MAX_ATTEMPTS   每个ID的最大尝试次数（含第一次），默认 4
+    RETRY_BASE_DELAY     第一次重试前的等待时间（秒），默认 2
+    RETRY_MAX_DELAY      单次等待时间上限（秒），默认 60
+"""
+
+import json
+import os
+import random
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "4"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "2"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "60"))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    解析 Retry-After 响应头（只支持秒数形式，HTTP 日期形式忽略）
+
+    Args:
+        value: 响应头的值
+
+    Returns:
+        等待秒数，无法解析时返回None
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value.strip()))
+    except ValueError:
+        return None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    计算第 attempt 次失败后的等待时间
+
+    基础值为 RETRY_BASE_DELAY * 2^(attempt-1)，不超过 RETRY_MAX_DELAY，再乘以 0.5~1.5 的随机系数，
+    避免大量同时失败的请求在同一时刻重试。
+
+    Args:
+        attempt: 已经失败的次数（从1开始）
+        retry_after: 服务器要求的等待时间（秒）
+
+    Returns:
+        等待秒数
+    """
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    delay *= random.uniform(0.5, 1.5)
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, RETRY_MAX_DELAY))
+    return delay
+
+
+def should_retry(attempts: int, stopped: bool = False) -> bool:
+    """
+    失败 attempts 次后是否还要在本次运行中重试（否则记入死信列表）
+
+    Args:
+        attempts: 已经失败的次数
+        stopped: 是否已停止调度（时间预算用完后不再安排重试）
+
+    Returns:
+        是否重试
+    """
+    return attempts < RETRY_MAX_ATTEMPTS and not stopped
+
+
+class DeadLetterList:
+    """用完重试次数仍然失败的书籍ID列表（JSON Lines 文件，每个ID一行）"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.entries: Dict[int, Dict] = {}
+        self.dirty = False
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.entries[int(entry['book_id'])] = entry
+
+    def add(self, book_id: int, status: str, attempts: int, error: Optional[str] = None):
+        """
+        记录一个失败的ID（同一ID以最后一次为准）
+
+        Args:
+            book_id: 书籍ID
+            status: 最终状态名称（error / retry_after）
+            attempts: 本次运行的尝试次数
+            error: 最后一次的错误信息
+        """
+        previous = self.entries.get(book_id, {})
+        self.entries[book_id] = {
+            'book_id': book_id,
+            'status': status,
+            'attempts': attempts,
+            'runs': previous.get('runs', 0) + 1,
+            'error': error,
+            'failed_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        self.dirty = True
+
+    def discard(self, book_id: int):
+        """ID已经抓取成功（或确定不存在），从死信列表中移除"""
+        if self.entries.pop(book_id, None) is not None:
+            self.dirty = True
+
+    def ids(self, start_id: int = 1, end_id: Optional[int] = None) -> List[int]:
+        """返回范围内的失败ID（升序）"""
+        return sorted(
+            book_id for book_id in self.entries
+            if book_id >= start_id and (end_id is None or book_id <= end_id)
+        )
+
+    def save(self):
+        """有修改时原子重写死信文件"""
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for book_id in sorted(self.entries):
+                f.write(json.dumps(self.entries[book_id], ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.path)
+        self.dirty = False
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载链接重新验证：按优先级抽查已收录书籍的诚通网盘链接，标记并移除失效的行
+
+书籍写入md文件后不会再被访问，网盘链接失效了也没有人发现。重新验证每次运行只发出
+有限数量的请求（请求预算），按优先级（优先队列）挑选要检查的链接：
+
+- 距上次验证越久越优先（从未验证过的视为最久）
+- 所在标签越热门越优先（标签书籍数取对数）
+- 之前连续失效次数越多越优先（尽快确认是否真的失效）
+
+每个链接先用 HEAD 请求检查（服务器不支持时改用 GET，见 liveness_scan.probe_url）：
+
+- 有效：记录验证时间，连续失效次数清零
+- 失效（404 等）：有站点书籍ID时重新抓取详情页和下载页（最多2个请求），
+  下载页给出了新链接就更新书籍；否则连续失效次数加1，
+  达到 REVALIDATE_REMOVE_AFTER 次后从数据库中删除该书
+- 429 / 5xx / 超时：结果未知，不记录，之后再检查
+
+验证结果记录在书籍数据库（book_store 的 link_checks 表）中，仍在md文件中的失效链接
+写入 dead_links.json；只重新生成有书籍被更新或删除的标签文件。
+
+注意：需要书籍数据库（BOOK_STORE 不能为 0，数据库不存在时从md文件创建）；
+导入本模块前需要先设置 OUTPUT_DIR 环境变量
+
+配置（环境变量）：
+    REVALIDATE_BUDGET         每次运行最多发出的请求数，默认 300
+    REVALIDATE_MIN_AGE_DAYS   距上次验证不足这么多天的有效链接不检查，默认 7
+    REVALIDATE_REMOVE_AFTER   连续失效多少次后删除，默认 2
+    REVALIDATE_CONCURRENCY    同时检查的链接数，默认 16
+"""
+
+import asyncio
+import heapq
+import json
+import math
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+import test_batch_sync
+from book_store import book_store_enabled
+from html_archive import HtmlArchive, html_archive_enabled
+from liveness_scan import LIVE_NO, LIVE_YES, classify_status, probe_url
+from rate_limiter import HostRateLimiter
+from status_table import STATUS_MISSING, STATUS_NO_DOWNLOAD, STATUS_OK
+
+REVALIDATE_BUDGET = int(os.getenv("REVALIDATE_BUDGET", "300"))
+REVALIDATE_MIN_AGE_DAYS = float(os.getenv("REVALIDATE_MIN_AGE_DAYS", "7"))
+REVALIDATE_REMOVE_AFTER = int(os.getenv("REVALIDATE_REMOVE_AFTER", "2"))
+REVALIDATE_CONCURRENCY = int(os.getenv("REVALIDATE_CONCURRENCY", "16"))
+DEAD_LINKS_FILE = test_batch_sync.OUTPUT_DIR / "dead_links.json"  # 仍在md文件中的失效链接
+
+MAX_AGE_DAYS = 365  # 验证时间最多按一年计（从未验证过的链接也按一年计）
+POPULARITY_WEIGHT = 10  # 标签书籍数每翻一倍，相当于多等 10 天
+FAILURE_WEIGHT = 60  # 每次连续失效相当于多等 60 天
+
+
+def revalidation_priority(checked_at: Optional[float], failures: int, popularity: int,
+                          now: float) -> float:
+    """
+    链接的检查优先级（越大越先检查）
+
+    Args:
+        checked_at: 上次验证时间（None 表示从未验证）
+        failures: 连续失效次数
+        popularity: 所在标签中最大的书籍数
+        now: 当前时间
+
+    Returns:
+        优先级
+    """
+    age_days = MAX_AGE_DAYS if checked_at is None else min(MAX_AGE_DAYS, (now - checked_at) / 86400)
+    return age_days + POPULARITY_WEIGHT * math.log2(1 + popularity) + FAILURE_WEIGHT * failures
+
+
+def build_queue(store, min_age_days: float = REVALIDATE_MIN_AGE_DAYS) -> List[Tuple]:
+    """
+    从书籍数据库构建优先队列（堆）
+
+    Args:
+        store: 书籍数据库
+        min_age_days: 距上次验证不足这么多天的有效链接不检查
+
+    Returns:
+        堆，元素为 (-优先级, 行号, 站点书籍ID, 下载链接)
+    """
+    now = time.time()
+    queue = []
+    for key, book_id, url, checked_at, failures, popularity in store.link_check_candidates():
+        if failures == 0 and checked_at is not None and now - checked_at < min_age_days * 86400:
+            continue
+        queue.append((-revalidation_priority(checked_at, failures, popularity, now), key, book_id, url))
+    heapq.heapify(queue)
+    return queue
+
+
+class RequestBudget:
+    """本次运行剩余的请求数"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.remaining = total
+
+    def take(self, count: int = 1) -> bool:
+        """预留 count 个请求，剩余不足时返回 False"""
+        if self.remaining < count:
+            return False
+        self.remaining -= count
+        return True
+
+    def refund(self, count: int):
+        """退回预留但没有用到的请求"""
+        self.remaining += count
+
+    @property
+    def spent(self) -> int:
+        return self.total - self.remaining
+
+
+async def refetch_book(ctx: test_batch_sync.CrawlContext, book_id: int) -> Tuple[int, Optional[Dict], int]:
+    """
+    重新抓取一本书的详情页和下载页（每个页面只请求一次，不重试）
+
+    Args:
+        ctx: 抓取上下文
+        book_id: 站点书籍ID
+
+    Returns:
+        (抓取状态, 书籍信息, 实际发出的请求数)；出错时状态为出错 / 稍后重试
+    """
+    job = test_batch_sync.BookJob(book_id)
+    requests_sent = 0
+    while True:
+        requests_sent += 1
+        if not await test_batch_sync.fetch_stage(ctx, job):
+            break
+        if not await test_batch_sync.parse_stage(ctx, job):
+            break
+    return job.status, job.result, requests_sent
+
+
+async def revalidate_links(budget: int = REVALIDATE_BUDGET,
+                           remove_after: int = REVALIDATE_REMOVE_AFTER) -> bool:
+    """
+    在请求预算内按优先级重新验证下载链接
+
+    Args:
+        budget: 最多发出的请求数
+        remove_after: 连续失效多少次后删除
+
+    Returns:
+        是否成功
+    """
+    print("=" * 80)
+    print(f"🔗 重新验证下载链接（请求预算 {budget}）")
+    print("=" * 80)
+    if not book_store_enabled():
+        print("❌ 重新验证需要书籍数据库，请不要设置 BOOK_STORE=0")
+        return False
+
+    start_time = time.time()
+    status_table = test_batch_sync.load_status_table()
+    # 数据库不在仓库中（CI 中由缓存恢复）；缓存失效时从md文件和状态表重新创建，验证记录从头开始
+    store = test_batch_sync.open_book_store(status_table)
+    queue = build_queue(store)
+    print(f"📋 待检查的链接: {len(queue)} 个")
+
+    request_budget = RequestBudget(budget)
+    counts = {'live': 0, 'dead': 0, 'unknown': 0, 'relinked': 0, 'removed': 0}
+    affected: Set[str] = set()
+    rate_limiter = HostRateLimiter()
+    html_archive = HtmlArchive(test_batch_sync.HTML_ARCHIVE_DIR) if html_archive_enabled() else None
+
+    async def check_link(ctx: test_batch_sync.CrawlContext, key: int, book_id: Optional[int], url: str):
+        state = classify_status(await probe_url(ctx.session, rate_limiter, url))
+        if state == LIVE_YES:
+            store.record_link_check(url, True)
+            counts['live'] += 1
+            return
+        if state != LIVE_NO:
+            counts['unknown'] += 1
+            return
+
+        # 链接失效：下载页可能已经换了新链接
+        if book_id is not None and request_budget.take(2):
+            status, result, requests_sent = await refetch_book(ctx, book_id)
+            request_budget.refund(2 - requests_sent)
+            if status in (STATUS_OK, STATUS_MISSING, STATUS_NO_DOWNLOAD):
+                status_table.set(book_id, status)
+            if status == STATUS_OK:
+                book_data, tags = test_batch_sync.store_item(result)
+                new_url = book_data['download_url'].replace('?pwd=', '?p=')
+                if new_url and new_url != url:
+                    _, book_affected = store.upsert_books([(book_data, tags)])
+                    affected.update(book_affected)
+                    counts['relinked'] += 1
+                    print(f"  🔁 {book_id}: 下载页已换新链接")
+                    return
+
+        failures = store.record_link_check(url, False)
+        counts['dead'] += 1
+        if failures >= remove_after:
+            affected.update(store.remove_book(key))
+            counts['removed'] += 1
+            print(f"  🗑️  {book_id or url}: 连续 {failures} 次失效，已从md文件中移除")
+
+    async def worker(ctx: test_batch_sync.CrawlContext):
+        while queue and request_budget.take(1):
+            _, key, book_id, url = heapq.heappop(queue)
+            await check_link(ctx, key, book_id, url)
+
+    try:
+        async with test_batch_sync.create_session() as session:
+            ctx = test_batch_sync.CrawlContext(session, rate_limiter, html_archive=html_archive)
+            await asyncio.gather(*(worker(ctx) for _ in range(max(1, REVALIDATE_CONCURRENCY))))
+    finally:
+        if html_archive:
+            html_archive.close()
+        status_table.checkpoint()
+        store.save_statuses(status_table.data)
+
+    if affected:
+        print(f"\n📝 重新生成 {len(affected)} 个标签文件...")
+        test_batch_sync.render_store_tags(store, sorted(affected))
+        tag_counts = store.tag_counts()
+        stats = test_batch_sync.load_stats()
+        stats['tags'] = tag_counts
+        stats['total_tags'] = len(tag_counts)
+        test_batch_sync.save_stats(stats)
+        test_batch_sync.generate_hot_categories_index(tag_counts, test_batch_sync.OUTPUT_DIR)
+
+    dead_links = store.dead_links()
+    with open(DEAD_LINKS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(dead_links, f, ensure_ascii=False, indent=2)
+    store.close()
+
+    elapsed_time = time.time() - start_time
+    print(f"\n📊 重新验证完成（{elapsed_time:.1f} 秒，发出 {request_budget.spent}/{budget} 个请求）")
+    print(f"  - 有效 {counts['live']}，失效 {counts['dead']}，结果未知 {counts['unknown']}")
+    print(f"  - 换新链接 {counts['relinked']}，移除 {counts['removed']}，尚未移除的失效链接 {len(dead_links)}"
+          f"（{DEAD_LINKS_FILE.name}）")
+    print(f"  - 剩余待检查: {len(queue)} 个")
+    return True
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='按优先级重新验证下载链接，移除失效的行')
+    parser.add_argument('--budget', type=int, default=REVALIDATE_BUDGET,
+                        help=f'最多发出的请求数（默认：{REVALIDATE_BUDGET}）')
+    parser.add_argument('--remove-after', type=int, default=REVALIDATE_REMOVE_AFTER,
+                        help=f'连续失效多少次后从md文件中移除（默认：{REVALIDATE_REMOVE_AFTER}）')
+    args = parser.parse_args()
+
+    success = asyncio.run(revalidate_links(args.budget, args.remove_after))
+    sys.exit(0 if success else 1)
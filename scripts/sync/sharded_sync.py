@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程分片抓取：把ID范围拆成多个分片，每个分片在独立进程中运行 test_batch_sync
+
+- 每个分片进程有自己的 aiohttp 会话、限速器、解析进程池、状态表、死信列表和结果日志
+  （都在 md/.shards/<分片名>/ 下），互不干扰
+- 速率预算按进程数均分，对同一主机的总请求速率与单进程时一致
+- 全部分片完成后按书籍ID顺序合并结果日志生成md文件（与分片完成的先后无关），
+  并把各分片的状态表和死信列表合并回 md/crawl_status.bin 和 md/dead_letter.jsonl
+- 中途中断时分片目录会保留，用相同的参数重新运行即可从断点继续
+- 指定时间预算时截止时间传给每个分片进程，各分片自行停止调度；合并后以各分片停止位置中
+  最小的ID作为续传位置（见 time_budget）
+
+分片方式：
+    interleaved   交错分片，ID % N == i（默认，各分片的新旧书籍分布均匀）
+    contiguous    连续分片，把范围平均切成 N 段
+
+注意：导入本模块前需要先设置 OUTPUT_DIR 环境变量（test_batch_sync 在导入时读取）
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+import test_batch_sync
+from crawl_metrics import METRICS_JSON_NAME, CrawlMetrics, metrics_enabled
+from rate_limiter import split_rate_env
+from result_journal import merge_journal_runs, sort_journal_runs
+from retry_scheduler import DeadLetterList
+from status_table import STATUS_UNSEEN, StatusTable, format_status_counts
+from time_budget import TimeBudget
+
+SHARD_MODES = ('interleaved', 'contiguous')
+
+
+class Shard:
+    """一个分片：连续分片只有 [start_id, end_id]，交错分片还有序号和总数"""
+
+    def __init__(self, start_id: int, end_id: int, index: Optional[int] = None,
+                 count: Optional[int] = None):
+        self.start_id = start_id
+        self.end_id = end_id
+        self.index = index
+        self.count = count
+
+    @property
+    def name(self) -> str:
+        if self.count:
+            return f"{self.start_id}-{self.end_id}-{self.index}of{self.count}"
+        return f"{self.start_id}-{self.end_id}"
+
+    @property
+    def directory(self) -> Path:
+        return test_batch_sync.SHARDS_DIR / self.name
+
+    def book_ids(self) -> range:
+        """分片负责的书籍ID"""
+        if self.count:
+            first = self.start_id + (self.index - self.start_id) % self.count
+            return range(first, self.end_id + 1, self.count)
+        return range(self.start_id, self.end_id + 1)
+
+    def command(self, retry_failed: bool = False, recrawl_missing: bool = False,
+                deadline: Optional[float] = None) -> List[str]:
+        """运行该分片的命令行"""
+        command = [
+            sys.executable, str(Path(__file__).parent / "test_batch_sync.py"),
+            '--start-id', str(self.start_id), '--end-id', str(self.end_id),
+            '--shard-dir', str(self.directory),
+        ]
+        if self.count:
+            command += ['--shard', f"{self.index}/{self.count}"]
+        if retry_failed:
+            command.append('--retry-failed')
+        if recrawl_missing:
+            command.append('--recrawl-missing')
+        if deadline:
+            command += ['--deadline', str(deadline)]
+        return command
+
+
+def plan_shards(start_id: int, end_id: int, workers: int, mode: str = 'interleaved') -> List[Shard]:
+    """
+    把ID范围拆成分片
+
+    Args:
+        start_id: 起始书籍ID
+        end_id: 结束书籍ID
+        workers: 分片数（进程数）
+        mode: 分片方式（interleaved / contiguous）
+
+    Returns:
+        分片列表
+    """
+    total = end_id - start_id + 1
+    workers = max(1, min(workers, total))
+    if mode == 'interleaved':
+        return [Shard(start_id, end_id, index, workers) for index in range(workers)]
+
+    shards = []
+    size, remainder = divmod(total, workers)
+    current = start_id
+    for index in range(workers):
+        shard_end = current + size - 1 + (1 if index < remainder else 0)
+        shards.append(Shard(current, shard_end))
+        current = shard_end + 1
+    return shards
+
+
+def shard_env(workers: int) -> Dict[str, str]:
+    """
+    分片子进程的环境变量：均分速率预算，并按CPU核数分配解析进程
+
+    Args:
+        workers: 分片数（进程数）
+
+    Returns:
+        环境变量字典
+    """
+    env = dict(os.environ)
+    env['OUTPUT_DIR'] = os.getenv("OUTPUT_DIR", "md_test")
+    env['PYTHONUNBUFFERED'] = '1'
+    env.update(split_rate_env(workers))
+    if 'PARSE_WORKERS' not in os.environ:
+        # 每个分片分到的核数不足2个时直接在事件循环内解析，避免进程数过多
+        per_shard = (os.cpu_count() or 1) // workers
+        env['PARSE_WORKERS'] = str(per_shard if per_shard >= 2 else 0)
+    return env
+
+
+def _relay_output(prefix: str, stream):
+    """给子进程的每行输出加上分片前缀"""
+    for line in stream:
+        print(f"[{prefix}] {line}", end='', flush=True)
+
+
+def run_shards(shards: List[Shard], retry_failed: bool = False, recrawl_missing: bool = False,
+               deadline: Optional[float] = None) -> bool:
+    """
+    同时启动所有分片进程并等待结束
+
+    Args:
+        shards: 分片列表
+        retry_failed: 只重新抓取之前失败的ID
+        recrawl_missing: 同时重新抓取之前不存在的ID
+        deadline: 截止时间（Unix 时间戳），None 表示不限时
+
+    Returns:
+        是否全部分片都成功结束
+    """
+    env = shard_env(len(shards))
+    processes = []
+    relays = []
+    try:
+        for shard in shards:
+            process = subprocess.Popen(
+                shard.command(retry_failed, recrawl_missing, deadline),
+                env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                text=True, encoding='utf-8', bufsize=1,
+            )
+            relay = threading.Thread(target=_relay_output, args=(shard.name, process.stdout), daemon=True)
+            relay.start()
+            processes.append((shard, process))
+            relays.append(relay)
+
+        ok = True
+        for shard, process in processes:
+            if process.wait() != 0:
+                print(f"❌ 分片 {shard.name} 异常退出（返回码 {process.returncode}）")
+                ok = False
+        for relay in relays:
+            relay.join()
+        return ok
+    except KeyboardInterrupt:
+        for _, process in processes:
+            process.terminate()
+        for _, process in processes:
+            process.wait()
+        raise
+
+
+def merge_status(shards: List[Shard]) -> StatusTable:
+    """
+    把各分片的状态表和死信列表合并回主文件（每个分片只合并自己负责的ID）
+
+    Args:
+        shards: 分片列表
+
+    Returns:
+        合并后的主状态表
+    """
+    status_table = test_batch_sync.load_status_table()
+    dead_letter = DeadLetterList(test_batch_sync.DEAD_LETTER_FILE)
+    for shard in shards:
+        shard_status_file = shard.directory / test_batch_sync.STATUS_FILE.name
+        if not shard_status_file.exists():
+            continue
+        shard_table = StatusTable(shard_status_file)
+        shard_dead_letter = DeadLetterList(shard.directory / test_batch_sync.DEAD_LETTER_FILE.name)
+        for book_id in shard.book_ids():
+            status = shard_table.get(book_id)
+            if status == STATUS_UNSEEN:
+                continue
+            status_table.set(book_id, status)
+            if book_id in shard_dead_letter.entries:
+                dead_letter.entries[book_id] = shard_dead_letter.entries[book_id]
+                dead_letter.dirty = True
+            else:
+                dead_letter.discard(book_id)
+    status_table.checkpoint()
+    dead_letter.save()
+    test_batch_sync.save_status_to_store(status_table)
+    return status_table
+
+
+def merged_records(shards: List[Shard]) -> Iterator[Dict]:
+    """
+    按书籍ID顺序流式合并所有分片的结果日志
+
+    每个分片的日志先分段外部排序（一次只在内存中保留一个分段），再把所有分段一起归并。
+    """
+    runs = []
+    for shard in shards:
+        runs += sort_journal_runs(shard.directory / test_batch_sync.SHARD_JOURNAL_NAME,
+                                  shard.directory / "sorted")
+    return merge_journal_runs(runs)
+
+
+def load_shard_stats(shard: Shard) -> Dict:
+    """读取分片进程写入的统计信息"""
+    stats_file = shard.directory / test_batch_sync.SHARD_STATS_NAME
+    if not stats_file.exists():
+        return {}
+    with open(stats_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def run_sharded_sync(start_id: int, end_id: int, workers: int, mode: str = 'interleaved',
+                     retry_failed: bool = False, recrawl_missing: bool = False,
+                     prescan: bool = False, time_budget: Optional[TimeBudget] = None) -> bool:
+    """
+    多进程分片抓取并合并结果
+
+    Args:
+        start_id: 起始书籍ID
+        end_id: 结束书籍ID
+        workers: 分片数（进程数）
+        mode: 分片方式（interleaved / contiguous）
+        retry_failed: 只重新抓取之前失败的ID
+        recrawl_missing: 同时重新抓取之前不存在的ID
+        prescan: 启动分片前先在主进程中做存活预扫描
+        time_budget: 时间预算，None 表示不限时
+
+    Returns:
+        是否成功（任一分片失败时不合并，分片目录保留用于续传）
+    """
+    shards = plan_shards(start_id, end_id, workers, mode)
+    print("=" * 80)
+    print(f"🧱 多进程分片抓取（ID: {start_id}-{end_id}，{len(shards)} 个分片，{mode}）")
+    print("=" * 80)
+
+    # 先在主进程中完成旧版 processed_ids.json 的迁移，分片进程再复制主状态表
+    test_batch_sync.OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    status_table = test_batch_sync.load_status_table()
+
+    if prescan:
+        # 预扫描结果写入主状态表：不存在的ID记为不存在，重新出现的ID恢复为未抓取，
+        # 因此分片进程不需要再加 --recrawl-missing
+        dead_letter = DeadLetterList(test_batch_sync.DEAD_LETTER_FILE)
+        book_ids = test_batch_sync.select_book_ids(status_table, dead_letter, start_id, end_id,
+                                                   retry_failed, recrawl_missing)
+        if book_ids:
+            asyncio.run(test_batch_sync.prescan_book_ids(book_ids, status_table, dead_letter))
+        status_table.checkpoint()
+        dead_letter.save()
+        test_batch_sync.save_status_to_store(status_table)
+        recrawl_missing = False
+
+    start_time = time.time()
+    deadline = time_budget.deadline if time_budget is not None else None
+    if not run_shards(shards, retry_failed, recrawl_missing, deadline):
+        print("❌ 有分片失败，未合并结果；分片目录已保留，重新运行即可从断点继续")
+        return False
+    elapsed_time = time.time() - start_time
+
+    print(f"\n🔀 合并 {len(shards)} 个分片的结果...")
+    status_table = merge_status(shards)
+    status_counts = status_table.counts(start_id, end_id)
+    shard_stats = {shard.name: load_shard_stats(shard) for shard in shards}
+    print(f"  - 总耗时: {elapsed_time:.2f} 秒")
+    print(f"  - 抓取状态: {format_status_counts(status_counts)}")
+    resume_ids = [stats['resume_from_id'] for stats in shard_stats.values() if stats.get('resume_from_id')]
+    if time_budget is not None and resume_ids:
+        time_budget.stop(min(resume_ids))
+        print(f"  - ⏰ 时间预算: 分片停止调度，下次运行从ID {time_budget.resume_from_id} 继续")
+
+    render_started = time.perf_counter()
+    test_batch_sync.generate_outputs(merged_records(shards), {
+        'elapsed_time': elapsed_time,
+        'workers': len(shards),
+        'shard_mode': mode,
+        'crawl_status': status_counts,
+        'dead_letter': len(DeadLetterList(test_batch_sync.DEAD_LETTER_FILE).entries),
+        'shards': shard_stats,
+    })
+    if time_budget is not None:
+        time_budget.record_render(time.perf_counter() - render_started,
+                                  sum(stats.get('found', 0) for stats in shard_stats.values()))
+
+    # 各分片的指标合并后写入输出目录
+    if metrics_enabled():
+        metrics = CrawlMetrics(test_batch_sync.OUTPUT_DIR)
+        for shard in shards:
+            shard_metrics_file = shard.directory / METRICS_JSON_NAME
+            if shard_metrics_file.exists():
+                with open(shard_metrics_file, 'r', encoding='utf-8') as f:
+                    metrics.merge_snapshot(json.load(f))
+        metrics.write()
+        print(f"  - 各阶段耗时: {metrics.summary()}")
+
+    # 结果已合并，分片目录不再需要
+    for shard in shards:
+        shutil.rmtree(shard.directory, ignore_errors=True)
+
+    # 时间预算用完时只有停止位置之前的ID算作已处理
+    processed_end = time_budget.resume_from_id - 1 if time_budget is not None and time_budget.stopped else end_id
+    max_id = max(processed_end, test_batch_sync.load_max_book_id())
+    test_batch_sync.save_max_book_id(max_id)
+    print(f"\n📊 最大书籍ID: {max_id}（已保存，用于增量更新）")
+    if time_budget is not None:
+        time_budget.save()
+    return True
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地替身站点：模拟读书站的详情页、下载页，以及会过期的诚通网盘下载链接
+
+用于在本地验证抓取和链接重新验证，不访问真实站点：
+
+    python standin_site.py --port 8765 --expire-rate 0.2 --relink-rate 0.5
+    BOOK_SITE_DOMAIN=http://localhost:8765 OUTPUT_DIR=md_test python test_batch_sync.py --end-id 500
+    BOOK_SITE_DOMAIN=http://localhost:8765 OUTPUT_DIR=md_test python revalidate_links.py --budget 200
+
+- /book-content-{id}.html   详情页（按ID确定性地选出 --missing-rate 比例的ID，以及大于 --max-id 的ID返回 404）
+- /download-book-{id}.html  下载页，链接指向 --link-host 下的 /ctfile.com/f/{id}-v{版本}
+- /ctfile.com/f/{id}-v{版本} 网盘链接：过期的链接返回 404（路径中带 ctfile.com，下载页解析器据此识别网盘链接）
+
+链接过期：服务启动 --expire-after 秒后，按ID确定性地选出 --expire-rate 比例的书籍，
+它们的第1版链接失效；其中 --relink-rate 比例的书籍在下载页换成有效的第2版链接，
+其余书籍的下载页仍然给出失效的旧链接。
+网盘链接默认使用 127.0.0.1 作为主机，与站点域名（localhost）不同，不会被当作下载页面链接过滤。
+
+基准测试（bench_crawl.py）用到的参数：
+    --latency / --latency-jitter   每个响应的延迟（毫秒），在 latency ± jitter 之间均匀分布
+    --error-rate                   随机返回 503 的比例（抓取会重试）
+    --page-size                    详情页的目标大小（字节），用侧边栏中的推荐列表填充
+"""
+
+import argparse
+import asyncio
+import hashlib
+import random
+import re
+import time
+
+from aiohttp import web
+
+TAGS = ['中国', '历史', '小说', '哲学', '文学', '传记']
+
+DETAIL_PATTERN = re.compile(r'^/book-content-(\d+)\.html$')
+DOWNLOAD_PATTERN = re.compile(r'^/download-book-(\d+)\.html$')
+LINK_PATTERN = re.compile(r'^/ctfile\.com/f/(\d+)-v(\d+)$')
+
+
+def book_fraction(book_id: int, salt: str) -> float:
+    """书籍ID对应的 [0, 1) 之间的确定性伪随机数"""
+    digest = hashlib.sha1(f"{salt}:{book_id}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:4], 'big') / 2 ** 32
+
+
+class StandinSite:
+    """替身站点的配置和页面生成"""
+
+    def __init__(self, max_id: int, link_host: str, expire_rate: float, relink_rate: float,
+                 expire_after: float, missing_rate: float = 1 / 7, latency: float = 0.0,
+                 latency_jitter: float = 0.0, error_rate: float = 0.0, page_size: int = 0):
+        self.max_id = max_id
+        self.link_host = link_host.rstrip('/')
+        self.expire_rate = expire_rate
+        self.relink_rate = relink_rate
+        self.expire_at = time.monotonic() + expire_after
+        self.missing_rate = missing_rate
+        self.latency = latency  # 秒
+        self.latency_jitter = latency_jitter  # 秒
+        self.error_rate = error_rate
+        self.page_size = page_size
+
+    def exists(self, book_id: int) -> bool:
+        return 0 < book_id <= self.max_id and book_fraction(book_id, 'missing') >= self.missing_rate
+
+    def expired(self, book_id: int) -> bool:
+        """第1版链接是否已过期"""
+        return time.monotonic() >= self.expire_at and book_fraction(book_id, 'expire') < self.expire_rate
+
+    def link_version(self, book_id: int) -> int:
+        """下载页当前给出的链接版本"""
+        if self.expired(book_id) and book_fraction(book_id, 'relink') < self.relink_rate:
+            return 2
+        return 1
+
+    def sidebar(self, book_id: int, size: int) -> str:
+        """大约 size 字节的推荐列表（解析器不需要的区域，用来模拟真实页面的大小）"""
+        items = []
+        total = 0
+        index = 0
+        while total < size:
+            other = (book_id * 31 + index) % max(self.max_id, 1) + 1
+            item = f'<li><a href="/book-content-{other}.html">推荐书名{other}</a><span>作者{other}</span></li>\n'
+            items.append(item)
+            total += len(item.encode('utf-8'))
+            index += 1
+        return f'<div class="sidebar"><ul>\n{"".join(items)}</ul></div>\n'
+
+    def detail_page(self, book_id: int) -> str:
+        tags = ''.join(f'<a href="/book-tag-{tag}.html">{tag}</a> '
+                       for tag in (TAGS[book_id % 6], TAGS[(book_id + 1) % 6], TAGS[(book_id + 3) % 6]))
+        page = self.render_detail(book_id, tags, '')
+        padding = self.page_size - len(page.encode('utf-8'))
+        if padding > 0:
+            page = self.render_detail(book_id, tags, self.sidebar(book_id, padding))
+        return page
+
+    def render_detail(self, book_id: int, tags: str, sidebar: str) -> str:
+        return f'''<html><head><meta charset="utf-8"><title>书名{book_id}</title></head><body>
+<div class="nav"><a href="/book-category-1.html">文学</a></div>
+{sidebar}<h4 class="post-title">书名{book_id}</h4>
+<div class="post-info"><ul>
+<li><strong>作者：</strong><a href="/book-author-1.html">作者{book_id}</a></li>
+<li><strong>ISBN：</strong>978{book_id:010d}</li><li><strong>评分：</strong>8.{book_id % 10}</li>
+<li><strong>时间：</strong>2020-01-01</li><li><strong>格式：</strong>epub, mobi, azw3</li></ul></div>
+<div class="post-content"><img src="/cover/{book_id}.jpg"><h3>内容简介</h3><p>简介{book_id}</p>
+<h3>作者简介</h3><p>作者{book_id}简介</p></div>
+<div class="post-tags">标签：{tags}</div>
+<div class="post-download"><a href="/download-book-{book_id}.html">下载</a></div></body></html>'''
+
+    def download_page(self, book_id: int) -> str:
+        link = f"{self.link_host}/ctfile.com/f/{book_id}-v{self.link_version(book_id)}?pwd=1234"
+        return f'''<html><head><meta charset="utf-8"></head><body><div class="box">
+<div class="source-title">诚通网盘下载</div>
+<div class="button"><a href="{link}">立即下载</a></div></div></body></html>'''
+
+    def link_alive(self, book_id: int, version: int) -> bool:
+        if not self.exists(book_id) or version > 2:
+            return False
+        return version == 2 or not self.expired(book_id)
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        if self.latency or self.latency_jitter:
+            await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.latency_jitter, self.latency_jitter)))
+        if self.error_rate and random.random() < self.error_rate:
+            raise web.HTTPServiceUnavailable()
+        path = request.path
+        match = DETAIL_PATTERN.match(path)
+        if match and self.exists(int(match.group(1))):
+            return web.Response(text=self.detail_page(int(match.group(1))), content_type='text/html')
+        match = DOWNLOAD_PATTERN.match(path)
+        if match and self.exists(int(match.group(1))):
+            return web.Response(text=self.download_page(int(match.group(1))), content_type='text/html')
+        match = LINK_PATTERN.match(path)
+        if match and self.link_alive(int(match.group(1)), int(match.group(2))):
+            return web.Response(text=f"file {match.group(1)}", content_type='text/plain')
+        raise web.HTTPNotFound()
+
+
+def create_app(site: StandinSite) -> web.Application:
+    app = web.Application()
+    app.router.add_route('*', '/{path:.*}', site.handle)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='本地替身站点（模拟详情页、下载页和会过期的下载链接）')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口（默认：8765）')
+    parser.add_argument('--max-id', type=int, default=100000, help='最大书籍ID（默认：100000）')
+    parser.add_argument('--link-host', help='网盘链接的主机（默认：http://127.0.0.1:<端口>）')
+    parser.add_argument('--expire-rate', type=float, default=0.0, help='过期链接的比例（默认：0）')
+    parser.add_argument('--relink-rate', type=float, default=0.0,
+                        help='过期后下载页换成新链接的比例（默认：0）')
+    parser.add_argument('--expire-after', type=float, default=0.0, help='启动多少秒后链接开始过期（默认：0）')
+    parser.add_argument('--missing-rate', type=float, default=1 / 7, help='不存在的ID的比例（默认：1/7）')
+    parser.add_argument('--latency', type=float, default=0.0, help='响应延迟（毫秒，默认：0）')
+    parser.add_argument('--latency-jitter', type=float, default=0.0, help='响应延迟的随机波动（毫秒，默认：0）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='随机返回 503 的比例（默认：0）')
+    parser.add_argument('--page-size', type=int, default=0, help='详情页的目标大小（字节，默认：不填充）')
+    args = parser.parse_args()
+
+    site = StandinSite(args.max_id, args.link_host or f"http://127.0.0.1:{args.port}",
+                       args.expire_rate, args.relink_rate, args.expire_after,
+                       missing_rate=args.missing_rate, latency=args.latency / 1000,
+                       latency_jitter=args.latency_jitter / 1000, error_rate=args.error_rate,
+                       page_size=args.page_size)
+    print(f"🧪 替身站点: http://localhost:{args.port}（过期比例 {args.expire_rate}，"
+          f"换新链接比例 {args.relink_rate}，{args.expire_after:g} 秒后开始过期）")
+    web.run_app(create_app(site), port=args.port, print=None)
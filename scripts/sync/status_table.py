@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+书籍抓取状态表：每个书籍ID占一个字节，记录该ID的抓取结果
+
+文件格式就是状态数组本身（第 N 个字节是书籍ID N 的状态），可以直接 mmap 读取；
+抓取过程中在内存中更新，定期以临时文件 + 原子替换的方式落盘。
+
+状态取值：
+    0 未抓取   1 成功   2 不存在（404 / 无书名）   3 没有下载链接
+    4 出错（超时 / 连接错误 / 解析异常）   5 服务器要求稍后重试（429 / 5xx）
+"""
+
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+STATUS_UNSEEN = 0
+STATUS_OK = 1
+STATUS_MISSING = 2
+STATUS_NO_DOWNLOAD = 3
+STATUS_ERROR = 4
+STATUS_RETRY_AFTER = 5
+
+STATUS_NAMES = {
+    STATUS_UNSEEN: 'unseen',
+    STATUS_OK: 'ok',
+    STATUS_MISSING: 'missing',
+    STATUS_NO_DOWNLOAD: 'no_download',
+    STATUS_ERROR: 'error',
+    STATUS_RETRY_AFTER: 'retry_after',
+}
+STATUS_CODES = {name: status for status, name in STATUS_NAMES.items()}
+
+# 已有确定结果、默认续传时跳过的状态
+DONE_STATUSES = frozenset({STATUS_OK, STATUS_MISSING, STATUS_NO_DOWNLOAD})
+# 出错后需要重新抓取的状态
+FAILED_STATUSES = frozenset({STATUS_ERROR, STATUS_RETRY_AFTER})
+
+# 输出统计信息时使用的中文名称
+STATUS_LABELS = {
+    'ok': '成功',
+    'missing': '不存在',
+    'no_download': '无下载链接',
+    'error': '出错',
+    'retry_after': '稍后重试',
+}
+
+CHECKPOINT_INTERVAL = 30.0  # 抓取过程中落盘间隔（秒）
+
+
+class StatusTable:
+    """按书籍ID索引的单字节状态数组"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.data = bytearray(self.path.read_bytes()) if self.path.exists() else bytearray()
+        self.dirty = False
+        self._last_checkpoint = time.monotonic()
+
+    def get(self, book_id: int) -> int:
+        """获取书籍ID的状态（超出数组范围视为未抓取）"""
+        return self.data[book_id] if book_id < len(self.data) else STATUS_UNSEEN
+
+    def set(self, book_id: int, status: int):
+        """设置书籍ID的状态，数组不够长时自动扩展"""
+        if book_id >= len(self.data):
+            self.data.extend(bytes(book_id + 1 - len(self.data)))
+        if self.data[book_id] != status:
+            self.data[book_id] = status
+            self.dirty = True
+
+    def select(self, start_id: int, end_id: int, statuses: Iterable[int]) -> List[int]:
+        """
+        返回范围内状态属于 statuses 的书籍ID（升序）
+
+        Args:
+            start_id: 起始书籍ID
+            end_id: 结束书籍ID（包含）
+            statuses: 要选出的状态集合
+
+        Returns:
+            书籍ID列表
+        """
+        statuses = frozenset(statuses)
+        segment = bytes(self.data[start_id:end_id + 1])
+        # 超出数组范围的ID都是未抓取
+        segment += bytes(end_id - start_id + 1 - len(segment))
+        return [start_id + offset for offset, status in enumerate(segment) if status in statuses]
+
+    def counts(self, start_id: int = 1, end_id: Optional[int] = None) -> Dict[str, int]:
+        """统计范围内各状态的书籍数量（不含未抓取）"""
+        segment = self.data[start_id:] if end_id is None else self.data[start_id:end_id + 1]
+        return {
+            name: segment.count(bytes([status]))
+            for status, name in STATUS_NAMES.items()
+            if status != STATUS_UNSEEN
+        }
+
+    def checkpoint_due(self) -> bool:
+        """距上次落盘超过 CHECKPOINT_INTERVAL 且有未保存的修改"""
+        return self.dirty and time.monotonic() - self._last_checkpoint >= CHECKPOINT_INTERVAL
+
+    def checkpoint(self):
+        """原子写入状态文件（写临时文件、fsync 后替换）"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(self.data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+        self._last_checkpoint = time.monotonic()
+
+
+def format_status_counts(counts: Dict[str, int]) -> str:
+    """把 StatusTable.counts() 的结果格式化为一行中文摘要"""
+    return "，".join(f"{STATUS_LABELS[name]} {count}" for name, count in counts.items())
@@ -2,20 +2,54 @@
 # -*- coding: utf-8 -*-
 """
 全量同步脚本：备份现有md目录，查找最大书籍ID，然后生成所有书籍的md文件
+
+指定 --time-budget / --deadline 时，剩余时间不够时停止调度新ID并照常生成md文件、更新README，
+续传位置保存在 md/time_budget.json 中，下次运行（不指定 --start-id 时）从这里继续。
 """
 
 import sys
 import argparse
+import json
 import os
 from pathlib import Path
-import subprocess
 
 # 添加当前目录到路径
 sys.path.insert(0, str(Path(__file__).parent))
 
 # 注意：不在这里导入test_batch_sync，因为需要先设置环境变量
 from backup_md import backup_md_directory
-from find_max_book_id import find_max_book_id_from_homepage, find_max_book_id_by_binary_search
+from find_max_book_id import find_max_book_id_from_homepage, find_max_book_id_by_galloping
+from parse_book_detail_enhanced import HTML_PARSER_BACKENDS
+from profiling import add_profile_arguments, run_profiled
+from update_readme_hot_categories import update_readme_and_json
+from time_budget import (
+    DEFAULT_IDS_PER_SECOND,
+    TimeBudget,
+    add_time_budget_arguments,
+    deadline_from_args,
+    load_state,
+    save_state,
+)
+
+
+def load_synced_max_book_id() -> int:
+    """读取上次同步保存的最大书籍ID（md/max_book_id.json），不存在时返回0"""
+    max_id_file = Path(__file__).parent.parent.parent / "md" / "max_book_id.json"
+    if not max_id_file.exists():
+        return 0
+    try:
+        with open(max_id_file, 'r', encoding='utf-8') as f:
+            return int(json.load(f).get('max_book_id', 0))
+    except (ValueError, OSError):
+        return 0
+
+
+def finish_sync():
+    """步骤4：更新README.md的热门分类章节并生成all_books.json"""
+    update_readme_and_json("步骤4: ")
+    print("\n" + "=" * 80)
+    print("✅ 全量同步及后续更新完成！")
+    print("=" * 80)
 
 
 def main():
@@ -24,10 +58,62 @@ def main():
     parser.add_argument('--max-id', type=int, help='手动指定最大书籍ID（跳过查找步骤）')
     parser.add_argument('--skip-backup', action='store_true', help='跳过备份步骤')
     parser.add_argument('--skip-find-id', action='store_true', help='跳过查找最大ID步骤（需要提供--max-id）')
-    parser.add_argument('--start-id', type=int, default=1, help='起始书籍ID（默认：1）')
+    parser.add_argument('--start-id', type=int,
+                        help='起始书籍ID（默认：上次因时间预算停止的位置，没有时为1）')
     parser.add_argument('--batch-size', type=int, help='分批处理大小（例如：20000，每次处理2万本书）。如果不指定，则一次性处理所有书籍')
+    parser.add_argument('--parser', choices=sorted(HTML_PARSER_BACKENDS),
+                        help='HTML解析器（默认读取环境变量 HTML_PARSER，未设置时为 html.parser）')
+    parser.add_argument('--retry-failed', '--retry-errors', dest='retry_failed', action='store_true',
+                        help='只重新抓取之前失败的ID（读取 md/dead_letter.jsonl 和 md/crawl_status.bin）')
+    parser.add_argument('--recrawl-missing', action='store_true', help='重新抓取上次不存在的ID')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='分片进程数（默认：1，单进程）。大于1时每批拆成多个分片并行抓取，完成后合并')
+    parser.add_argument('--shard-mode', choices=['interleaved', 'contiguous'], default='interleaved',
+                        help='分片方式：interleaved 按 ID%%N 交错（默认），contiguous 按连续区间')
+    parser.add_argument('--prescan', action='store_true',
+                        help='抓取前先用 HEAD 请求预扫描ID是否存在，只完整抓取存在的ID（ID稀疏时大幅减少请求量）')
+    parser.add_argument('--coordinator', help='多机协同：协调器 SQLite 文件路径或 HTTP 地址（见 coordinator.py）')
+    parser.add_argument('--worker', action='store_true', help='多机协同：作为抓取进程领取并抓取工作单元（需要 --coordinator）')
+    parser.add_argument('--reduce', action='store_true', help='多机协同：合并所有工作单元的结果并更新README（需要 --coordinator）')
+    add_time_budget_arguments(parser)
+    add_profile_arguments(parser, sample_help='只同步从 --start-id 开始的前 N 个ID（跳过查找最大ID，不同运行的剖析结果可以直接比较）')
     
     args = parser.parse_args()
+    # 截止时间从启动时算起（不包括后面备份和查找最大ID的时间）
+    args.deadline = deadline_from_args(args)
+    run_profiled('sync_all_books', lambda: run_sync(args), args)
+
+
+def run_sync(args):
+    """按命令行参数执行全量同步"""
+    if (args.worker or args.reduce) and not args.coordinator:
+        print("❌ 错误: --worker / --reduce 需要同时指定 --coordinator")
+        return
+    
+    # 解析器通过环境变量传给 test_batch_sync 及其解析进程
+    if args.parser:
+        os.environ['HTML_PARSER'] = args.parser
+    
+    # cProfile 只剖析当前进程：剖析时不启动分片进程和解析进程
+    if args.profile:
+        os.environ['PARSE_WORKERS'] = '0'
+        if args.workers > 1:
+            print("⚠️  剖析模式只使用单进程（忽略 --workers）")
+            args.workers = 1
+    if args.profile_sample:
+        args.max_id = (args.start_id or 1) + args.profile_sample - 1
+        args.skip_find_id = True
+    
+    # 多机协同模式：不备份、不查找最大ID（工作单元已由 coordinator.py init 创建）
+    if args.worker or args.reduce:
+        os.environ['OUTPUT_DIR'] = 'md'
+        from coordinator import open_coordinator, reduce_results, run_worker
+        coordinator = open_coordinator(args.coordinator)
+        if args.worker:
+            run_worker(coordinator)
+        elif reduce_results(coordinator):
+            finish_sync()
+        return
     
     print("=" * 80)
     print("🚀 全量同步书籍数据")
@@ -55,13 +141,11 @@ def main():
         else:
             print("🔍 步骤2: 查找最大书籍ID")
             print("-" * 80)
-            # 先尝试从首页快速查找
-            max_book_id = find_max_book_id_from_homepage()
-            
-            # 如果首页没找到，使用二分查找（较慢但准确）
-            if not max_book_id:
-                print("\n使用二分查找法（较慢但更准确）...")
-                max_book_id = find_max_book_id_by_binary_search(start=1, end=100000)
+            # 先从首页快速获取一个已存在的ID，再从它和上次同步的最大ID中较大的一个开始并发跳跃查找
+            homepage_max_id = find_max_book_id_from_homepage() or 0
+            known_max_id = max(homepage_max_id, load_synced_max_book_id())
+            print()
+            max_book_id = find_max_book_id_by_galloping(known_max=known_max_id)
             
             if max_book_id:
                 print(f"\n✅ 找到最大书籍ID: {max_book_id}\n")
@@ -76,6 +160,25 @@ def main():
             print("❌ 错误: 跳过查找ID步骤时必须提供 --max-id")
             return
     
+    # 设置环境变量，确保使用正式目录md/
+    # 必须在导入test_batch_sync之前设置
+    os.environ['OUTPUT_DIR'] = 'md'
+    
+    # 现在导入test_batch_sync（会读取环境变量）
+    import test_batch_sync
+    import asyncio
+    from sharded_sync import run_sharded_sync
+    
+    # 未指定起始ID时从上次因时间预算停止的位置继续（之前的ID都已调度过）
+    time_budget = TimeBudget(args.deadline, test_batch_sync.TIME_BUDGET_FILE) if args.deadline else None
+    budget_state = load_state(test_batch_sync.TIME_BUDGET_FILE)
+    resume_from_id = budget_state.get('resume_from_id')
+    if args.start_id is None:
+        args.start_id = 1
+        if resume_from_id and resume_from_id <= max_book_id:
+            args.start_id = resume_from_id
+            print(f"⏰ 上次运行因时间预算在ID {resume_from_id} 停止，从这里继续")
+    
     # 步骤3：生成所有书籍的md文件
     print("📚 步骤3: 生成所有书籍的md文件")
     print("-" * 80)
@@ -87,22 +190,37 @@ def main():
         total_books = max_book_id - args.start_id + 1
         num_batches = (total_books + args.batch_size - 1) // args.batch_size
         print(f"📦 分批处理: 每批 {args.batch_size} 本，共 {num_batches} 批")
+    if args.workers > 1:
+        print(f"🧱 多进程分片: {args.workers} 个进程（{args.shard_mode}），速率预算按进程数均分")
     print()
     
-    # 设置环境变量，确保使用正式目录md/
-    # 必须在导入test_batch_sync之前设置
-    os.environ['OUTPUT_DIR'] = 'md'
-    
-    # 现在导入test_batch_sync（会读取环境变量）
-    import test_batch_sync
-    import asyncio
+    def sync_range(range_start: int, range_end: int):
+        """同步一个ID范围：单进程直接调用 test_batch_sync，多进程时分片抓取后合并"""
+        if args.workers > 1:
+            if not run_sharded_sync(range_start, range_end, args.workers, args.shard_mode,
+                                    retry_failed=args.retry_failed,
+                                    recrawl_missing=args.recrawl_missing, prescan=args.prescan,
+                                    time_budget=time_budget):
+                raise RuntimeError(f"分片抓取失败（ID {range_start}-{range_end}）")
+        else:
+            asyncio.run(test_batch_sync.main(range_start, range_end,
+                                             retry_failed=args.retry_failed,
+                                             recrawl_missing=args.recrawl_missing,
+                                             prescan=args.prescan, time_budget=time_budget))
     
     print("⏳ 开始处理，这可能需要较长时间...")
     print("💡 提示：可以随时中断（Ctrl+C），下次运行会自动跳过已处理的ID（断点续传）")
+    # 按上次运行实测的吞吐量估计耗时（多进程时按进程数放大），没有实测数据时按 0.5 秒/ID
+    ids_per_second = budget_state.get('ids_per_second')
+    basis = f"上次实测 {ids_per_second} ID/秒" if ids_per_second else "0.5秒/ID，尚无实测数据"
+    ids_per_second = (ids_per_second or DEFAULT_IDS_PER_SECOND) * args.workers
     if args.batch_size:
-        print(f"💡 分批处理：每批约 {args.batch_size * 0.5 / 60:.1f} 分钟")
-    print(f"💡 预计总时间：约 {((max_book_id - args.start_id + 1) * 0.5 / 60):.1f} 分钟（基于0.5秒/请求）")
-    print(f"💡 超时保护：600分钟（10小时）\n")
+        print(f"💡 分批处理：每批约 {args.batch_size / ids_per_second / 60:.1f} 分钟")
+    print(f"💡 预计总时间：约 {(max_book_id - args.start_id + 1) / ids_per_second / 60:.1f} 分钟（基于{basis}）")
+    if time_budget:
+        print(f"💡 时间预算：{time_budget.summary()}，时间不够时停止调度并保存续传位置\n")
+    else:
+        print(f"💡 未指定时间预算（--time-budget / --deadline），运行到全部完成\n")
     
     sync_success = False
     try:
@@ -114,13 +232,22 @@ def main():
             while current_start <= max_book_id:
                 current_end = min(current_start + args.batch_size - 1, max_book_id)
                 
+                if time_budget and time_budget.should_stop():
+                    time_budget.stop(current_start)
+                    time_budget.save()
+                    print(f"\n⏰ 剩余时间不够开始下一批（{time_budget.summary()}），下次运行从ID {current_start} 继续")
+                    break
+                
                 print("\n" + "=" * 80)
                 print(f"📦 批次 {batch_num}: 处理 ID {current_start} - {current_end}")
                 print("=" * 80)
                 
                 # 调用test_batch_sync的main函数，传入当前批次的范围
-                asyncio.run(test_batch_sync.main(current_start, current_end))
+                sync_range(current_start, current_end)
                 
+                if time_budget and time_budget.stopped:
+                    print(f"\n⏰ 批次 {batch_num} 因时间预算提前结束")
+                    break
                 print(f"\n✅ 批次 {batch_num} 完成")
                 
                 # 准备下一批
@@ -134,11 +261,18 @@ def main():
                     time.sleep(5)
         else:
             # 一次性处理所有书籍
-            asyncio.run(test_batch_sync.main(args.start_id, max_book_id))
+            sync_range(args.start_id, max_book_id)
         
         sync_success = True
         print("\n" + "=" * 80)
-        print("✅ 全量同步完成！")
+        if time_budget and time_budget.stopped:
+            # 已抓取的部分照常生成md文件和更新README，本次运行作为一次完整的部分同步提交
+            print(f"⏸️  时间预算用完，部分同步完成：下次运行从ID {time_budget.resume_from_id} 继续")
+        else:
+            # 从续传位置（或更早）开始并全部完成后，清除续传位置
+            if resume_from_id and args.start_id <= resume_from_id:
+                save_state(test_batch_sync.TIME_BUDGET_FILE, resume_from_id=None)
+            print("✅ 全量同步完成！")
         print("=" * 80)
     except KeyboardInterrupt:
         print("\n\n⚠️  用户中断，已保存进度")
@@ -152,44 +286,7 @@ def main():
     
     # 只有同步成功才更新README和all_books.json
     if sync_success:
-        print("\n" + "=" * 80)
-        print("📝 步骤4: 更新README.md和all_books.json")
-        print("=" * 80)
-        print()
-        
-        # 更新README.md的热门分类章节
-        print("📝 更新README.md热门分类章节...")
-        try:
-            from update_readme_hot_categories import update_readme
-            if update_readme():
-                print("✅ README.md已更新")
-            else:
-                print("⚠️  README.md更新失败，但继续执行")
-        except Exception as e:
-            print(f"⚠️  更新README.md失败: {e}")
-        
-        # 生成all_books.json
-        print("\n📝 生成all_books.json...")
-        try:
-            import subprocess
-            result = subprocess.run(
-                ["python3", str(Path(__file__).parent.parent.parent / "scripts" / "parse_md_to_json.py")],
-                cwd=str(Path(__file__).parent.parent.parent),
-                capture_output=True,
-                text=True
-            )
-            if result.returncode == 0:
-                print("✅ all_books.json已生成")
-                if result.stdout:
-                    print(result.stdout)
-            else:
-                print(f"⚠️  生成all_books.json失败: {result.stderr}")
-        except Exception as e:
-            print(f"⚠️  生成all_books.json失败: {e}")
-        
-        print("\n" + "=" * 80)
-        print("✅ 全量同步及后续更新完成！")
-        print("=" * 80)
+        finish_sync()
 
 
 if __name__ == "__main__":
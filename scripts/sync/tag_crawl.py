@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按标签列表页抓取：从标签列表页批量收集 标签 -> 书籍ID 的归属关系
+
+输出按标签组织（md/<标签>.md），逐个抓取详情页再按标签归类需要每本书至少一个请求；
+标签列表页一页就列出几十本书，刷新标签归属只需要读取列表页：
+
+1. 逐页读取每个标签的列表页（多个标签并行），收集每个标签下的书籍ID，
+   结果保存在 tag_membership.json
+2. 已有书籍在列表页中新出现的标签直接追加到书籍数据库，只重新生成这些标签的md文件
+3. 只有状态表中没有成功记录（或数据库中没有）的书籍才抓取详情页和下载页，
+   再从归档只解析这些书，列表页中的标签与详情页中的标签合并后写入
+
+列表页只用来追加标签：书籍不再出现在某个标签的列表页中时不会从该标签移除。
+
+需要启用页面归档（HTML_ARCHIVE，默认启用），新书的信息从本次写入的归档中解析。
+不使用书籍数据库（BOOK_STORE=0）时，已有书籍的信息也要从归档中读取，归档中没有的书会重新抓取。
+
+注意：导入本模块前需要先设置 OUTPUT_DIR 环境变量（test_batch_sync 在导入时读取）
+
+配置（环境变量）：
+    TAG_MAX_PAGES        每个标签最多读取的页数，默认 200
+    TAG_CRAWL_WORKERS    同时读取的标签数，默认 4
+"""
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import requests
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+import test_batch_sync
+from book_store import book_store_enabled
+from html_archive import KIND_DETAIL, HtmlArchive, html_archive_enabled
+from listing_delta import LISTING_TIMEOUT, parse_listing_entries, tag_page_url
+from parse_book_detail_enhanced import REQUEST_HEADERS
+from status_table import STATUS_OK
+
+TAG_MAX_PAGES = int(os.getenv("TAG_MAX_PAGES", "200"))
+TAG_CRAWL_WORKERS = int(os.getenv("TAG_CRAWL_WORKERS", "4"))
+MEMBERSHIP_FILE = test_batch_sync.OUTPUT_DIR / "tag_membership.json"  # 标签 -> 书籍ID
+
+
+def known_tags() -> List[str]:
+    """上次生成的标签列表（stats.json 中的 tags）"""
+    if not test_batch_sync.STATS_FILE.exists():
+        return []
+    with open(test_batch_sync.STATS_FILE, 'r', encoding='utf-8') as f:
+        return list(json.load(f).get('tags', {}))
+
+
+def load_membership() -> Dict[str, List[int]]:
+    """读取保存的标签归属"""
+    if not MEMBERSHIP_FILE.exists():
+        return {}
+    with open(MEMBERSHIP_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_membership(membership: Dict[str, List[int]]):
+    """原子写入标签归属"""
+    tmp_path = MEMBERSHIP_FILE.with_name(MEMBERSHIP_FILE.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(membership, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, MEMBERSHIP_FILE)
+
+
+def harvest_tag(tag: str, max_pages: int = TAG_MAX_PAGES) -> Tuple[List[int], int]:
+    """
+    逐页读取一个标签的列表页，收集其中的书籍ID
+
+    Args:
+        tag: 标签名
+        max_pages: 最多读取的页数
+
+    Returns:
+        (书籍ID列表（升序）, 读取的页数)
+    """
+    session = requests.Session()
+    # requests 只有在安装 brotli 时才能解压 br，这里只声明 gzip/deflate
+    session.headers.update(dict(REQUEST_HEADERS, **{'Accept-Encoding': 'gzip, deflate'}))
+    book_ids: Set[int] = set()
+    pages = 0
+    for page in range(1, max_pages + 1):
+        url = tag_page_url(test_batch_sync.BOOK_SITE_DOMAIN, tag, page)
+        try:
+            response = session.get(url, timeout=LISTING_TIMEOUT)
+        except requests.RequestException as e:
+            print(f"⚠️  读取标签列表页失败 {url}: {e}")
+            break
+        pages += 1
+        if response.status_code != 200:
+            break
+        response.encoding = response.apparent_encoding or 'utf-8'
+        page_ids = {book_id for book_id, _ in parse_listing_entries(response.text)}
+        # 没有新书（空页，或者超出页数后站点重复返回最后一页）时停止
+        if not page_ids - book_ids:
+            break
+        book_ids |= page_ids
+    return sorted(book_ids), pages
+
+
+def harvest_tags(tags: List[str], max_pages: int = TAG_MAX_PAGES) -> Tuple[Dict[str, List[int]], int]:
+    """
+    并行读取多个标签的列表页
+
+    Args:
+        tags: 标签列表
+        max_pages: 每个标签最多读取的页数
+
+    Returns:
+        (标签 -> 书籍ID列表, 读取的列表页总数)
+    """
+    membership = {}
+    total_pages = 0
+    with ThreadPoolExecutor(max_workers=max(1, TAG_CRAWL_WORKERS)) as executor:
+        results = executor.map(lambda tag: harvest_tag(tag, max_pages), tags)
+        for index, (tag, (book_ids, pages)) in enumerate(zip(tags, results), 1):
+            membership[tag] = book_ids
+            total_pages += pages
+            print(f"  🏷️  [{index}/{len(tags)}] {tag}: {len(book_ids)} 本书（{pages} 页）")
+    return membership, total_pages
+
+
+async def run_tag_crawl(tags: Optional[List[str]] = None, max_pages: int = TAG_MAX_PAGES) -> bool:
+    """
+    按标签列表页刷新标签归属，只抓取新书的详情页，然后从归档生成md文件
+
+    Args:
+        tags: 要读取的标签，None 表示上次生成的全部标签（stats.json）
+        max_pages: 每个标签最多读取的页数
+
+    Returns:
+        是否成功
+    """
+    print("=" * 80)
+    print("🏷️  按标签列表页抓取")
+    print("=" * 80)
+    if not html_archive_enabled():
+        print("❌ 按标签抓取需要页面归档（新书的信息从归档中解析），请不要设置 HTML_ARCHIVE=0")
+        return False
+
+    tags = tags or known_tags()
+    if not tags:
+        print("❌ 没有可读取的标签：请用 --tags 指定，或先正常抓取一次生成 stats.json")
+        return False
+
+    test_batch_sync.OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    start_time = time.time()
+    print(f"📜 读取 {len(tags)} 个标签的列表页...")
+    harvested, pages = harvest_tags(tags, max_pages)
+    membership = load_membership()
+    # 列表页中新出现的 书籍 -> 标签（与上次保存的归属比较）
+    added: Dict[int, Set[str]] = {}
+    for tag, book_ids in harvested.items():
+        for book_id in set(book_ids) - set(membership.get(tag, [])):
+            added.setdefault(book_id, set()).add(tag)
+    membership.update(harvested)
+
+    member_ids = sorted({book_id for book_ids in membership.values() for book_id in book_ids})
+    status_table = test_batch_sync.load_status_table()
+    new_ids = {book_id for book_id in member_ids if status_table.get(book_id) != STATUS_OK}
+    existing = {book_id: tags for book_id, tags in added.items() if book_id not in new_ids}
+    if book_store_enabled():
+        # 已有书籍的新标签直接写入数据库，只重新生成这些标签的md文件
+        with test_batch_sync.open_book_store(status_table) as store:
+            tagged, unknown = store.add_book_tags(existing)
+            test_batch_sync.render_store_tags(store, sorted(tagged))
+        new_ids |= unknown
+        reparse_ids = set(new_ids)
+        print(f"🏷️  {len(existing) - len(unknown)} 本已有书籍在列表页中有新的标签归属，更新 {len(tagged)} 个标签文件")
+    else:
+        # 没有数据库时已有书籍的信息从归档中读取，归档中没有详情页的书重新抓取
+        archive = HtmlArchive(test_batch_sync.HTML_ARCHIVE_DIR)
+        new_ids |= {book_id for book_id in existing if archive.get(book_id, KIND_DETAIL) is None}
+        archive.close()
+        reparse_ids = new_ids | set(existing)
+    print(f"✅ 读取 {pages} 个列表页，标签归属涉及 {len(member_ids)} 本书，其中 {len(new_ids)} 本需要抓取详情页")
+
+    if new_ids:
+        fetch_ids = sorted(new_ids)
+        await test_batch_sync.main(fetch_ids[0], fetch_ids[-1], only_ids=fetch_ids, generate=False)
+
+    # 只解析需要写入的书籍，列表页中的标签与详情页中的标签合并后写入涉及的标签文件
+    extra_tags: Dict[int, Set[str]] = {}
+    for tag, book_ids in membership.items():
+        for book_id in reparse_ids.intersection(book_ids):
+            extra_tags.setdefault(book_id, set()).add(tag)
+    if reparse_ids:
+        test_batch_sync.rebuild_from_archive(min(reparse_ids), max(reparse_ids), extra_tags, reparse_ids)
+    else:
+        # 没有需要解析的书，只更新统计信息和热门分类索引中的标签数量
+        test_batch_sync.generate_outputs([], {'source': 'tag_listing', 'elapsed_time': time.time() - start_time})
+    # 新书写入后才保存归属：中途失败时下次运行仍会把这些标签当作新出现的
+    save_membership(membership)
+
+    elapsed_time = time.time() - start_time
+    requests_sent = pages + 2 * len(new_ids)
+    print(f"\n✅ 按标签抓取完成（{elapsed_time:.1f} 秒，约 {requests_sent} 个请求，"
+          f"逐本抓取需要约 {2 * len(member_ids)} 个）")
+    return True
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    parser = argparse.ArgumentParser(description='按标签列表页抓取并生成md文件')
+    parser.add_argument('--tags', help='要读取的标签，逗号分隔（默认：stats.json 中的全部标签）')
+    parser.add_argument('--max-pages', type=int, default=TAG_MAX_PAGES,
+                        help=f'每个标签最多读取的页数（默认：{TAG_MAX_PAGES}）')
+    args = parser.parse_args()
+
+    tags = [tag.strip() for tag in args.tags.split(',') if tag.strip()] if args.tags else None
+    success = asyncio.run(run_tag_crawl(tags, args.max_pages))
+    sys.exit(0 if success else 1)
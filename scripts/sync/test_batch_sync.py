@@ -7,17 +7,55 @@
 
 import asyncio
 import aiohttp
+import itertools
 import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from collections import defaultdict
-from typing import Dict, List, Set
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 import json
+import shutil
 import sys
 
 # 添加当前目录到路径
 sys.path.insert(0, str(Path(__file__).parent))
 
-from parse_book_detail_enhanced import parse_book_detail_enhanced
+from parse_book_detail_enhanced import (
+    HTML_PARSER_BACKENDS,
+    REQUEST_HEADERS,
+    get_parser_backend,
+    parse_book_detail_html,
+    parse_download_page_html,
+    parse_scope_enabled,
+)
+from rate_limiter import HostRateLimiter
+from http_cache import HttpCache, http_cache_enabled
+from liveness_scan import LivenessMap, scan_liveness
+from book_store import BookStore, book_store_enabled
+from crawl_metrics import CrawlMetrics, metrics_enabled
+from md_merge_writer import TABLE_HEADER, merge_md_file, write_md_table
+from profiling import add_profile_arguments, run_profiled
+from html_archive import (
+    KIND_DETAIL,
+    KIND_DOWNLOAD,
+    HtmlArchive,
+    html_archive_enabled,
+    reparse_archived_book,
+)
+from result_journal import ResultJournal, TagSpool, iter_journal, journal_statuses, restore_journaled_statuses
+from retry_scheduler import DeadLetterList, backoff_delay, parse_retry_after, should_retry
+from status_table import (
+    FAILED_STATUSES,
+    STATUS_ERROR,
+    STATUS_MISSING,
+    STATUS_NAMES,
+    STATUS_NO_DOWNLOAD,
+    STATUS_OK,
+    STATUS_RETRY_AFTER,
+    STATUS_UNSEEN,
+    StatusTable,
+    format_status_counts,
+)
+from time_budget import TimeBudget, add_time_budget_arguments, deadline_from_args
 
 # 尝试导入配置文件，如果不存在则使用环境变量
 import os
@@ -35,19 +73,43 @@ except ImportError:
 
 # 配置
 BASE_URL = f"{BOOK_SITE_DOMAIN}/book-content-{{}}.html"
-# 输出目录：根据环境变量决定是测试目录还是正式目录
+# 输出目录：根据环境变量决定是测试目录还是正式目录（绝对路径用于基准测试等临时目录）
 OUTPUT_DIR_ENV = os.getenv("OUTPUT_DIR", "md_test")
 if OUTPUT_DIR_ENV == "md":
     OUTPUT_DIR = Path(__file__).parent.parent.parent / "md"  # 正式目录
+elif os.path.isabs(OUTPUT_DIR_ENV):
+    OUTPUT_DIR = Path(OUTPUT_DIR_ENV)
 else:
     OUTPUT_DIR = Path(__file__).parent.parent.parent / "md_test"  # 测试目录
-PROCESSED_IDS_FILE = OUTPUT_DIR / "processed_ids.json"
+PROCESSED_IDS_FILE = OUTPUT_DIR / "processed_ids.json"  # 旧版已处理ID列表，首次运行时迁移到状态表
+STATUS_FILE = OUTPUT_DIR / "crawl_status.bin"  # 每个书籍ID一个字节的抓取状态表
+DEAD_LETTER_FILE = OUTPUT_DIR / "dead_letter.jsonl"  # 用完重试次数仍失败的书籍ID
+LIVENESS_FILE = OUTPUT_DIR / "liveness.bin"  # 存活预扫描位图（每个书籍ID两位）
 STATS_FILE = OUTPUT_DIR / "stats.json"
+BOOK_STORE_FILE = OUTPUT_DIR / "books.sqlite"  # 书籍数据库（md文件和统计信息由它生成）
 MAX_BOOK_ID_FILE = OUTPUT_DIR / "max_book_id.json"  # 记录最大书籍ID
+TIME_BUDGET_FILE = OUTPUT_DIR / "time_budget.json"  # 实测吞吐量、生成耗时和时间预算的续传位置
+HTTP_CACHE_DIR = Path(os.getenv("HTTP_CACHE_DIR", str(OUTPUT_DIR / ".http_cache")))  # 页面缓存目录
+HTML_ARCHIVE_DIR = Path(os.getenv("HTML_ARCHIVE_DIR", str(OUTPUT_DIR / ".archive")))  # 原始页面归档目录
+JOURNAL_DIR = OUTPUT_DIR / ".journal"  # 抓取结果日志目录（中断后可续传）
+SHARDS_DIR = OUTPUT_DIR / ".shards"  # 多进程分片抓取的工作目录
+SHARD_JOURNAL_NAME = "books.jsonl"  # 分片目录中的结果日志
+SHARD_STATS_NAME = "shard_stats.json"  # 分片目录中的统计信息
 
 # 并发配置
-MAX_CONCURRENT = 20  # 最大并发数
-REQUEST_DELAY = 0.5  # 请求延迟（秒）
+MAX_CONCURRENT = 20  # 最大并发数（同时进行中的HTTP请求数）
+FETCH_WORKERS = MAX_CONCURRENT  # 抓取协程数量
+MAX_IN_FLIGHT = MAX_CONCURRENT * 4  # 同时在流水线中（已取出ID、尚未写入）的书籍数上限
+# 请求速率由 rate_limiter 按主机自适应控制（RATE_LIMIT_DEFAULT / RATE_LIMITS 环境变量）
+
+# HTTP 连接配置（所有请求共用一个 aiohttp 会话，复用 keep-alive 连接）
+REQUEST_TIMEOUT = 10  # 单个请求超时（秒），与原 requests 版本一致
+LIMIT_PER_HOST = MAX_CONCURRENT  # 每个主机的最大连接数
+DNS_CACHE_TTL = 300  # DNS 缓存时间（秒）
+
+# 解析配置：HTML 解析在独立进程中进行，避免与抓取协程争抢 GIL
+# PARSE_WORKERS=0 时在事件循环线程内直接解析（单核机器或调试用）
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))
 
 
 def sanitize_filename(filename: str) -> str:
@@ -75,60 +137,35 @@ def sanitize_filename(filename: str) -> str:
     return filename or "未命名"
 
 
-def generate_md_file(tag_name: str, books: List[Dict], output_dir: Path) -> Path:
+def format_md_rows(books: List[Dict]) -> List[str]:
     """
-    生成Markdown文件
+    把书籍格式化为md表格行（跳过没有实际下载链接的书）
     
     Args:
-        tag_name: 标签名称
         books: 书籍列表
-        output_dir: 输出目录
     
     Returns:
-        生成的文件路径
+        表格行列表
     """
-    output_dir.mkdir(parents=True, exist_ok=True)
-    
-    # 清理文件名
-    safe_filename = sanitize_filename(tag_name)
-    file_path = output_dir / f"{safe_filename}.md"
-    
-    # 过滤有效书籍（必须有书名和下载链接）
-    valid_books = []
+    lines = []
     for book in books:
         title = book.get('title', '').strip()
         # 优先使用实际下载链接（诚通网盘链接），避免使用下载页面链接（包含敏感域名）
         download_url = book.get('download_url', '').strip()
         
         # 如果没有实际下载链接，跳过该书（不包含下载页面链接以保护隐私）
-        if not download_url:
+        if not title or not download_url:
             continue
         
-        if title and download_url:
-            valid_books.append({
-                'title': title,
-                'author': book.get('author', '未知').strip() or '未知',
-                'download_url': download_url
-            })
-    
-    if not valid_books:
-        return None
-    
-    # 生成Markdown内容
-    lines = []
-    lines.append("| 书名 | 作者 | epub/mobi/azw3 |")
-    lines.append("| --- | --- | --- |")
-    
-    for book in valid_books:
         # 转义Markdown特殊字符
-        title_escaped = book['title'].replace('|', '\\|')
-        author_escaped = book['author'].replace('|', '\\|')
+        title_escaped = title.replace('|', '\\|')
+        author_escaped = (book.get('author', '未知').strip() or '未知').replace('|', '\\|')
         # 修改下载链接：将 ?pwd= 改成 ?p=
-        download_url = book['download_url'].replace('?pwd=', '?p=')
+        download_url = download_url.replace('?pwd=', '?p=')
         
         # 隐私保护：如果下载链接包含敏感域名，移除该书籍（不生成到md文件）
         # 这样可以确保GitHub仓库中不包含敏感域名
-        if download_url and BOOK_SITE_DOMAIN in download_url:
+        if BOOK_SITE_DOMAIN in download_url:
             # 跳过包含敏感域名的链接（通常是下载页面链接）
             # 只保留诚通网盘的实际下载链接
             continue
@@ -136,116 +173,587 @@ def generate_md_file(tag_name: str, books: List[Dict], output_dir: Path) -> Path
         download_link = f"[下载]({download_url})"
         
         lines.append(f"| {title_escaped} | {author_escaped} | {download_link} |")
+    return lines
+
+
+def generate_md_file(tag_name: str, books: List[Dict], output_dir: Path) -> Path:
+    """
+    生成Markdown文件
+    
+    Args:
+        tag_name: 标签名称
+        books: 书籍列表
+        output_dir: 输出目录
+    
+    Returns:
+        生成的文件路径
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    # 清理文件名
+    safe_filename = sanitize_filename(tag_name)
+    file_path = output_dir / f"{safe_filename}.md"
+    
+    rows = format_md_rows(books)
+    if not rows:
+        return None
     
     # 写入文件
-    file_path.write_text('\n'.join(lines), encoding='utf-8')
+    file_path.write_text('\n'.join(TABLE_HEADER + rows), encoding='utf-8')
     return file_path
 
 
-async def fetch_book_async(session: aiohttp.ClientSession, book_id: int, semaphore: asyncio.Semaphore) -> Dict:
+class RetryableHttpError(aiohttp.ClientError):
+    """服务器返回 429 / 5xx，稍后重试可能成功"""
+    
+    def __init__(self, url: str, status: int, retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status}: {url}")
+        self.url = url
+        self.status = status
+        self.retry_after = retry_after  # Retry-After 响应头（秒）
+
+
+def create_session(metrics: Optional[CrawlMetrics] = None) -> aiohttp.ClientSession:
     """
-    异步获取书籍信息
+    创建共享的 aiohttp 会话（连接池 + 每主机连接数限制）
     
     Args:
-        session: aiohttp会话
-        book_id: 书籍ID
-        semaphore: 信号量控制并发
+        metrics: 抓取指标，指定时记录 DNS 解析和建立连接的耗时
     
     Returns:
-        书籍信息字典，失败返回None
+        aiohttp会话
     """
-    async with semaphore:
-        url = BASE_URL.format(book_id)
-        
+    connector = aiohttp.TCPConnector(
+        limit=MAX_CONCURRENT,
+        limit_per_host=LIMIT_PER_HOST,
+        ttl_dns_cache=DNS_CACHE_TTL,
+    )
+    # aiohttp 只有在安装 brotli 时才能解压 br，这里只声明 gzip/deflate
+    headers = dict(REQUEST_HEADERS, **{'Accept-Encoding': 'gzip, deflate'})
+    return aiohttp.ClientSession(
+        connector=connector,
+        headers=headers,
+        timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+        trace_configs=[metrics.trace_config()] if metrics else None,
+    )
+
+
+class CrawlContext:
+    """一次抓取共用的资源：HTTP会话、并发信号量、限速器、解析进程池、页面缓存、页面归档、磁盘写入线程和抓取指标"""
+    
+    def __init__(self, session: aiohttp.ClientSession, rate_limiter: HostRateLimiter,
+                 parse_pool: Optional[ProcessPoolExecutor] = None,
+                 http_cache: Optional[HttpCache] = None,
+                 html_archive: Optional[HtmlArchive] = None,
+                 metrics: Optional[CrawlMetrics] = None,
+                 io_pool: Optional[Executor] = None):
+        self.session = session
+        self.semaphore = asyncio.Semaphore(MAX_CONCURRENT)
+        self.rate_limiter = rate_limiter
+        self.parse_pool = parse_pool
+        self.http_cache = http_cache
+        self.html_archive = html_archive
+        self.metrics = metrics if metrics is not None else CrawlMetrics()
+        self.io_pool = io_pool
+
+
+async def fetch_html_async(ctx: CrawlContext, url: str,
+                           kind: str = KIND_DETAIL) -> Optional[Tuple[bytes, Optional[str]]]:
+    """
+    异步获取页面 HTML
+    
+    有磁盘缓存时先查缓存：TTL 内的无校验缓存直接返回；有 ETag / Last-Modified 的
+    发送条件请求，304 时复用缓存内容（缓存内容已丢失或损坏时删除缓存条目并重新完整下载）。
+    需要请求时，先在限速器处取得令牌（等待期间不占用并发槽位），再占用信号量发起请求，
+    请求结果（状态码、耗时）回报给限速器用于自适应调速，同时记入抓取指标。
+    
+    Args:
+        ctx: 抓取上下文
+        url: 页面URL
+        kind: 页面类型（KIND_DETAIL / KIND_DOWNLOAD），作为指标的标签
+    
+    Returns:
+        (页面原始字节, 响应头中的字符集)，页面不存在（4xx）时返回None
+    
+    Raises:
+        RetryableHttpError: 服务器返回 429 / 5xx
+    """
+    cache = ctx.http_cache
+    metrics = ctx.metrics
+    entry = cache.lookup(url) if cache else None
+    if entry and cache.is_fresh(entry):
+        body = cache.load_body(url)
+        if body is not None:
+            cache.fresh_hits += 1
+            cache.bytes_saved += len(body)
+            metrics.inc('crawl_cache_total', kind=kind, result='fresh')
+            return body, entry.get('charset')
+        entry = None
+    
+    wait_started = time.monotonic()
+    await ctx.rate_limiter.acquire(url)
+    metrics.observe('crawl_rate_limit_wait_seconds', time.monotonic() - wait_started, kind=kind)
+    async with ctx.semaphore:
+        started = time.monotonic()
         try:
-            # 添加延迟避免请求过快
-            await asyncio.sleep(REQUEST_DELAY)
-            
-            # 使用同步请求（因为parse_book_detail_enhanced是同步的）
-            # 在实际生产环境中，可以改为异步版本
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(None, parse_book_detail_enhanced, url)
-            
-            # 检查是否成功获取到书名（判断书籍是否存在）
-            if result.get('title'):
-                result['book_id'] = str(book_id)
-                return result
-            else:
-                return None
-                
-        except Exception as e:
-            print(f"❌ 处理书籍ID {book_id} 时出错: {e}")
-            return None
+            headers = cache.conditional_headers(entry) if cache else None
+            async with ctx.session.get(url, headers=headers) as response:
+                body = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            elapsed = time.monotonic() - started
+            ctx.rate_limiter.record(url, None, elapsed)
+            metrics.observe('crawl_request_seconds', elapsed, kind=kind)
+            metrics.inc('crawl_responses_total', kind=kind, status='error')
+            raise
+        elapsed = time.monotonic() - started
+        ctx.rate_limiter.record(url, response.status, elapsed)
+    metrics.observe('crawl_request_seconds', elapsed, kind=kind)
+    metrics.inc('crawl_responses_total', kind=kind, status=response.status)
+    metrics.inc('crawl_response_bytes_total', len(body), kind=kind)
+    
+    if response.status == 304 and entry:
+        cached_body = cache.load_body(url)
+        if cached_body is not None:
+            metrics.inc('crawl_cache_total', kind=kind, result='revalidated')
+            cache.revalidated += 1
+            cache.bytes_saved += len(cached_body)
+            await run_io(ctx, cache.touch, url, entry)
+            return cached_body, entry.get('charset')
+        # 缓存内容已丢失或损坏：删除缓存条目，不带条件请求头重新下载一次
+        cache.discard(url)
+        metrics.inc('crawl_cache_total', kind=kind, result='corrupt')
+        return await fetch_html_async(ctx, url, kind)
+    
+    if response.status == 429 or response.status >= 500:
+        raise RetryableHttpError(url, response.status,
+                                 parse_retry_after(response.headers.get('Retry-After')))
+    if response.status >= 400 or response.status == 304:
+        return None
+    
+    if cache:
+        cache.misses += 1
+        await run_io(ctx, cache.store, url, body, response.charset,
+                     response.headers.get('ETag'), response.headers.get('Last-Modified'))
+    return body, response.charset
 
 
-async def batch_process_books(book_ids: List[int]) -> Dict[str, List[Dict]]:
+def create_io_pool() -> ThreadPoolExecutor:
     """
-    批量处理书籍
+    创建磁盘写入线程：页面归档和页面缓存的压缩、写入不在事件循环线程中进行
+    
+    只有一个线程，归档的分段文件和索引按提交顺序写入，不需要加锁；
+    zstd / gzip 压缩时会释放 GIL，不影响抓取协程。
+    
+    Returns:
+        单线程的线程池
+    """
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix='page-writer')
+
+
+async def run_io(ctx: CrawlContext, func, *args):
+    """
+    在磁盘写入线程中执行 func（没有写入线程时直接执行）
     
     Args:
-        book_ids: 书籍ID列表
+        ctx: 抓取上下文
+        func: 写入函数
+        *args: 写入函数参数
     
     Returns:
-        按标签分类的书籍字典 {tag: [books]}
+        写入函数的返回值
     """
-    # 按标签分类的书籍
-    books_by_tag = defaultdict(list)
+    if ctx.io_pool is None:
+        return func(*args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(ctx.io_pool, func, *args)
+
+
+def create_parse_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    创建 HTML 解析进程池（大小由 PARSE_WORKERS 决定，默认等于CPU核数）
+    
+    Returns:
+        进程池，PARSE_WORKERS=0 时返回None（在当前线程内解析）
+    """
+    if PARSE_WORKERS <= 0:
+        return None
+    return ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+
+
+def timed_parse(func, *args) -> Tuple[object, float]:
+    """
+    执行解析函数并统计它占用的CPU时间（在解析进程中执行时统计的是该进程的CPU时间）
+    
+    Args:
+        func: 解析函数
+        *args: 解析函数参数
+    
+    Returns:
+        (解析函数的返回值, CPU时间（秒）)
+    """
+    started = time.process_time()
+    result = func(*args)
+    return result, time.process_time() - started
+
+
+async def run_parser(parse_pool: Optional[ProcessPoolExecutor], func, *args):
+    """
+    在解析进程池中执行解析函数，只传递页面字节并取回精简的结果字典
+    
+    Args:
+        parse_pool: 解析进程池，None 表示直接在当前线程执行
+        func: 解析函数（必须是可被 pickle 的模块级函数）
+        *args: 解析函数参数
+    
+    Returns:
+        解析函数的返回值
+    """
+    if parse_pool is None:
+        return func(*args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(parse_pool, func, *args)
+
+
+class BookJob:
+    """流水线中的一本书：依次经过 抓取详情页 → 解析 → 抓取下载页 → 解析 → 写入"""
+    
+    __slots__ = ('book_id', 'status', 'result', 'page', 'attempts', 'error', 'retry_after')
+    
+    def __init__(self, book_id: int):
+        self.book_id = book_id
+        self.status = STATUS_UNSEEN
+        self.result: Optional[Dict] = None  # 详情页解析结果，None 表示还在详情页阶段
+        self.page: Optional[Tuple[bytes, Optional[str]]] = None  # 待解析的页面
+        self.attempts = 0  # 抓取失败次数（详情页和下载页合计）
+        self.error: Optional[str] = None  # 最后一次的错误信息
+        self.retry_after: Optional[float] = None  # 服务器要求的等待时间（秒）
+
+
+async def fetch_stage(ctx: CrawlContext, job: BookJob) -> bool:
+    """
+    抓取阶段：抓取详情页，或者在详情页解析完成后抓取下载页
+    
+    Args:
+        ctx: 抓取上下文
+        job: 流水线任务
+    
+    Returns:
+        是否需要进入解析阶段；False 表示已有最终状态，直接写入
+    """
+    detail_stage = job.result is None
+    url = BASE_URL.format(job.book_id) if detail_stage else job.result['download_page']
+    try:
+        job.page = await fetch_html_async(ctx, url, KIND_DETAIL if detail_stage else KIND_DOWNLOAD)
+    except RetryableHttpError as e:
+        # 下载页失败不影响其他信息的提取，重试次数用完后书籍信息照常写入
+        job.status, job.error, job.retry_after = STATUS_RETRY_AFTER, str(e), e.retry_after
+        return False
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        job.status, job.error, job.retry_after = STATUS_ERROR, f"{type(e).__name__}: {e}", None
+        return False
+    except Exception as e:
+        print(f"❌ 处理书籍ID {job.book_id} 时出错: {e}")
+        job.status, job.error, job.retry_after = STATUS_ERROR, f"{type(e).__name__}: {e}", None
+        return False
+    
+    if not job.page:
+        job.status = STATUS_MISSING if detail_stage else STATUS_NO_DOWNLOAD
+        return False
+    return True
+
+
+async def parse_stage(ctx: CrawlContext, job: BookJob) -> bool:
+    """
+    解析阶段：在解析进程池中解析详情页或下载页
     
-    # 创建信号量控制并发
-    semaphore = asyncio.Semaphore(MAX_CONCURRENT)
+    Args:
+        ctx: 抓取上下文
+        job: 流水线任务
     
-    # 创建aiohttp会话
-    async with aiohttp.ClientSession() as session:
-        # 创建任务列表
-        tasks = [fetch_book_async(session, book_id, semaphore) for book_id in book_ids]
+    Returns:
+        是否还需要抓取下载页；False 表示已有最终状态，直接写入
+    """
+    page, job.page = job.page, None
+    if job.result is None:
+        url = BASE_URL.format(job.book_id)
+        started = time.monotonic()
+        result, cpu_seconds = await run_parser(ctx.parse_pool, timed_parse, parse_book_detail_html,
+                                               page[0], url, page[1])
+        ctx.metrics.observe('crawl_parse_seconds', time.monotonic() - started, kind=KIND_DETAIL)
+        ctx.metrics.inc('crawl_cpu_seconds_total', cpu_seconds, stage='parse')
         
-        # 处理结果
-        completed = 0
-        total = len(tasks)
+        # 检查是否成功获取到书名（判断书籍是否存在）
+        if not result.get('title'):
+            job.status = STATUS_MISSING
+            return False
         
-        for coro in asyncio.as_completed(tasks):
-            book_data = await coro
-            completed += 1
-            
-            if book_data:
-                # 按标签分类
-                tags = book_data.get('tags', [])
-                if tags:
-                    for tag in tags:
-                        books_by_tag[tag].append(book_data)
-                else:
-                    # 如果没有标签，使用分类作为标签
-                    category = book_data.get('category', '未分类')
-                    if category:
-                        books_by_tag[category].append(book_data)
-                    else:
-                        books_by_tag['未分类'].append(book_data)
-                
-                # 显示进度
-                if completed % 10 == 0 or completed == total:
-                    print(f"📊 进度: {completed}/{total} ({completed*100//total}%) - 已找到 {len(books_by_tag)} 个标签")
-            else:
-                if completed % 50 == 0 or completed == total:
-                    print(f"📊 进度: {completed}/{total} ({completed*100//total}%)")
+        if ctx.html_archive:
+            await run_io(ctx, ctx.html_archive.append, job.book_id, KIND_DETAIL, url, *page)
+        result['book_id'] = str(job.book_id)
+        job.result = result
+        
+        # 有下载页时回到抓取阶段，获取诚通网盘的实际下载链接
+        if result.get('download_page'):
+            return True
+        job.status = STATUS_NO_DOWNLOAD
+        return False
+    
+    if ctx.html_archive:
+        await run_io(ctx, ctx.html_archive.append, job.book_id, KIND_DOWNLOAD, job.result['download_page'], *page)
+    started = time.monotonic()
+    download_info, cpu_seconds = await run_parser(ctx.parse_pool, timed_parse, parse_download_page_html, *page)
+    ctx.metrics.observe('crawl_parse_seconds', time.monotonic() - started, kind=KIND_DOWNLOAD)
+    ctx.metrics.inc('crawl_cpu_seconds_total', cpu_seconds, stage='parse')
+    if download_info and download_info.get('download_url'):
+        job.result['download_url'] = download_info['download_url']
+        job.status = STATUS_OK
+    else:
+        job.status = STATUS_NO_DOWNLOAD
+    return False
+
+
+def book_tags(book_data: Dict) -> List[str]:
+    """
+    获取一本书所属的标签（没有标签时使用分类作为标签）
     
-    return dict(books_by_tag)
+    Args:
+        book_data: 书籍信息
+    
+    Returns:
+        标签列表
+    """
+    tags = book_data.get('tags', [])
+    if tags:
+        return tags
+    # 如果没有标签，使用分类作为标签
+    return [book_data.get('category', '未分类') or '未分类']
 
 
-def save_processed_ids(book_ids: Set[int]):
-    """保存已处理的ID列表"""
-    PROCESSED_IDS_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with open(PROCESSED_IDS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(sorted(book_ids), f, ensure_ascii=False, indent=2)
+def journal_path(start_id: int, end_id: int) -> Path:
+    """抓取范围对应的结果日志文件"""
+    return JOURNAL_DIR / f"books-{start_id}-{end_id}.jsonl"
+
+
+async def batch_process_books(book_ids: List[int], rate_limiter: HostRateLimiter,
+                              journal: ResultJournal, status_table: StatusTable,
+                              dead_letter: DeadLetterList,
+                              http_cache: Optional[HttpCache] = None,
+                              html_archive: Optional[HtmlArchive] = None,
+                              metrics: Optional[CrawlMetrics] = None,
+                              time_budget: Optional[TimeBudget] = None) -> int:
+    """
+    批量处理书籍
+    
+    使用有界流水线：ID生产者 → FETCH_WORKERS 个抓取协程 → 解析协程 → 单个写入协程。
+    同时在流水线中的书籍不超过 MAX_IN_FLIGHT 本，内存占用与并发数成正比，与ID范围大小无关。
+    下载页抓取任务优先于新书的详情页，已开始的书会尽快完成。
+    抓取遇到临时错误时按指数退避重新放回抓取队列，用完重试次数后记入死信列表。
+    每本书完成后立即写入结果日志，并在状态表中记录该ID的结果。
+    各阶段的耗时、CPU时间、状态码和队列深度记入抓取指标，定期写入指标文件（见 crawl_metrics）。
+    指定时间预算时，剩余时间不够完成在途任务和生成md文件时停止调度新ID，也不再安排新的重试；
+    没有调度的ID在状态表中仍是未抓取（见 time_budget）。
+    
+    Args:
+        book_ids: 书籍ID列表
+        rate_limiter: 按主机的自适应限速器
+        journal: 结果日志
+        status_table: 抓取状态表
+        dead_letter: 死信列表
+        http_cache: 磁盘页面缓存，None 表示不使用缓存
+        html_archive: 原始页面归档，None 表示不归档
+        metrics: 抓取指标，None 表示只在内存中统计
+        time_budget: 时间预算，None 表示不限时
+    
+    Returns:
+        本次找到的书籍数量
+    """
+    total = len(book_ids)
+    if total == 0:
+        return 0
+    metrics = metrics if metrics is not None else CrawlMetrics()
+    
+    # 抓取队列中下载页（优先级0）排在新书详情页（优先级1）前面，序号保证同优先级先进先出
+    fetch_queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+    parse_queue: asyncio.Queue = asyncio.Queue()
+    write_queue: asyncio.Queue = asyncio.Queue()
+    in_flight = asyncio.Semaphore(MAX_IN_FLIGHT)
+    sequence = itertools.count()
+    loop = asyncio.get_running_loop()
+    produced = 0
+    scheduled = total  # 写入协程需要等待完成的ID数（停止调度后减少为已调度的数量）
+    waiting_retry = 0
+    retried = 0
+    
+    async def producer():
+        nonlocal produced, scheduled
+        for book_id in book_ids:
+            await in_flight.acquire()
+            in_progress = produced - completed
+            if time_budget is not None and time_budget.should_stop(in_progress, found + in_progress):
+                in_flight.release()
+                time_budget.stop(book_id)
+                scheduled = produced
+                print(f"⏰ 剩余时间不够继续调度（{time_budget.summary()}），在ID {book_id} 停止，"
+                      f"等待 {in_progress} 本在途书籍完成")
+                # 唤醒写入协程重新检查是否已全部完成
+                write_queue.put_nowait(None)
+                return
+            produced += 1
+            fetch_queue.put_nowait((1, next(sequence), BookJob(book_id)))
+    
+    def requeue(priority: int, job: BookJob):
+        nonlocal waiting_retry
+        waiting_retry -= 1
+        fetch_queue.put_nowait((priority, next(sequence), job))
+    
+    async def fetch_worker(ctx: CrawlContext):
+        nonlocal waiting_retry, retried
+        while True:
+            priority, _, job = await fetch_queue.get()
+            if await fetch_stage(ctx, job):
+                parse_queue.put_nowait(job)
+                continue
+            if job.status in FAILED_STATUSES:
+                job.attempts += 1
+                # 时间预算用完后不再安排重试，直接记入死信列表，下次运行重新抓取
+                if should_retry(job.attempts, time_budget is not None and time_budget.stopped):
+                    # 退避期间任务仍占用流水线名额，不会无限堆积
+                    waiting_retry += 1
+                    retried += 1
+                    metrics.inc('crawl_retries_total', status=STATUS_NAMES[job.status])
+                    loop.call_later(backoff_delay(job.attempts, job.retry_after), requeue, priority, job)
+                    continue
+            write_queue.put_nowait(job)
+    
+    async def parse_worker(ctx: CrawlContext):
+        while True:
+            job = await parse_queue.get()
+            try:
+                fetch_download = await parse_stage(ctx, job)
+            except Exception as e:
+                print(f"❌ 解析书籍ID {job.book_id} 时出错: {e}")
+                job.status, fetch_download = STATUS_ERROR, False
+            if fetch_download:
+                fetch_queue.put_nowait((0, next(sequence), job))
+            else:
+                write_queue.put_nowait(job)
+    
+    def queue_summary() -> str:
+        return (f"抓取 {fetch_queue.qsize()} / 等待重试 {waiting_retry} / 解析 {parse_queue.qsize()}"
+                f" / 写入 {write_queue.qsize()} / 处理中 {produced - completed}")
+    
+    def write_metrics():
+        for queue, depth in (('fetch', fetch_queue.qsize()), ('retry_wait', waiting_retry),
+                             ('parse', parse_queue.qsize()), ('write', write_queue.qsize()),
+                             ('in_flight', produced - completed)):
+            metrics.set_gauge('crawl_queue_depth', depth, queue=queue)
+        for host, host_stats in rate_limiter.stats().items():
+            metrics.set_gauge('crawl_rate_limit', host_stats['rate_limit'], host=host)
+        metrics.write()
+    
+    found = 0
+    completed = 0
+    write_cpu = 0.0  # 写入协程占用的CPU时间
+    loop_cpu_started = time.process_time()
+    
+    # 创建解析进程池、磁盘写入线程和aiohttp会话
+    parse_pool = create_parse_pool()
+    io_pool = create_io_pool()
+    try:
+        async with create_session(metrics) as session:
+            ctx = CrawlContext(session, rate_limiter, parse_pool, http_cache, html_archive, metrics, io_pool)
+            parse_workers = max(1, PARSE_WORKERS) * 2 if parse_pool is not None else 1
+            workers = [asyncio.create_task(producer())]
+            workers += [asyncio.create_task(fetch_worker(ctx)) for _ in range(FETCH_WORKERS)]
+            workers += [asyncio.create_task(parse_worker(ctx)) for _ in range(parse_workers)]
+            
+            try:
+                # 单个写入协程：这里直接在当前协程中消费写入队列
+                while completed < scheduled:
+                    job = await write_queue.get()
+                    if job is None:
+                        continue
+                    write_started = time.thread_time()
+                    in_flight.release()
+                    completed += 1
+                    # 先写结果日志再记状态：状态表落盘时记为已抓取的书一定已在日志中
+                    if job.result:
+                        # 记下最终状态（下载页失败的书也会写入日志），续传时据此恢复状态表
+                        job.result['crawl_status'] = STATUS_NAMES[job.status]
+                        journal.append(job.result)
+                        found += 1
+                    status_table.set(job.book_id, job.status)
+                    metrics.inc('crawl_books_total', status=STATUS_NAMES[job.status])
+                    if time_budget is not None:
+                        time_budget.record_completed()
+                    if job.status in FAILED_STATUSES:
+                        dead_letter.add(job.book_id, STATUS_NAMES[job.status], job.attempts, job.error)
+                    else:
+                        dead_letter.discard(job.book_id)
+                    # 状态表落盘前先同步结果日志，保证状态表里记为已抓取的书一定在日志中
+                    if status_table.checkpoint_due():
+                        journal.sync()
+                        status_table.checkpoint()
+                    if metrics.write_due():
+                        write_metrics()
+                    
+                    # 显示进度
+                    if completed % 50 == 0 or completed == total:
+                        budget = f" - 时间: {time_budget.summary()}" if time_budget is not None else ""
+                        print(f"📊 进度: {completed}/{total} ({completed*100//total}%) - 已找到 {found} 本书"
+                              f" - 重试 {retried} 次 - 队列: {queue_summary()} - 速率: {rate_limiter.summary()}"
+                              + budget)
+                    write_cpu += time.thread_time() - write_started
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                # 当前进程中除解析和写入以外的CPU时间都记为抓取（请求、限速、调度）
+                loop_cpu = time.process_time() - loop_cpu_started
+                in_process_parse = metrics.counter_value('crawl_cpu_seconds_total', stage='parse') \
+                    if parse_pool is None else 0.0
+                metrics.inc('crawl_cpu_seconds_total', write_cpu, stage='write')
+                metrics.inc('crawl_cpu_seconds_total', max(0.0, loop_cpu - write_cpu - in_process_parse),
+                            stage='fetch')
+                write_metrics()
+    finally:
+        # 等待已提交的归档和缓存写入完成，之后调用方才能关闭归档
+        io_pool.shutdown()
+        if parse_pool is not None:
+            parse_pool.shutdown()
+    
+    return found
 
 
 def load_processed_ids() -> Set[int]:
-    """加载已处理的ID列表"""
+    """加载旧版已处理的ID列表（仅用于迁移）"""
     if PROCESSED_IDS_FILE.exists():
         with open(PROCESSED_IDS_FILE, 'r', encoding='utf-8') as f:
             return set(json.load(f))
     return set()
 
 
+def load_status_table() -> StatusTable:
+    """
+    加载抓取状态表
+    
+    状态表不存在而旧版 processed_ids.json 存在时，把其中的ID记为成功并删除旧文件
+    （旧版不区分成功和失败，无法还原更细的状态）。
+    
+    Returns:
+        抓取状态表
+    """
+    status_table = StatusTable(STATUS_FILE)
+    if not STATUS_FILE.exists() and PROCESSED_IDS_FILE.exists():
+        processed_ids = load_processed_ids()
+        for book_id in processed_ids:
+            status_table.set(book_id, STATUS_OK)
+        status_table.checkpoint()
+        PROCESSED_IDS_FILE.unlink()
+        print(f"📋 已将 {len(processed_ids)} 个已处理ID迁移到状态表: {STATUS_FILE.name}")
+    return status_table
+
+
 def save_stats(stats: Dict):
     """保存统计信息"""
     with open(STATS_FILE, 'w', encoding='utf-8') as f:
@@ -268,12 +776,12 @@ def load_max_book_id() -> int:
     return 0
 
 
-def generate_hot_categories_index(books_by_tag: Dict[str, List[Dict]], output_dir: Path) -> Path:
+def generate_hot_categories_index(tag_counts: Dict[str, int], output_dir: Path) -> Path:
     """
     生成热门分类索引文件（按照README.md格式）
     
     Args:
-        books_by_tag: 按标签分类的书籍字典
+        tag_counts: 各标签的书籍数量 {tag: count}
         output_dir: 输出目录
     
     Returns:
@@ -283,7 +791,7 @@ def generate_hot_categories_index(books_by_tag: Dict[str, List[Dict]], output_di
     file_path = output_dir / "热门分类.md"
     
     # 按书籍数量排序
-    sorted_tags = sorted(books_by_tag.items(), key=lambda x: len(x[1]), reverse=True)
+    sorted_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)
     
     # 生成内容
     lines = []
@@ -300,8 +808,7 @@ def generate_hot_categories_index(books_by_tag: Dict[str, List[Dict]], output_di
         batch = sorted_tags[i:i + items_per_line]
         line_items = []
         
-        for tag, books in batch:
-            count = len(books)
+        for tag, count in batch:
             # 清理文件名（与generate_md_file中的逻辑一致）
             safe_filename = sanitize_filename(tag)
             link = f"- [{tag}({count})]({safe_filename}.md)"
@@ -316,13 +823,377 @@ def generate_hot_categories_index(books_by_tag: Dict[str, List[Dict]], output_di
     return file_path
 
 
-async def main(start_id: int = 1, end_id: int = 1000):
+def load_stats() -> Dict:
+    """读取上次保存的统计信息"""
+    if not STATS_FILE.exists():
+        return {}
+    try:
+        with open(STATS_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except ValueError:
+        return {}
+
+
+def open_book_store(status_table: Optional[StatusTable] = None) -> BookStore:
+    """
+    打开书籍数据库；第一次创建时从已有的md文件和抓取状态表导入
+    
+    Args:
+        status_table: 当前的抓取状态表（不指定时从 crawl_status.bin 读取）
+    
+    Returns:
+        书籍数据库
+    """
+    created = not BOOK_STORE_FILE.exists()
+    store = BookStore(BOOK_STORE_FILE)
+    if created:
+        imported = store.import_md_dir(OUTPUT_DIR)
+        status_table = status_table or load_status_table()
+        store.save_statuses(status_table.data)
+        print(f"🗄️  已创建书籍数据库 {BOOK_STORE_FILE.name}：从md文件导入 {imported} 行，"
+              f"抓取状态 {sum(1 for status in status_table.data if status)} 个ID")
+    return store
+
+
+def save_status_to_store(status_table: StatusTable):
+    """把抓取状态表同步到书籍数据库（未启用数据库时不做任何事）"""
+    if not book_store_enabled():
+        return
+    with open_book_store(status_table) as store:
+        store.save_statuses(status_table.data)
+
+
+def render_from_spool(books: Iterable[Dict], merge: bool) -> Tuple[List[str], int, Dict[str, int]]:
+    """
+    不使用书籍数据库时生成md文件：按标签写入临时分片文件，再逐个标签生成
+    
+    同一时间只有一个标签的书籍在内存中。合并模式下按下载链接把书籍合并进已有表格
+    （见 md_merge_writer），这些标签的数量更新为合并后的表格行数，其他标签沿用上次 stats.json 中的数量。
+    
+    Args:
+        books: 书籍信息
+        merge: True 时合并进已有md文件，False 时整个重写
+    
+    Returns:
+        (生成的md文件路径列表, 书籍数, 各标签的书籍数量)
+    """
+    generated_files = []
+    seen_ids = set()
+    
+    with TagSpool(JOURNAL_DIR) as spool:
+        for book_data in books:
+            book_id = book_data.get('book_id')
+            if book_id in seen_ids:
+                continue
+            seen_ids.add(book_id)
+            # 分片文件只保留生成md需要的字段；没有下载链接的书不会写入md，只计数
+            row = {
+                'title': book_data.get('title', ''),
+                'author': book_data.get('author', ''),
+                'download_url': book_data.get('download_url', ''),
+            }
+            for tag in book_tags(book_data):
+                if row['download_url']:
+                    spool.add(tag, row)
+                else:
+                    spool.count(tag)
+        tag_counts = dict(sorted(spool.counts.items()))
+        if merge:
+            previous_counts = load_stats().get('tags', {})
+            merged_counts = dict(previous_counts)
+        
+        for tag, count in tag_counts.items():
+            if merge:
+                rows = format_md_rows(spool.read(tag))
+                if not rows:
+                    continue
+                file_path = OUTPUT_DIR / f"{sanitize_filename(tag)}.md"
+                merged_counts[tag] = count = merge_md_file(file_path, rows)
+            else:
+                file_path = generate_md_file(tag, spool.read(tag), OUTPUT_DIR)
+            if file_path:
+                generated_files.append(str(file_path))
+                # 如果文件数量很多，减少输出频率
+                if len(generated_files) <= 50 or len(generated_files) % 50 == 0:
+                    print(f"  ✅ {tag}: {count} 本书 -> {file_path.name}")
+    
+    if merge:
+        print(f"\n✅ 共更新 {len(generated_files)} 个Markdown文件（本次 {len(seen_ids)} 本书，"
+              f"涉及 {len(tag_counts)} 个标签）")
+        tag_counts = dict(sorted(merged_counts.items()))
+    else:
+        print(f"\n✅ 共生成 {len(generated_files)} 个Markdown文件（{len(seen_ids)} 本书，{len(tag_counts)} 个标签）")
+    return generated_files, len(seen_ids), tag_counts
+
+
+def store_item(book_data: Dict) -> Tuple[Dict, List[str]]:
+    """
+    把一本书转换为写入书籍数据库的 (书籍信息, 标签列表)
+    
+    隐私保护：包含敏感域名的链接（下载页面链接）不写入数据库，与 format_md_rows 一致。
+    """
+    if BOOK_SITE_DOMAIN in (book_data.get('download_url') or ''):
+        book_data = dict(book_data, download_url='')
+    return book_data, book_tags(book_data)
+
+
+def render_store_tags(store: BookStore, tags: Iterable[str]) -> List[str]:
+    """
+    从书籍数据库重新生成指定标签的md文件（表格之前的版权声明等内容保留）
+    
+    Args:
+        store: 书籍数据库
+        tags: 标签列表
+    
+    Returns:
+        生成的md文件路径列表
+    """
+    generated_files = []
+    for tag in tags:
+        rows = format_md_rows(store.tag_books(tag))
+        file_path = OUTPUT_DIR / f"{sanitize_filename(tag)}.md"
+        if not rows and not file_path.exists():
+            continue
+        count = write_md_table(file_path, rows)
+        generated_files.append(str(file_path))
+        # 如果文件数量很多，减少输出频率
+        if len(generated_files) <= 50 or len(generated_files) % 50 == 0:
+            print(f"  ✅ {tag}: {count} 本书 -> {file_path.name}")
+    return generated_files
+
+
+def render_from_store(books: Iterable[Dict], render_all: bool) -> Tuple[List[str], int, Dict[str, int]]:
+    """
+    把书籍批量写入书籍数据库，再从数据库重新生成受影响的标签文件
+    
+    受影响的标签是本次书籍的新标签和它们之前所在的标签（书籍换了标签时旧文件也会更新）。
+    
+    Args:
+        books: 书籍信息
+        render_all: 生成数据库中全部标签的md文件（从归档完整重建时）
+    
+    Returns:
+        (生成的md文件路径列表, 书籍数, 各标签的书籍数量)
+    """
+    seen_ids = set()
+    
+    def store_items():
+        for book_data in books:
+            book_id = book_data.get('book_id')
+            if book_id in seen_ids:
+                continue
+            seen_ids.add(book_id)
+            yield store_item(book_data)
+    
+    with open_book_store() as store:
+        written, affected = store.upsert_books(store_items())
+        tags = store.tag_names() if render_all else sorted(affected)
+        generated_files = render_store_tags(store, tags)
+        tag_counts = store.tag_counts()
+    
+    print(f"\n✅ 共更新 {len(generated_files)} 个Markdown文件（本次 {written} 本书写入 {BOOK_STORE_FILE.name}，"
+          f"涉及 {len(tags)} 个标签）")
+    return generated_files, len(seen_ids), tag_counts
+
+
+def generate_outputs(books: Iterable[Dict], stats: Dict, merge: bool = True) -> List[str]:
+    """
+    生成各标签的md文件、统计信息和热门分类索引
+    
+    默认使用书籍数据库（book_store）：书籍先分批写入数据库，再从数据库生成涉及的标签文件，
+    标签数量也从数据库统计。设置 BOOK_STORE=0 时改为按标签分片生成（见 render_from_spool）。
+    同一书籍ID出现多次时以第一条为准。
+    
+    Args:
+        books: 书籍信息（通常是 iter_journal 的返回值）
+        stats: 额外写入 stats.json 的统计信息
+        merge: True 时只更新本次涉及的标签（分批 / 增量抓取），False 时生成全部标签（从归档完整重建）
+    
+    Returns:
+        生成的md文件路径列表
+    """
+    # 生成md文件
+    print(f"\n📝 开始生成Markdown文件...")
+    if book_store_enabled():
+        generated_files, processed, tag_counts = render_from_store(books, render_all=not merge)
+    else:
+        generated_files, processed, tag_counts = render_from_spool(books, merge)
+    
+    # 保存统计信息
+    stats = dict(stats)
+    stats['total_processed'] = processed
+    stats['total_tags'] = len(tag_counts)
+    stats['generated_files'] = len(generated_files)
+    stats['tags'] = tag_counts
+    save_stats(stats)
+    
+    # 生成热门分类索引文件
+    print(f"\n📝 生成热门分类索引文件...")
+    hot_categories_file = generate_hot_categories_index(tag_counts, OUTPUT_DIR)
+    print(f"  ✅ 热门分类索引: {hot_categories_file.name}")
+    
+    return generated_files
+
+
+def rebuild_from_archive(start_id: int, end_id: int, extra_tags: Optional[Dict[int, Set[str]]] = None,
+                         book_ids: Optional[Iterable[int]] = None):
+    """
+    离线重建：从原始页面归档重新解析所有书籍并生成md文件（不发起任何网络请求）
+    
+    解析在进程池中并行执行；不会修改已处理ID和最大书籍ID。
+    
+    Args:
+        start_id: 起始书籍ID
+        end_id: 结束书籍ID
+        extra_tags: 书籍ID -> 标签集合，与详情页中的标签合并（来自标签列表页）
+        book_ids: 只重新解析这些书籍，并合并进已有的md文件（只更新涉及的标签）；
+            不指定时重新解析范围内的全部书籍并生成全部标签
+    """
+    archive = HtmlArchive(HTML_ARCHIVE_DIR)
+    if book_ids is None:
+        items = list(archive.iter_books(start_id, end_id))
+    else:
+        items = [(archive.get(book_id, KIND_DETAIL), archive.get(book_id, KIND_DOWNLOAD))
+                 for book_id in sorted(set(book_ids))
+                 if start_id <= book_id <= end_id and archive.get(book_id, KIND_DETAIL) is not None]
+    print(f"📦 归档目录: {HTML_ARCHIVE_DIR}")
+    print(f"📚 归档中的书籍数量: {len(items)}")
+    if not items:
+        print("⚠️  归档中没有该范围的书籍，请先正常抓取一次")
+        return
+    
+    start_time = time.time()
+    found = 0
+    archive_dir = str(HTML_ARCHIVE_DIR)
+    args = ([archive_dir] * len(items), [d for d, _ in items], [dl for _, dl in items])
+    
+    # 解析结果同样先写入结果日志，再流式生成md文件
+    rebuild_journal = JOURNAL_DIR / f"archive-{start_id}-{end_id}.jsonl"
+    rebuild_journal.unlink(missing_ok=True)
+    
+    parse_pool = create_parse_pool()
+    try:
+        if parse_pool is None:
+            results = map(reparse_archived_book, *args)
+        else:
+            chunksize = max(1, min(256, len(items) // (PARSE_WORKERS * 4)))
+            results = parse_pool.map(reparse_archived_book, *args, chunksize=chunksize)
+        
+        completed = 0
+        with ResultJournal(rebuild_journal) as journal:
+            for book_data in results:
+                completed += 1
+                if book_data:
+                    if extra_tags and int(book_data['book_id']) in extra_tags:
+                        tags = book_data.get('tags') or []
+                        book_data['tags'] = tags + sorted(extra_tags[int(book_data['book_id'])] - set(tags))
+                    journal.append(book_data)
+                    found += 1
+                if completed % 1000 == 0 or completed == len(items):
+                    print(f"📊 进度: {completed}/{len(items)} ({completed*100//len(items)}%) - 已找到 {found} 本书")
+    finally:
+        if parse_pool is not None:
+            parse_pool.shutdown()
+    elapsed_time = time.time() - start_time
+    
+    print(f"\n📊 离线解析完成！")
+    books_per_sec = len(items) / elapsed_time if elapsed_time > 0 else 0
+    print(f"  - 总耗时: {elapsed_time:.2f} 秒（{books_per_sec:.0f} 本/秒）")
+    print(f"  - 成功处理: {found} 本书")
+    
+    generate_outputs(iter_journal([rebuild_journal]), {
+        'source': 'archive' if extra_tags is None else 'tag_listing',
+        'elapsed_time': elapsed_time,
+    }, merge=book_ids is not None)
+    rebuild_journal.unlink()
+
+
+def select_book_ids(status_table: StatusTable, dead_letter: DeadLetterList, start_id: int, end_id: int,
+                    retry_failed: bool = False, recrawl_missing: bool = False,
+                    shard: Optional[Tuple[int, int]] = None) -> List[int]:
+    """
+    根据状态表和死信列表选出需要抓取的ID（用于断点续传）：默认抓取未抓取和出错的ID
+    
+    Args:
+        status_table: 抓取状态表
+        dead_letter: 死信列表
+        start_id: 起始书籍ID
+        end_id: 结束书籍ID
+        retry_failed: 只重新抓取之前失败的ID
+        recrawl_missing: 同时重新抓取之前不存在的ID
+        shard: 交错分片 (序号, 总数)，只选出 ID % 总数 == 序号 的ID
+    
+    Returns:
+        书籍ID列表（升序）
+    """
+    wanted = set(FAILED_STATUSES) if retry_failed else {STATUS_UNSEEN} | FAILED_STATUSES
+    if recrawl_missing:
+        wanted.add(STATUS_MISSING)
+    print(f"📚 范围内书籍数量: {end_id - start_id + 1}")
+    status_counts = status_table.counts(start_id, end_id)
+    if any(status_counts.values()):
+        print(f"📋 状态表: {format_status_counts(status_counts)}")
+    failed_ids = dead_letter.ids(start_id, end_id)
+    if failed_ids:
+        print(f"☠️  死信列表: {len(failed_ids)} 个ID之前用完重试次数仍失败（{DEAD_LETTER_FILE.name}）")
+    book_ids = sorted(set(status_table.select(start_id, end_id, wanted)) | set(failed_ids))
+    if shard:
+        book_ids = [bid for bid in book_ids if bid % shard[1] == shard[0]]
+    print(f"📚 待处理书籍数量: {len(book_ids)}")
+    return book_ids
+
+
+async def prescan_book_ids(book_ids: List[int], status_table: StatusTable,
+                           dead_letter: DeadLetterList) -> List[int]:
+    """
+    存活预扫描：确认不存在的ID直接记为不存在，只返回需要完整抓取的ID
+    
+    上次不存在、这次探测到存在的ID在状态表中恢复为未抓取，之后的运行（包括分片进程）
+    不加 --recrawl-missing 也会抓取它们。探测请求使用预扫描自己的速率预算（见 liveness_scan）。
+    
+    Args:
+        book_ids: 待抓取的书籍ID列表
+        status_table: 抓取状态表
+        dead_letter: 死信列表
+    
+    Returns:
+        需要完整抓取的书籍ID列表（升序）
+    """
+    liveness = LivenessMap(LIVENESS_FILE)
+    headers = dict(REQUEST_HEADERS, **{'Accept-Encoding': 'gzip, deflate'})
+    live_ids, dead_ids = await scan_liveness(book_ids, BASE_URL, liveness, headers=headers)
+    for book_id in dead_ids:
+        status_table.set(book_id, STATUS_MISSING)
+        dead_letter.discard(book_id)
+    for book_id in live_ids:
+        if status_table.get(book_id) == STATUS_MISSING:
+            status_table.set(book_id, STATUS_UNSEEN)
+    return live_ids
+
+
+async def main(start_id: int = 1, end_id: int = 1000, from_archive: bool = False,
+               retry_failed: bool = False, recrawl_missing: bool = False,
+               shard_dir: Optional[Path] = None, shard: Optional[Tuple[int, int]] = None,
+               prescan: bool = False, only_ids: Optional[Iterable[int]] = None,
+               generate: bool = True, time_budget: Optional[TimeBudget] = None):
     """
     主函数
     
     Args:
         start_id: 起始书籍ID（默认：1）
         end_id: 结束书籍ID（默认：1000）
+        from_archive: 从原始页面归档离线重建md文件，不访问网络
+        retry_failed: 只重新抓取之前失败的ID（死信列表和状态表中出错 / 稍后重试的ID）
+        recrawl_missing: 同时重新抓取上次不存在的ID
+        shard_dir: 分片目录；指定时只抓取不生成md文件，状态表、死信列表和结果日志都写在该目录中，
+            由 sharded_sync 合并
+        shard: (分片序号, 分片总数)，只处理 ID % 分片总数 == 分片序号 的书籍（交错分片）
+        prescan: 完整抓取前先做存活预扫描，只抓取存在的ID（分片进程不做预扫描，
+            由 sharded_sync 在启动分片前统一完成）
+        only_ids: 只抓取这些ID（不论状态表中的状态，用于重新抓取有改动的书籍）
+        generate: 是否生成md文件；False 时只抓取（页面已写入归档，由调用方从归档生成）
+        time_budget: 时间预算；剩余时间不够时停止调度新ID，照常生成已抓取书籍的md文件，
+            没有调度的ID留给下次运行（分片进程只停止调度，实测值由 sharded_sync 保存）
     """
     print("=" * 80)
     print(f"🚀 开始批量处理书籍（ID: {start_id}-{end_id}）")
@@ -332,75 +1203,164 @@ async def main(start_id: int = 1, end_id: int = 1000):
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     print(f"📁 输出目录: {OUTPUT_DIR}")
     
-    # 生成书籍ID列表
-    book_ids = list(range(start_id, end_id + 1))
-    print(f"📚 待处理书籍数量: {len(book_ids)}")
+    if from_archive:
+        rebuild_from_archive(start_id, end_id)
+        print(f"\n📈 统计信息已保存: {STATS_FILE}")
+        print("=" * 80)
+        print("✅ 离线重建完成！")
+        print("=" * 80)
+        return
     
-    # 加载已处理的ID（用于断点续传）
-    processed_ids = load_processed_ids()
-    if processed_ids:
-        print(f"📋 已处理ID数量: {len(processed_ids)}")
-        book_ids = [bid for bid in book_ids if bid not in processed_ids]
+    # 本次要生成md文件的结果日志：除了本范围的日志，还包括其他范围中断后留下的日志
+    # （下次运行的范围可能不同，例如最大ID变了或分批方式变了），它们的书在状态表中已记为抓取过
+    journal_files = []
+    if shard_dir is None:
+        status_table = load_status_table()
+        dead_letter = DeadLetterList(DEAD_LETTER_FILE)
+        journal_file = journal_path(start_id, end_id)
+        if generate:
+            journal_files = sorted(path for path in JOURNAL_DIR.glob("books-*.jsonl") if path != journal_file)
+            if journal_files:
+                print(f"📒 发现 {len(journal_files)} 个其他范围中断后留下的结果日志，一并生成md文件")
+    else:
+        # 分片第一次运行时从主状态表和死信列表复制一份，之后只更新分片自己的副本
+        shard_dir.mkdir(parents=True, exist_ok=True)
+        for source in (STATUS_FILE, DEAD_LETTER_FILE):
+            target = shard_dir / source.name
+            if not target.exists() and source.exists():
+                shutil.copyfile(source, target)
+        status_table = StatusTable(shard_dir / STATUS_FILE.name)
+        dead_letter = DeadLetterList(shard_dir / DEAD_LETTER_FILE.name)
+        journal_file = shard_dir / SHARD_JOURNAL_NAME
+        print(f"🧱 分片目录: {shard_dir}" + (f"（交错分片 {shard[0]}/{shard[1]}）" if shard else ""))
+    
+    if only_ids is not None:
+        book_ids = sorted(bid for bid in set(only_ids) if start_id <= bid <= end_id)
+        print(f"📚 指定重新抓取的书籍数量: {len(book_ids)}")
+    else:
+        book_ids = select_book_ids(status_table, dead_letter, start_id, end_id,
+                                   retry_failed, recrawl_missing, shard)
+    
+    journal_files.append(journal_file)
+    
+    # 上次运行中断前已写入结果日志的书籍不再重复抓取
+    journaled_statuses = journal_statuses(journal_files)
+    journaled_ids = set(journaled_statuses)
+    if journaled_ids:
+        print(f"📒 结果日志中已有 {len(journaled_ids)} 本书（上次运行中断前抓取），跳过")
+        book_ids = [bid for bid in book_ids if bid not in journaled_ids]
         print(f"📚 剩余待处理: {len(book_ids)}")
+        # 中断时状态表可能还没落盘，以结果日志中记录的最终状态为准补记
+        restore_journaled_statuses(journaled_statuses, status_table, dead_letter)
     
-    if not book_ids:
-        print("✅ 所有书籍已处理完成！")
-        return
+    if prescan and book_ids and shard_dir is None:
+        book_ids = await prescan_book_ids(book_ids, status_table, dead_letter)
+        status_table.checkpoint()
+        dead_letter.save()
+        save_status_to_store(status_table)
+    
+    if time_budget is not None and book_ids and time_budget.should_stop():
+        time_budget.stop(book_ids[0])
+        print(f"⏰ 剩余时间不够开始抓取（{time_budget.summary()}），下次运行从ID {book_ids[0]} 继续")
+        book_ids = []
+    
+    if not book_ids and not journaled_ids:
+        if time_budget is None or not time_budget.stopped:
+            print("✅ 所有书籍已处理完成！")
+            return
+        # 分片进程继续往下走，把续传位置写入分片统计信息
+        if shard_dir is None:
+            time_budget.save()
+            return
     
     # 开始处理
     start_time = time.time()
-    books_by_tag = await batch_process_books(book_ids)
+    rate_limiter = HostRateLimiter()
+    http_cache = HttpCache(HTTP_CACHE_DIR) if http_cache_enabled() else None
+    # 每个分片进程写入自己的归档分段文件和索引，避免多个进程追加同一个文件
+    archive_writer = shard_dir.name if shard_dir is not None else None
+    html_archive = HtmlArchive(HTML_ARCHIVE_DIR, archive_writer) if html_archive_enabled() else None
+    journal = ResultJournal(journal_file)
+    # 指标文件与 stats.json 同目录；分片进程写在分片目录中，由 sharded_sync 合并
+    metrics = CrawlMetrics((shard_dir or OUTPUT_DIR) if metrics_enabled() else None)
+    try:
+        found = await batch_process_books(book_ids, rate_limiter, journal, status_table,
+                                          dead_letter, http_cache, html_archive, metrics, time_budget)
+    finally:
+        journal.close()
+        status_table.checkpoint()
+        dead_letter.save()
+        if html_archive:
+            html_archive.close()
     elapsed_time = time.time() - start_time
     
-    # 统计信息
-    total_books = sum(len(books) for books in books_by_tag.values())
-    total_tags = len(books_by_tag)
-    
     print(f"\n📊 处理完成！")
     print(f"  - 总耗时: {elapsed_time:.2f} 秒")
-    print(f"  - 成功处理: {total_books} 本书")
-    print(f"  - 标签数量: {total_tags} 个")
+    print(f"  - 成功处理: {found} 本书" + (f"（另有 {len(journaled_ids)} 本来自上次中断前）" if journaled_ids else ""))
+    for host, host_stats in rate_limiter.stats().items():
+        print(f"  - 请求速率 {host}: 平均 {host_stats['average_rate']}/s，"
+              f"最终上限 {host_stats['rate_limit']}/s，限流/出错 {host_stats['throttled']} 次")
+    if http_cache:
+        cache_stats = http_cache.stats()
+        print(f"  - 页面缓存: 直接命中 {cache_stats['fresh_hits']}，304复用 {cache_stats['revalidated']}，"
+              f"重新下载 {cache_stats['misses']}，节省 {cache_stats['bytes_saved'] / 1024 / 1024:.1f} MB")
+    if html_archive:
+        print(f"  - 页面归档: 新增 {html_archive.appended} 个页面 -> {HTML_ARCHIVE_DIR}")
+    print(f"  - 各阶段耗时: {metrics.summary()}")
+    failed_ids = dead_letter.ids(start_id, end_id)
+    if failed_ids:
+        print(f"  - ☠️  {len(failed_ids)} 个ID用完重试次数仍失败，已记入 {DEAD_LETTER_FILE.name}，"
+              f"之后可用 --retry-failed 重新抓取")
+    status_counts = status_table.counts(start_id, end_id)
+    print(f"  - 抓取状态: {format_status_counts(status_counts)}")
+    if time_budget is not None and time_budget.stopped:
+        # 只有已调度的ID算作已处理（没有调度的ID仍是未抓取，不计入最大书籍ID）
+        book_ids = [bid for bid in book_ids if status_table.get(bid) != STATUS_UNSEEN]
+        print(f"  - ⏰ 时间预算: 在ID {time_budget.resume_from_id} 停止调度，下次运行从这里继续")
     
-    # 生成md文件
-    print(f"\n📝 开始生成Markdown文件...")
-    generated_files = []
-    
-    for tag, books in sorted(books_by_tag.items()):
-        file_path = generate_md_file(tag, books, OUTPUT_DIR)
-        if file_path:
-            generated_files.append(str(file_path))
-            # 如果文件数量很多，减少输出频率
-            if len(generated_files) <= 50 or len(generated_files) % 50 == 0:
-                print(f"  ✅ {tag}: {len(books)} 本书 -> {file_path.name}")
-    
-    print(f"\n✅ 共生成 {len(generated_files)} 个Markdown文件")
+    if shard_dir is not None:
+        # 分片只负责抓取，结果日志保留给合并步骤（状态由合并步骤写入书籍数据库）
+        with open(shard_dir / SHARD_STATS_NAME, 'w', encoding='utf-8') as f:
+            json.dump({
+                'found': found + len(journaled_ids),
+                'elapsed_time': elapsed_time,
+                'rate_limits': rate_limiter.stats(),
+                'http_cache': http_cache.stats() if http_cache else None,
+                'resume_from_id': time_budget.resume_from_id if time_budget is not None else None,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 分片抓取完成，等待合并: {shard_dir}")
+        return
     
-    # 保存统计信息
-    stats = {
-        'total_processed': total_books,
-        'total_tags': total_tags,
-        'generated_files': len(generated_files),
-        'elapsed_time': elapsed_time,
-        'tags': {tag: len(books) for tag, books in sorted(books_by_tag.items())}
-    }
-    save_stats(stats)
+    save_status_to_store(status_table)
+    if generate:
+        render_started = time.process_time()
+        render_wall_started = time.perf_counter()
+        generate_outputs(iter_journal(journal_files), {
+            'elapsed_time': elapsed_time,
+            'crawl_status': status_counts,
+            'dead_letter': len(dead_letter.entries),
+            'rate_limits': rate_limiter.stats(),
+            'http_cache': http_cache.stats() if http_cache else None,
+        })
+        metrics.inc('crawl_cpu_seconds_total', time.process_time() - render_started, stage='render')
+        metrics.write()
+        if time_budget is not None:
+            time_budget.record_render(time.perf_counter() - render_wall_started, found + len(journaled_ids))
     
-    # 保存已处理的ID
-    all_processed = processed_ids | set(book_ids)
-    save_processed_ids(all_processed)
+    # md文件已生成（或页面已在归档中）、抓取状态已落盘，结果日志不再需要
+    for path in journal_files:
+        path.unlink(missing_ok=True)
     
-    # 保存最大书籍ID（用于增量更新）
-    if book_ids:
-        max_id = max(book_ids)
+    # 保存最大书籍ID（用于增量更新；只重试部分ID时不会让最大ID变小）
+    if book_ids or journaled_ids:
+        max_id = max(set(book_ids) | journaled_ids | {load_max_book_id()})
         save_max_book_id(max_id)
         print(f"\n📊 最大书籍ID: {max_id}（已保存，用于增量更新）")
+    if time_budget is not None:
+        time_budget.save()
     
-    # 生成热门分类索引文件
-    print(f"\n📝 生成热门分类索引文件...")
-    hot_categories_file = generate_hot_categories_index(books_by_tag, OUTPUT_DIR)
-    print(f"  ✅ 热门分类索引: {hot_categories_file.name}")
-    
-    print(f"\n📈 统计信息已保存: {STATS_FILE}")
+    if generate:
+        print(f"\n📈 统计信息已保存: {STATS_FILE}")
     print("=" * 80)
     print("✅ 测试完成！")
     print("=" * 80)
@@ -411,6 +1371,40 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='批量处理书籍并生成md文件')
     parser.add_argument('--start-id', type=int, default=1, help='起始书籍ID（默认：1）')
     parser.add_argument('--end-id', type=int, default=1000, help='结束书籍ID（默认：1000）')
+    parser.add_argument('--from-archive', action='store_true', help='从原始页面归档离线重建md文件（不访问网络）')
+    parser.add_argument('--parser', choices=sorted(HTML_PARSER_BACKENDS),
+                        help='HTML解析器（默认读取环境变量 HTML_PARSER，未设置时为 html.parser）')
+    parser.add_argument('--scoped-parse', action='store_true',
+                        help='详情页只构建需要的区域（默认构建完整文档树；先用 bench_parser.py --archive 确认输出一致）')
+    parser.add_argument('--retry-failed', '--retry-errors', dest='retry_failed', action='store_true',
+                        help='只重新抓取之前失败的ID（死信列表 dead_letter.jsonl）')
+    parser.add_argument('--recrawl-missing', action='store_true', help='重新抓取上次不存在的ID')
+    parser.add_argument('--prescan', action='store_true',
+                        help='先用 HEAD 请求预扫描ID是否存在，只完整抓取存在的ID（结果保存在 liveness.bin）')
+    parser.add_argument('--shard-dir', type=Path, help='分片目录（由 sharded_sync 调用：只抓取，不生成md文件）')
+    parser.add_argument('--shard', help='交错分片，格式为 序号/总数，例如 0/4')
+    add_time_budget_arguments(parser)
+    add_profile_arguments(parser, sample_help='只抓取从 --start-id 开始的前 N 个ID（不同运行的剖析结果可以直接比较）')
     args = parser.parse_args()
     
-    asyncio.run(main(args.start_id, args.end_id))
+    if args.profile_sample:
+        args.end_id = args.start_id + args.profile_sample - 1
+    if args.profile:
+        # cProfile 只剖析当前进程：在事件循环线程内解析，解析耗时才会出现在报告中
+        PARSE_WORKERS = 0
+    
+    # 解析进程池在 main 中创建，子进程会继承这里设置的环境变量
+    if args.parser:
+        os.environ['HTML_PARSER'] = args.parser
+    if args.scoped_parse:
+        os.environ['PARSE_SCOPE'] = 'regions'
+    print(f"🧩 HTML解析器: {get_parser_backend()}（{'完整文档' if not parse_scope_enabled() else '仅需要的区域'}）")
+    
+    shard = tuple(int(part) for part in args.shard.split('/')) if args.shard else None
+    deadline = deadline_from_args(args)
+    time_budget = TimeBudget(deadline, TIME_BUDGET_FILE) if deadline else None
+    run_profiled('test_batch_sync', lambda: asyncio.run(main(
+        args.start_id, args.end_id, from_archive=args.from_archive,
+        retry_failed=args.retry_failed, recrawl_missing=args.recrawl_missing,
+        shard_dir=args.shard_dir, shard=shard, prescan=args.prescan,
+        time_budget=time_budget)), args)
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""书籍数据库：标签列表页的标签归属追加到已有书籍"""
+
+from book_store import BookStore
+
+
+def book(book_id, title):
+    return {'book_id': str(book_id), 'title': title, 'author': '作者',
+            'download_url': f"https://pan.example/f/{book_id}?pwd=1234"}
+
+
+def test_add_book_tags_only_touches_new_memberships(tmp_path):
+    with BookStore(tmp_path / "books.sqlite") as store:
+        store.upsert_books([(book(1, '甲'), ['小说']), (book(2, '乙'), ['历史']), (book(3, '丙'), ['历史'])])
+
+        affected, unknown = store.add_book_tags({1: {'小说', '文学'}, 3: {'小说'}, 9: {'小说'}})
+
+        assert affected == {'文学', '小说'}
+        assert unknown == {9}
+        # 新追加的书排在标签末尾，已有的标签和书籍信息不变
+        assert [row['title'] for row in store.tag_books('小说')] == ['甲', '丙']
+        assert [row['title'] for row in store.tag_books('历史')] == ['乙', '丙']
+        assert store.tag_counts() == {'历史': 2, '小说': 2, '文学': 1}
+
+        assert store.add_book_tags({1: {'小说'}}) == (set(), set())
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""查找最大书籍ID：ID稀疏、请求偶尔出错时仍找到真正的最大ID"""
+
+import os
+import random
+import threading
+
+import pytest
+
+# find_max_book_id 在导入时读取站点地址，测试中的请求都由 fake_site 应答
+os.environ.setdefault("BOOK_SITE_DOMAIN", "http://book-site.test")
+
+import find_max_book_id  # noqa: E402
+from find_max_book_id import check_book_ids_exist, find_max_book_id_by_galloping  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+
+
+def fake_site(monkeypatch, live_ids, error_rate=0.0, seed=0):
+    """用内存中的ID集合应答 HEAD 请求，按 error_rate 随机返回连接错误或 503"""
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def head(url, **kwargs):
+        book_id = int(url.rsplit('-', 1)[1].split('.')[0])
+        with lock:
+            roll = rng.random()
+        if roll < error_rate / 2:
+            raise find_max_book_id.requests.ConnectionError("reset")
+        if roll < error_rate:
+            return FakeResponse(503)
+        return FakeResponse(200 if book_id in live_ids else 404)
+
+    monkeypatch.setattr(find_max_book_id.requests, 'head', head)
+    monkeypatch.setattr(find_max_book_id.time, 'sleep', lambda seconds: None)
+
+
+def sparse_ids(true_max, density, seed):
+    rng = random.Random(seed)
+    return {book_id for book_id in range(1, true_max) if rng.random() < density} | {true_max}
+
+
+def test_errors_are_unknown_not_missing(monkeypatch):
+    calls = []
+
+    def head(url, **kwargs):
+        calls.append(url)
+        # 每个ID第一次请求出错，重试时正常应答
+        if calls.count(url) == 1:
+            raise find_max_book_id.requests.Timeout("timeout")
+        return FakeResponse(200 if url.endswith('-2.html') else 404)
+
+    monkeypatch.setattr(find_max_book_id.requests, 'head', head)
+    monkeypatch.setattr(find_max_book_id.time, 'sleep', lambda seconds: None)
+    assert check_book_ids_exist([1, 2, 3]) == {1: False, 2: True, 3: False}
+
+
+def test_persistent_errors_stay_unknown(monkeypatch):
+    monkeypatch.setattr(find_max_book_id.requests, 'head', lambda url, **kwargs: FakeResponse(429))
+    monkeypatch.setattr(find_max_book_id.time, 'sleep', lambda seconds: None)
+    assert check_book_ids_exist([5]) == {5: None}
+
+
+@pytest.mark.parametrize('density', [0.3, 0.45, 0.6])
+@pytest.mark.parametrize('error_rate', [0.0, 0.1])
+def test_sparse_ids_find_true_max(monkeypatch, density, error_rate):
+    for seed in range(5):
+        true_max = 9000 + seed * 37
+        fake_site(monkeypatch, sparse_ids(true_max, density, seed), error_rate, seed)
+        assert find_max_book_id_by_galloping(known_max=1000) == true_max
+
+
+def test_respects_limit(monkeypatch):
+    fake_site(monkeypatch, set(range(1, 5001)))
+    assert find_max_book_id_by_galloping(known_max=0, limit=3000) == 3000
+
+
+def test_no_new_books_returns_known_max(monkeypatch):
+    fake_site(monkeypatch, set(range(1, 101)))
+    assert find_max_book_id_by_galloping(known_max=100) == 100
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""列表页增量游标：只记入重新抓取成功的书籍的指纹"""
+
+from listing_delta import ListingCursor
+
+
+def test_commit_keeps_failed_books_unseen(tmp_path):
+    path = tmp_path / "listing_cursor.json"
+    cursor = ListingCursor(path)
+    cursor.stage('latest', [(3, 'fp-3'), (2, 'fp-2'), (1, 'fp-1')])
+    cursor.stage('tag:历史', [(2, 'fp-2-tag')])
+    # 暂存的指纹在提交前不算见过
+    assert cursor.seen('latest') == set()
+
+    # ID 2 重新抓取失败
+    assert cursor.commit({1, 3}) == 2
+    cursor.save()
+
+    reloaded = ListingCursor(path)
+    assert reloaded.sources['latest']['seen'] == ['fp-3', 'fp-1']
+    assert 'tag:历史' not in reloaded.sources
+    assert reloaded.pending == {}
+
+
+def test_commit_puts_new_fingerprints_first(tmp_path):
+    cursor = ListingCursor(tmp_path / "listing_cursor.json")
+    cursor.update('latest', ['fp-old-1', 'fp-old-2'])
+    cursor.stage('latest', [(5, 'fp-5'), (1, 'fp-old-1')])
+    assert cursor.commit({1, 5}) == 0
+    assert cursor.sources['latest']['seen'] == ['fp-5', 'fp-old-1', 'fp-old-2']
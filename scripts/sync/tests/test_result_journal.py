@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""结果日志：写入、读回和续传时恢复状态"""
+
+from result_journal import (
+    ResultJournal,
+    iter_journal,
+    journal_statuses,
+    merge_journal_runs,
+    restore_journaled_statuses,
+    sort_journal_runs,
+)
+from retry_scheduler import DeadLetterList
+from status_table import (
+    STATUS_ERROR,
+    STATUS_NO_DOWNLOAD,
+    STATUS_OK,
+    STATUS_RETRY_AFTER,
+    STATUS_UNSEEN,
+    StatusTable,
+)
+
+
+def write_journal(path, records):
+    with ResultJournal(path) as journal:
+        for record in records:
+            journal.append(record)
+
+
+def test_journal_round_trip_skips_broken_lines(tmp_path):
+    path = tmp_path / "books-1-10.jsonl"
+    write_journal(path, [{'book_id': '1', 'title': '甲'}, {'book_id': '2', 'title': '乙'}])
+    # 被杀时最后一行可能只写了一半
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"book_id": "3", "ti')
+
+    assert [record['title'] for record in iter_journal([path, tmp_path / "missing.jsonl"])] == ['甲', '乙']
+
+
+def test_journal_statuses_reads_all_files(tmp_path):
+    first = tmp_path / "books-1-10.jsonl"
+    second = tmp_path / "books-11-20.jsonl"
+    # 旧版日志没有状态字段，按成功处理
+    write_journal(first, [{'book_id': '1'}, {'book_id': '2', 'crawl_status': 'error'}])
+    write_journal(second, [{'book_id': '12', 'crawl_status': 'no_download'}, {'title': '没有ID'}])
+
+    assert journal_statuses([first, second]) == {1: 'ok', 2: 'error', 12: 'no_download'}
+
+
+def test_resume_restores_mixed_statuses(tmp_path):
+    journal_file = tmp_path / "books-1-10.jsonl"
+    write_journal(journal_file, [
+        {'book_id': '1', 'crawl_status': 'ok'},
+        {'book_id': '2', 'crawl_status': 'error'},
+        {'book_id': '3', 'crawl_status': 'no_download'},
+        {'book_id': '4', 'crawl_status': 'retry_after'},
+        {'book_id': '5'},
+    ])
+    # 中断前状态表还没落盘；ID 1 上次运行失败过，ID 4 已在死信列表中
+    status_table = StatusTable(tmp_path / "crawl_status.bin")
+    dead_letter = DeadLetterList(tmp_path / "dead_letter.jsonl")
+    dead_letter.add(1, 'error', 4, '超时')
+    dead_letter.add(4, 'retry_after', 4, 'HTTP 429')
+
+    restore_journaled_statuses(journal_statuses([journal_file]), status_table, dead_letter)
+
+    assert [status_table.get(book_id) for book_id in range(1, 7)] == [
+        STATUS_OK, STATUS_ERROR, STATUS_NO_DOWNLOAD, STATUS_RETRY_AFTER, STATUS_OK, STATUS_UNSEEN]
+    assert dead_letter.ids() == [2, 4]
+    assert dead_letter.entries[2]['attempts'] == 0
+    # 已在死信列表中的记录保持不变
+    assert dead_letter.entries[4]['error'] == 'HTTP 429'
+
+
+def test_sorted_runs_merge_in_book_id_order(tmp_path):
+    shard_a = tmp_path / "a.jsonl"
+    shard_b = tmp_path / "b.jsonl"
+    write_journal(shard_a, [{'book_id': str(book_id)} for book_id in (9, 3, 7, 1, 5)])
+    write_journal(shard_b, [{'book_id': str(book_id)} for book_id in (10, 2, 8, 4, 6)])
+
+    runs_a = sort_journal_runs(shard_a, tmp_path / "runs-a", run_records=2)
+    runs_b = sort_journal_runs(shard_b, tmp_path / "runs-b", run_records=2)
+    assert len(runs_a) == 3 and len(runs_b) == 3
+    assert [int(record['book_id']) for record in merge_journal_runs(runs_a + runs_b)] == list(range(1, 11))
+
+    # 重新排序时先清掉上次留下的分段
+    assert sort_journal_runs(shard_a, tmp_path / "runs-a", run_records=10) == [tmp_path / "runs-a" / "run-00000.jsonl"]
+    assert sorted(path.name for path in (tmp_path / "runs-a").iterdir()) == ["run-00000.jsonl"]
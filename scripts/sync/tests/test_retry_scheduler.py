@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""失败重试：退避时间、重试次数和死信列表"""
+
+import json
+
+import pytest
+
+import retry_scheduler
+from retry_scheduler import DeadLetterList, backoff_delay, parse_retry_after, should_retry
+
+
+@pytest.fixture
+def fixed_retry_config(monkeypatch):
+    monkeypatch.setattr(retry_scheduler, 'RETRY_BASE_DELAY', 2.0)
+    monkeypatch.setattr(retry_scheduler, 'RETRY_MAX_DELAY', 60.0)
+    monkeypatch.setattr(retry_scheduler, 'RETRY_MAX_ATTEMPTS', 4)
+
+
+@pytest.mark.parametrize('jitter', [0.5, 1.0, 1.5])
+def test_backoff_delay_doubles_within_jitter(fixed_retry_config, monkeypatch, jitter):
+    monkeypatch.setattr(retry_scheduler.random, 'uniform', lambda low, high: jitter)
+    assert backoff_delay(1) == pytest.approx(2.0 * jitter)
+    assert backoff_delay(2) == pytest.approx(4.0 * jitter)
+    assert backoff_delay(3) == pytest.approx(8.0 * jitter)
+    # 基础值不超过 RETRY_MAX_DELAY，再乘随机系数
+    assert backoff_delay(20) == pytest.approx(60.0 * jitter)
+
+
+def test_backoff_delay_honours_retry_after(fixed_retry_config, monkeypatch):
+    monkeypatch.setattr(retry_scheduler.random, 'uniform', lambda low, high: 0.5)
+    assert backoff_delay(1, retry_after=30) == 30
+    # Retry-After 比退避时间短时按退避时间，过长时按上限
+    assert backoff_delay(3, retry_after=1) == pytest.approx(4.0)
+    assert backoff_delay(1, retry_after=3600) == 60.0
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('120') == 120.0
+    assert parse_retry_after(' 5 ') == 5.0
+    assert parse_retry_after('-3') == 0.0
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') is None
+    assert parse_retry_after(None) is None
+
+
+def test_should_retry_until_attempts_run_out(fixed_retry_config):
+    assert [should_retry(attempts) for attempts in range(1, 6)] == [True, True, True, False, False]
+    # 时间预算用完后不再重试，直接记入死信列表
+    assert not should_retry(1, stopped=True)
+
+
+def test_dead_letter_round_trip(tmp_path):
+    path = tmp_path / "dead_letter.jsonl"
+    dead_letter = DeadLetterList(path)
+    dead_letter.add(7, 'error', 4, '超时')
+    dead_letter.add(3, 'retry_after', 4, 'HTTP 503')
+    dead_letter.save()
+    assert not dead_letter.dirty
+    assert [json.loads(line)['book_id'] for line in path.read_text(encoding='utf-8').splitlines()] == [3, 7]
+
+    reloaded = DeadLetterList(path)
+    assert reloaded.ids() == [3, 7]
+    assert reloaded.ids(4, 10) == [7]
+    assert reloaded.entries[7]['error'] == '超时'
+
+    # 再次失败时累计运行次数，成功后移除
+    reloaded.add(7, 'error', 4, '连接错误')
+    reloaded.discard(3)
+    reloaded.save()
+    final = DeadLetterList(path)
+    assert final.ids() == [7]
+    assert final.entries[7]['runs'] == 2
+    assert final.entries[7]['error'] == '连接错误'
+
+
+def test_dead_letter_save_skips_clean_list(tmp_path):
+    path = tmp_path / "dead_letter.jsonl"
+    dead_letter = DeadLetterList(path)
+    dead_letter.discard(1)
+    dead_letter.save()
+    assert not path.exists()
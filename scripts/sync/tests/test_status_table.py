@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""抓取状态表：读写、范围选择和落盘"""
+
+import status_table
+from status_table import (
+    DONE_STATUSES,
+    FAILED_STATUSES,
+    STATUS_ERROR,
+    STATUS_MISSING,
+    STATUS_OK,
+    STATUS_RETRY_AFTER,
+    STATUS_UNSEEN,
+    StatusTable,
+)
+
+
+def test_get_set_and_auto_extend(tmp_path):
+    table = StatusTable(tmp_path / "crawl_status.bin")
+    assert table.get(10) == STATUS_UNSEEN
+    assert not table.dirty
+
+    table.set(10, STATUS_OK)
+    assert len(table.data) == 11
+    assert table.get(10) == STATUS_OK
+    assert table.get(9) == STATUS_UNSEEN
+    assert table.get(1000) == STATUS_UNSEEN
+    assert table.dirty
+
+
+def test_set_same_status_does_not_mark_dirty(tmp_path):
+    table = StatusTable(tmp_path / "crawl_status.bin")
+    table.set(3, STATUS_MISSING)
+    table.checkpoint()
+    table.set(3, STATUS_MISSING)
+    assert not table.dirty
+
+
+def test_select_and_counts(tmp_path):
+    table = StatusTable(tmp_path / "crawl_status.bin")
+    table.set(2, STATUS_OK)
+    table.set(3, STATUS_ERROR)
+    table.set(5, STATUS_RETRY_AFTER)
+    table.set(6, STATUS_MISSING)
+
+    # 超出数组范围的ID按未抓取选出
+    assert table.select(1, 8, {STATUS_UNSEEN} | FAILED_STATUSES) == [1, 3, 4, 5, 7, 8]
+    assert table.select(1, 8, DONE_STATUSES) == [2, 6]
+    assert table.counts(1, 5) == {'ok': 1, 'missing': 0, 'no_download': 0, 'error': 1, 'retry_after': 1}
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = tmp_path / "state" / "crawl_status.bin"
+    table = StatusTable(path)
+    table.set(1, STATUS_OK)
+    table.set(4, STATUS_ERROR)
+    table.checkpoint()
+
+    assert not table.dirty
+    assert path.read_bytes() == bytes([STATUS_UNSEEN, STATUS_OK, STATUS_UNSEEN, STATUS_UNSEEN, STATUS_ERROR])
+    assert not path.with_name(path.name + '.tmp').exists()
+
+    reloaded = StatusTable(path)
+    assert reloaded.get(1) == STATUS_OK
+    assert reloaded.get(4) == STATUS_ERROR
+    assert reloaded.select(1, 4, FAILED_STATUSES) == [4]
+
+
+def test_checkpoint_due_needs_changes_and_interval(tmp_path, monkeypatch):
+    table = StatusTable(tmp_path / "crawl_status.bin")
+    monkeypatch.setattr(status_table, 'CHECKPOINT_INTERVAL', 0.0)
+    assert not table.checkpoint_due()
+
+    table.set(1, STATUS_OK)
+    assert table.checkpoint_due()
+
+    monkeypatch.setattr(status_table, 'CHECKPOINT_INTERVAL', 3600.0)
+    assert not table.checkpoint_due()
+
+    monkeypatch.setattr(status_table, 'CHECKPOINT_INTERVAL', 0.0)
+    table.checkpoint()
+    assert not table.checkpoint_due()
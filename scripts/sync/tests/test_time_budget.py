@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""时间预算：停止调度的判断、续传位置和实测值的保存"""
+
+import json
+import time
+from datetime import datetime
+
+import pytest
+
+import time_budget
+from time_budget import TimeBudget, load_state, parse_deadline, save_state
+
+
+@pytest.fixture
+def no_safety(monkeypatch):
+    monkeypatch.setattr(time_budget, 'TIME_BUDGET_SAFETY', 0.0)
+
+
+def test_parse_deadline():
+    assert parse_deadline('1700000000') == 1700000000.0
+    assert parse_deadline('2024-01-01T08:00') == datetime(2024, 1, 1, 8, 0).timestamp()
+    with pytest.raises(ValueError):
+        parse_deadline('明天')
+
+
+def test_should_stop_counts_in_flight_and_render_time(tmp_path, no_safety):
+    budget = TimeBudget(time.time() + 100, tmp_path / "time_budget.json")
+    budget.saved_ids_per_second = 2.0
+    budget.render_seconds_per_book = 0.1
+    # 生成md文件：30 秒固定开销 + 每本 0.1 秒
+    assert not budget.should_stop(in_flight=0, books=0)
+    assert not budget.should_stop(in_flight=20, books=300)
+    # 在途 100 个ID按 2 ID/秒需要 50 秒，加上生成 300 本书的 60 秒，超出剩余时间
+    assert budget.should_stop(in_flight=100, books=300)
+
+
+def test_should_stop_when_deadline_passed(tmp_path, no_safety):
+    budget = TimeBudget(time.time() - 1, tmp_path / "time_budget.json")
+    assert budget.should_stop()
+
+
+def test_stop_keeps_earliest_resume_id(tmp_path):
+    budget = TimeBudget(time.time() + 100, tmp_path / "time_budget.json")
+    assert not budget.stopped and budget.resume_from_id is None
+
+    budget.stop(500)
+    budget.stop(700)
+    budget.stop(None)
+    assert budget.stopped
+    assert budget.resume_from_id == 500
+    budget.stop(420)
+    assert budget.resume_from_id == 420
+
+
+def test_save_records_resume_position_only_when_stopped(tmp_path):
+    state_file = tmp_path / "time_budget.json"
+    save_state(state_file, resume_from_id=123, ids_per_second=4.0)
+
+    budget = TimeBudget(time.time() + 100, state_file)
+    assert budget.saved_ids_per_second == 4.0
+    budget.record_render(12.0, 600)
+    budget.save()
+    state = load_state(state_file)
+    # 没有停止调度时保留上次的续传位置（由调用方在从该位置继续后清除）
+    assert state['resume_from_id'] == 123
+    assert state['render_seconds_per_book'] == 0.02
+
+    budget.stop(900)
+    budget.save()
+    assert load_state(state_file)['resume_from_id'] == 900
+
+    save_state(state_file, resume_from_id=None)
+    assert 'resume_from_id' not in load_state(state_file)
+
+
+def test_save_measures_throughput_after_enough_samples(tmp_path, monkeypatch):
+    state_file = tmp_path / "time_budget.json"
+    clock = [1000.0]
+    monkeypatch.setattr(time_budget.time, 'monotonic', lambda: clock[0])
+    budget = TimeBudget(time.time() + 100, state_file)
+    for _ in range(time_budget.MIN_THROUGHPUT_SAMPLES):
+        clock[0] += 0.25
+        budget.record_completed()
+    clock[0] += 0.25
+
+    assert budget.ids_per_second() == pytest.approx(4.0)
+    budget.save()
+    assert load_state(state_file)['ids_per_second'] == pytest.approx(4.0)
+
+
+def test_load_state_ignores_broken_file(tmp_path):
+    state_file = tmp_path / "time_budget.json"
+    state_file.write_text('{"resume_from_id": 1', encoding='utf-8')
+    assert load_state(state_file) == {}
+    assert load_state(tmp_path / "missing.json") == {}
+
+    save_state(state_file, resume_from_id=7)
+    assert json.loads(state_file.read_text(encoding='utf-8'))['resume_from_id'] == 7
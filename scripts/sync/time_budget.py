@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+时间预算：在截止时间之前停止调度新ID，留出完成在途任务和生成md文件的时间
+
+全量同步在 GitHub Actions 中有 600 分钟的超时，超时时进程被直接杀掉，可能停在生成md文件的中途。
+指定 --time-budget / --deadline 后，抓取流水线在调度每个新ID之前检查剩余时间：
+
+    剩余时间 < 在途书籍数 / 实测吞吐量 + 生成md文件的预计耗时 + 安全余量
+
+满足时停止调度，已在流水线中的书籍照常完成（不再安排新的重试，失败的记入死信列表），
+然后照常生成md文件、落盘状态表。没有调度的ID在状态表中仍是未抓取，下次运行从这里继续。
+
+吞吐量按最近 THROUGHPUT_WINDOW 秒内完成的ID数实测；刚开始还没有足够样本时使用上次运行
+保存的吞吐量，都没有时按 0.5 秒/ID 估计。生成md文件的耗时按上次实测的每本书耗时估计。
+实测值和续传位置保存在输出目录的 time_budget.json 中（随md目录一起提交，下次运行读取）。
+
+配置（环境变量）：
+    TIME_BUDGET_SAFETY   安全余量（秒），默认 600：留给同步之后的 README / all_books.json 更新和提交推送
+"""
+
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+TIME_BUDGET_SAFETY = float(os.getenv("TIME_BUDGET_SAFETY", "600"))
+THROUGHPUT_WINDOW = 120  # 实测吞吐量的滑动窗口（秒）
+MIN_THROUGHPUT_SAMPLES = 20  # 窗口内至少完成这么多ID才使用实测吞吐量
+DEFAULT_IDS_PER_SECOND = 2.0  # 没有实测数据时的吞吐量（0.5 秒/ID）
+RENDER_BASE_SECONDS = 30.0  # 生成md文件的固定开销（热门分类索引、统计信息等）
+DEFAULT_RENDER_SECONDS_PER_BOOK = 0.01  # 没有实测数据时每本书的生成耗时
+
+
+def parse_deadline(value: str) -> float:
+    """
+    解析截止时间：Unix 时间戳，或 ISO 格式的日期时间（不带时区时按本地时间）
+
+    Args:
+        value: 命令行参数的值
+
+    Returns:
+        截止时间（Unix 时间戳）
+    """
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f"无法解析截止时间: {value}（应为 Unix 时间戳或 ISO 格式，例如 2024-01-01T08:00）")
+
+
+def add_time_budget_arguments(parser):
+    """
+    给命令行解析器添加时间预算相关的参数
+
+    Args:
+        parser: argparse 解析器
+    """
+    group = parser.add_argument_group('时间预算')
+    group.add_argument('--time-budget', type=float, metavar='MINUTES',
+                       help='运行时间预算（分钟）：剩余时间不够完成在途任务和生成md文件时停止调度新ID，下次运行从停止处继续')
+    group.add_argument('--deadline', type=parse_deadline, metavar='TIME',
+                       help='截止时间（Unix 时间戳或 ISO 格式），与 --time-budget 同时指定时取较早的一个')
+
+
+def deadline_from_args(args) -> Optional[float]:
+    """按命令行参数计算截止时间（Unix 时间戳），都未指定时返回None"""
+    deadlines = []
+    if args.time_budget:
+        deadlines.append(time.time() + args.time_budget * 60)
+    if args.deadline:
+        deadlines.append(args.deadline)
+    return min(deadlines) if deadlines else None
+
+
+def load_state(state_file: Path) -> Dict:
+    """读取上次保存的实测值和续传位置，不存在或损坏时返回空字典"""
+    if not state_file.exists():
+        return {}
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (ValueError, OSError):
+        return {}
+
+
+def save_state(state_file: Path, **updates):
+    """更新保存的实测值和续传位置（值为 None 的字段会被删除）"""
+    state = load_state(state_file)
+    state.update(updates)
+    state = {key: value for key, value in state.items() if value is not None}
+    state['updated_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    tmp_file = state_file.with_name(state_file.name + '.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, state_file)
+
+
+class TimeBudget:
+    """截止时间、实测吞吐量和停止调度的判断"""
+
+    def __init__(self, deadline: float, state_file: Path):
+        """
+        Args:
+            deadline: 截止时间（Unix 时间戳）
+            state_file: 保存实测值和续传位置的文件（time_budget.json）
+        """
+        self.deadline = deadline
+        self.state_file = state_file
+        state = load_state(state_file)
+        self.saved_ids_per_second = state.get('ids_per_second')
+        self.render_seconds_per_book = state.get('render_seconds_per_book', DEFAULT_RENDER_SECONDS_PER_BOOK)
+        self.completions = deque()  # 最近完成的ID的时间
+        self.completed = 0
+        self.first_completed_at = None
+        self.stopped = False
+        self.resume_from_id = None
+
+    def remaining(self) -> float:
+        """距离截止时间的秒数"""
+        return self.deadline - time.time()
+
+    def record_completed(self):
+        """流水线完成一个ID（写入协程调用）"""
+        now = time.monotonic()
+        if self.first_completed_at is None:
+            self.first_completed_at = now
+        self.completed += 1
+        self.completions.append(now)
+        while self.completions and self.completions[0] < now - THROUGHPUT_WINDOW:
+            self.completions.popleft()
+
+    def ids_per_second(self) -> float:
+        """当前吞吐量：窗口内样本足够时用实测值，否则用上次保存的值或默认值"""
+        if len(self.completions) >= MIN_THROUGHPUT_SAMPLES:
+            span = time.monotonic() - self.completions[0]
+            if span > 0:
+                return len(self.completions) / span
+        return self.saved_ids_per_second or DEFAULT_IDS_PER_SECOND
+
+    def render_estimate(self, books: int) -> float:
+        """生成 books 本书的md文件的预计耗时（秒）"""
+        return RENDER_BASE_SECONDS + self.render_seconds_per_book * books
+
+    def should_stop(self, in_flight: int = 0, books: int = 0) -> bool:
+        """
+        剩余时间是否已经不够再调度新ID
+
+        Args:
+            in_flight: 已在流水线中、尚未完成的ID数
+            books: 本次需要生成md文件的书籍数（已找到的加上在途的）
+
+        Returns:
+            是否应该停止调度
+        """
+        needed = in_flight / self.ids_per_second() + self.render_estimate(books) + TIME_BUDGET_SAFETY
+        return self.remaining() < needed
+
+    def stop(self, resume_from_id: Optional[int]):
+        """记录停止调度，resume_from_id 为下次运行应该开始的ID"""
+        self.stopped = True
+        if resume_from_id is not None:
+            self.resume_from_id = min(resume_from_id, self.resume_from_id or resume_from_id)
+
+    def record_render(self, seconds: float, books: int):
+        """记录一次生成md文件的实测耗时"""
+        if books > 0:
+            self.render_seconds_per_book = seconds / books
+
+    def save(self):
+        """保存实测吞吐量、每本书的生成耗时和续传位置"""
+        updates = {'render_seconds_per_book': round(self.render_seconds_per_book, 6)}
+        if self.completed >= MIN_THROUGHPUT_SAMPLES and self.first_completed_at is not None:
+            elapsed = time.monotonic() - self.first_completed_at
+            if elapsed > 0:
+                updates['ids_per_second'] = round(self.completed / elapsed, 3)
+        if self.stopped:
+            updates['resume_from_id'] = self.resume_from_id
+        save_state(self.state_file, **updates)
+
+    def summary(self) -> str:
+        """用于进度输出的剩余时间和吞吐量"""
+        return f"剩余 {self.remaining() / 60:.1f} 分钟，吞吐量 {self.ids_per_second():.1f} ID/秒"
@@ -3,9 +3,12 @@
 """
 更新README.md中的"热门分类"章节
 根据md目录下的所有md文件生成热门分类列表
+
+同步脚本（全量 / 增量）完成后调用 update_readme_and_json，同时重新生成 all_books.json
 """
 
 import re
+import subprocess
 from pathlib import Path
 from collections import defaultdict
 
@@ -126,6 +129,51 @@ def update_readme():
         return False
 
 
+def update_readme_and_json(step: str = ""):
+    """
+    更新README.md的热门分类章节并生成all_books.json（同步完成后调用）
+
+    Args:
+        step: 标题前的步骤编号，例如 "步骤4: "
+    """
+    print("\n" + "=" * 80)
+    print(f"📝 {step}更新README.md和all_books.json")
+    print("=" * 80)
+    print()
+    
+    # 更新README.md的热门分类章节
+    print("📝 更新README.md热门分类章节...")
+    try:
+        if update_readme():
+            print("✅ README.md已更新")
+        else:
+            print("⚠️  README.md更新失败，但继续执行")
+    except Exception as e:
+        print(f"⚠️  更新README.md失败: {e}")
+    
+    # 生成all_books.json
+    print("\n📝 生成all_books.json...")
+    try:
+        command = ["python3", str(ROOT / "scripts" / "parse_md_to_json.py")]
+        # 有书籍数据库时直接从数据库生成，不再重新解析所有md文件
+        if (MD_DIR / "books.sqlite").exists():
+            command.append("--from-store")
+        result = subprocess.run(
+            command,
+            cwd=str(ROOT),
+            capture_output=True,
+            text=True
+        )
+        if result.returncode == 0:
+            print("✅ all_books.json已生成")
+            if result.stdout:
+                print(result.stdout)
+        else:
+            print(f"⚠️  生成all_books.json失败: {result.stderr}")
+    except Exception as e:
+        print(f"⚠️  生成all_books.json失败: {e}")
+
+
 if __name__ == "__main__":
     print("=" * 80)
     print("📝 更新README.md热门分类章节")